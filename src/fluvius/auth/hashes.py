@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 
+import asyncio
 import os
 import hashlib
 import secrets
 
 from base64 import b64decode, b64encode
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from fluvius.error import BadRequestError
 
 # Parameters to PBKDF2. Only affect new passwords.
@@ -16,6 +18,19 @@ HASH_FUNCTION = "sha256"  # Must be in hashlib.
 # python -m timeit -s 'import passwords as p' 'p.make_hash("something")'
 COST_FACTOR = 9901
 
+# Algorithm used for new hashes: "PBKDF2" or "SCRYPT" (memory-hard).
+# NOTE: MQTT ACL hashes are verified by the broker and must stay PBKDF2.
+HASH_ALGORITHM = "PBKDF2"
+
+# Parameters to scrypt (hashlib.scrypt). Memory used is ~ 128 * N * r bytes.
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_MAXMEM = 64 * 1024 * 1024
+
+# Upper bound of hashes computed concurrently by the async variants.
+HASH_CONCURRENCY = 4
+
 BASE32_TABLE = [
     'A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K',
     'L', 'M', 'N', 'O', 'P', 'Q', 'R', 'S', 'T', 'U', 'V',
@@ -41,15 +56,27 @@ BASE32_TABLE = [
 # of the hash algorithm hash_name is used, e.g. 64 for SHA-512.
 
 
-def make_hash(password, encoding="utf-8"):
-    '''Generate a random salt and return a new hash for the password.'''
+def _password_bytes(password, encoding):
     if isinstance(password, str):
-        passwd = bytearray(password, encoding)
-    elif isinstance(password, (bytearray, bytes)):
-        passwd = password
-    else:
-        raise BadRequestError(
-            "S00.101", "Password must be either a string or bytes: {}".format(type(password)))
+        return bytearray(password, encoding)
+
+    if isinstance(password, (bytearray, bytes)):
+        return password
+
+    raise BadRequestError(
+        "S00.101", "Password must be either a string or bytes: {}".format(type(password)))
+
+
+def make_hash(password, encoding="utf-8", algorithm=None):
+    '''Generate a random salt and return a new hash for the password.'''
+    passwd = _password_bytes(password, encoding)
+    algorithm = algorithm or HASH_ALGORITHM
+
+    if algorithm == "SCRYPT":
+        return make_scrypt_hash(passwd)
+
+    if algorithm != "PBKDF2":
+        raise BadRequestError("S00.102", "Unsupported hash algorithm: {}".format(algorithm))
 
     salt = b64encode(os.urandom(SALT_LENGTH))
     hashbytes = hashlib.pbkdf2_hmac(
@@ -66,14 +93,36 @@ def make_hash(password, encoding="utf-8"):
     )
 
 
+def make_scrypt_hash(passwd):
+    salt = b64encode(os.urandom(SALT_LENGTH))
+    hashbytes = hashlib.scrypt(
+        passwd, salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, maxmem=SCRYPT_MAXMEM, dklen=KEY_LENGTH)
+
+    return "$".join(
+        [
+            "SCRYPT",
+            "{}:{}:{}".format(SCRYPT_N, SCRYPT_R, SCRYPT_P),
+            str(salt, "ascii"),
+            str(b64encode(hashbytes), "ascii"),
+        ]
+    )
+
+
+def check_scrypt_hash(passwd, hash_value):
+    algorithm, params, salt, hash_a = hash_value.split("$")
+    assert algorithm == "SCRYPT"
+    n, r, p = (int(v) for v in params.split(":"))
+    hash_a = b64decode(hash_a)
+    hash_b = hashlib.scrypt(
+        passwd, salt=bytearray(salt, "ascii"), n=n, r=r, p=p,
+        maxmem=max(SCRYPT_MAXMEM, 130 * n * r), dklen=len(hash_a))
+    return secrets.compare_digest(hash_a, hash_b)
+
+
 def check_hash(password, hash_value, encoding="utf-8"):
-    if isinstance(password, str):
-        passwd = bytearray(password, encoding)
-    elif isinstance(password, (bytearray, bytes)):
-        passwd = password
-    else:
-        raise BadRequestError(
-            "S00.101", "Password must be either a string or bytes: {}".format(type(password)))
+    passwd = _password_bytes(password, encoding)
+    if hash_value.startswith("SCRYPT$"):
+        return check_scrypt_hash(passwd, hash_value)
 
     '''Check a password against an existing hash.'''
     algorithm, hash_function, cost_factor, salt, hash_a = hash_value.split("$")
@@ -89,6 +138,67 @@ def check_hash(password, hash_value, encoding="utf-8"):
     return secrets.compare_digest(hash_a, hash_b)
 
 
+def needs_rehash(hash_value, algorithm=None):
+    '''True when the hash was made with an outdated algorithm or weaker parameters.'''
+    algorithm = algorithm or HASH_ALGORITHM
+    parts = hash_value.split("$")
+    if parts[0] != algorithm:
+        return True
+
+    if algorithm == "SCRYPT":
+        n, r, p = (int(v) for v in parts[1].split(":"))
+        return n < SCRYPT_N or r < SCRYPT_R or p < SCRYPT_P
+
+    return parts[1] != HASH_FUNCTION or int(parts[2]) < COST_FACTOR
+
+
+def verify_and_update(password, hash_value, encoding="utf-8"):
+    '''Check a password and return (valid, new_hash). `new_hash` is set when the
+    stored hash should be replaced (rehash-on-login), None otherwise.'''
+    if not check_hash(password, hash_value, encoding):
+        return False, None
+
+    if needs_rehash(hash_value):
+        return True, make_hash(password, encoding)
+
+    return True, None
+
+
+# Async variants: hashing is CPU bound and would block the event loop for tens
+# of milliseconds, run it on a bounded executor instead (hashlib releases the GIL).
+_executor = None
+
+
+def configure_hash_executor(max_workers=None, use_processes=False):
+    '''(Re)create the executor used by the async variants.'''
+    global _executor, HASH_CONCURRENCY
+
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+
+    HASH_CONCURRENCY = max_workers or HASH_CONCURRENCY
+    executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    _executor = executor_cls(max_workers=HASH_CONCURRENCY)
+    return _executor
+
+
+def _run_in_executor(func, *args):
+    executor = _executor or configure_hash_executor()
+    return asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+async def make_hash_async(password, encoding="utf-8", algorithm=None):
+    return await _run_in_executor(make_hash, password, encoding, algorithm)
+
+
+async def check_hash_async(password, hash_value, encoding="utf-8"):
+    return await _run_in_executor(check_hash, password, hash_value, encoding)
+
+
+async def verify_and_update_async(password, hash_value, encoding="utf-8"):
+    return await _run_in_executor(verify_and_update, password, hash_value, encoding)
+
+
 def token_base32(length=6):
     random_codes = (secrets.choice(BASE32_TABLE) for i in range(length))
     return "".join(random_codes)
@@ -1,2 +1,5 @@
 CASBIN_MODEL_PATH = "./model/model.conf"
-SUPER_ADMIN_ROLE_KEY = "sys_admin"
\ No newline at end of file
+SUPER_ADMIN_ROLE_KEY = "sys_admin"
+
+# Number of distinct policy metas kept in compiled (restriction template) form
+RESTRICTION_CACHE_SIZE = 1024
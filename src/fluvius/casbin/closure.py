@@ -0,0 +1,128 @@
+"""
+Materialised transitive closure of casbin grouping policies (g, g2, g3).
+
+Casbin's role manager answers `g(a, b[, dom])` by walking the role graph on every
+call (bounded by `max_hierarchy_level`). With deep organisation / resource trees
+that walk dominates the enforcement time. `GroupingClosure` keeps, per domain, the
+full set of roles reachable from each name so that a check is a set membership
+test. The closure is rebuilt when the policy is (re)loaded and maintained
+incrementally when grouping rules are added or removed.
+"""
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, Set
+
+DEFAULT_DOMAIN = ''
+EMPTY_SET = frozenset()
+
+
+def _rule_link(rule):
+    """ Casbin grouping rule `[name1, name2, domain?, ...]` -> (name1, name2, domain) """
+    return rule[0], rule[1], (rule[2] if len(rule) > 2 else DEFAULT_DOMAIN)
+
+
+class GroupingClosure(object):
+    """ Transitive closure of a single grouping ptype, partitioned by domain """
+
+    __slots__ = ('_parents', '_ancestors', '_descendants', '_domains')
+
+    def __init__(self, rules: Iterable = ()):
+        self.clear()
+        for rule in rules:
+            self.add_link(*_rule_link(rule))
+
+    def clear(self):
+        # domain -> name -> direct roles
+        self._parents: Dict[str, Dict[str, Set[str]]] = defaultdict(lambda: defaultdict(set))
+        # domain -> name -> every role reachable from name
+        self._ancestors: Dict[str, Dict[str, Set[str]]] = defaultdict(lambda: defaultdict(set))
+        # domain -> role -> every name that reaches role
+        self._descendants: Dict[str, Dict[str, Set[str]]] = defaultdict(lambda: defaultdict(set))
+        # name -> domains in which name holds a direct link
+        self._domains: Dict[str, Set[str]] = defaultdict(set)
+
+    def add_link(self, name1, name2, domain=DEFAULT_DOMAIN):
+        parents = self._parents[domain][name1]
+        if name2 in parents:
+            return
+
+        parents.add(name2)
+        self._domains[name1].add(domain)
+
+        ancestors, descendants = self._ancestors[domain], self._descendants[domain]
+        upper = {name2} | ancestors.get(name2, EMPTY_SET)
+        lower = {name1} | descendants.get(name1, EMPTY_SET)
+
+        for name in lower:
+            ancestors[name] |= upper
+
+        for role in upper:
+            descendants[role] |= lower
+
+    def delete_link(self, name1, name2, domain=DEFAULT_DOMAIN):
+        links = self._parents.get(domain)
+        if not links or name2 not in links.get(name1, EMPTY_SET):
+            return
+
+        links[name1].discard(name2)
+        if not links[name1]:
+            del links[name1]
+            self._domains[name1].discard(domain)
+            if not self._domains[name1]:
+                del self._domains[name1]
+
+        # Removals may break any number of derived paths, re-derive the domain only.
+        self._rebuild_domain(domain)
+
+    def _rebuild_domain(self, domain):
+        links = self._parents.get(domain)
+        self._ancestors.pop(domain, None)
+        self._descendants.pop(domain, None)
+        if not links:
+            self._parents.pop(domain, None)
+            return
+
+        ancestors, descendants = self._ancestors[domain], self._descendants[domain]
+        for name in links:
+            reached, stack = set(), list(links[name])
+            while stack:
+                role = stack.pop()
+                if role in reached:
+                    continue
+
+                reached.add(role)
+                stack.extend(links.get(role, EMPTY_SET))
+
+            ancestors[name] = reached
+            for role in reached:
+                descendants[role].add(name)
+
+    def has_link(self, name1, name2, domain=DEFAULT_DOMAIN) -> bool:
+        if name1 == name2:
+            return True
+
+        ancestors = self._ancestors.get(domain)
+        return ancestors is not None and name2 in ancestors.get(name1, EMPTY_SET)
+
+    def roles(self, name, domain=DEFAULT_DOMAIN) -> FrozenSet[str]:
+        """ All roles reachable from `name` within `domain` """
+        return frozenset(self._ancestors.get(domain, {}).get(name, EMPTY_SET))
+
+    def users(self, role, domain=DEFAULT_DOMAIN) -> FrozenSet[str]:
+        """ All names that reach `role` within `domain` """
+        return frozenset(self._descendants.get(domain, {}).get(role, EMPTY_SET))
+
+    def domains(self, name) -> FrozenSet[str]:
+        """ Domains in which `name` is directly linked (e.g. resource ids of a profile for g3) """
+        return frozenset(self._domains.get(name, EMPTY_SET))
+
+    def g_function(self):
+        """ Drop-in replacement for `casbin.util.generate_g_function` """
+        has_link = self.has_link
+
+        def g(name1, name2, *domain):
+            if domain:
+                return has_link(name1, name2, str(domain[0]))
+
+            return has_link(name1, name2)
+
+        return g
@@ -64,6 +64,7 @@ class PolicyNarration(BaseModel):
     policies: List[PolicyData] = Field(default_factory=list)
     trace: List[dict] = Field(default_factory=list)
     restriction: Dict = Field(default_factory=dict)
+    scope: Optional[Any] = Field(None, exclude=True)    # Compiled restriction (QueryStatement) for the query layer
 
 
 class PolicyRequest(BaseModel):
@@ -5,10 +5,110 @@ from casbin import AsyncEnforcer
 from fluvius.error import BadRequestError, ForbiddenError
 
 from fluvius.casbin import logger
+from fluvius.casbin.closure import GroupingClosure
 from fluvius.casbin.helper import enable_simpleeval_trace, extract_trace_log
 
 
 class FluviusEnforcer(AsyncEnforcer):
+    """ Grouping (g/g2/g3) checks use closures (see `GroupingClosure`) built lazily per ptype
+        from the loaded model. Every (re)load drops them. After a full `load_policy` the matcher
+        builds them on first use and they are then updated incrementally. Filtered loads are
+        typically per request, their matcher uses the role manager links casbin already built. """
+
+    def __init__(self, *args, **kwargs):
+        # ptype -> GroupingClosure of the loaded model, must exist before the base class builds role links
+        self.closures = {}
+        self.enforce_closures = True
+        super().__init__(*args, **kwargs)
+
+    def build_role_links(self):
+        super().build_role_links()
+        self.closures = {}
+
+    async def load_policy(self):
+        # The base class rebuilds the role links of the new model directly (not through `build_role_links`)
+        await super().load_policy()
+        self.closures = {}
+        self.enforce_closures = True
+
+    async def load_filtered_policy(self, filter):
+        await super().load_filtered_policy(filter)
+        self.closures = {}
+        self.enforce_closures = False
+
+    async def load_increment_filtered_policy(self, filter):
+        await super().load_increment_filtered_policy(filter)
+        self.closures = {}
+
+    def clear_policy(self):
+        super().clear_policy()
+        self.closures = {}
+
+    def build_closure(self, ptype) -> GroupingClosure:
+        closure = self.closures[ptype] = GroupingClosure(self.model["g"][ptype].policy)
+        return closure
+
+    def build_closures(self):
+        """ Build the grouping closures of all the grouping ptypes of the loaded model """
+        for ptype in (self.model["g"] if "g" in self.model.keys() else ()):
+            if ptype in self.rm_map:
+                self.build_closure(ptype)
+
+    def get_closure(self, ptype="g") -> GroupingClosure:
+        closure = self.closures.get(ptype)
+        if closure is not None:
+            return closure
+
+        if "g" not in self.model.keys() or ptype not in self.model["g"]:
+            return GroupingClosure()
+
+        return self.build_closure(ptype)
+
+    def _update_closure(self, ptype, rules, added):
+        closure = self.closures.get(ptype)
+        if closure is None:
+            # Not built yet, it will be built from the model (which already holds the change)
+            return
+
+        for rule in rules:
+            name1, name2, *domain = rule
+            if added:
+                closure.add_link(name1, name2, *domain[:1])
+            else:
+                closure.delete_link(name1, name2, *domain[:1])
+
+    async def add_named_grouping_policy(self, ptype, *params):
+        rules = [params[0] if len(params) == 1 and isinstance(params[0], list) else list(params)]
+        rule_added = await super().add_named_grouping_policy(ptype, *params)
+        if rule_added:
+            self._update_closure(ptype, rules, added=True)
+        return rule_added
+
+    async def add_named_grouping_policies(self, ptype, rules):
+        rules_added = await super().add_named_grouping_policies(ptype, rules)
+        if rules_added:
+            self._update_closure(ptype, rules, added=True)
+        return rules_added
+
+    async def remove_named_grouping_policy(self, ptype, *params):
+        rules = [params[0] if len(params) == 1 and isinstance(params[0], list) else list(params)]
+        rule_removed = await super().remove_named_grouping_policy(ptype, *params)
+        if rule_removed:
+            self._update_closure(ptype, rules, added=False)
+        return rule_removed
+
+    async def remove_named_grouping_policies(self, ptype, rules):
+        rules_removed = await super().remove_named_grouping_policies(ptype, rules)
+        if rules_removed:
+            self._update_closure(ptype, rules, added=False)
+        return rules_removed
+
+    async def remove_filtered_named_grouping_policy(self, ptype, field_index, *field_values):
+        rules_removed = await super().remove_filtered_named_grouping_policy(ptype, field_index, *field_values)
+        if rules_removed:
+            self._update_closure(ptype, rules_removed, added=False)
+        return rules_removed
+
     def enforce_ex(self, *rvals):
             """decides whether a "subject" can access a "object" with the operation "action",
             input parameters are usually: (sub, obj, act).
@@ -27,7 +127,9 @@ class FluviusEnforcer(AsyncEnforcer):
 
             if "g" in self.model.keys():
                 for key, ast in self.model["g"].items():
-                    if len(self.rm_map) != 0:
+                    if key in self.closures or (self.enforce_closures and key in self.rm_map):
+                        functions[key] = self.get_closure(key).g_function()
+                    elif len(self.rm_map) != 0:
                         functions[key] = generate_g_function(ast.rm)
                     if len(self.cond_rm_map) != 0:
                         functions[key] = generate_conditional_g_function(ast.cond_rm)
@@ -1,22 +1,34 @@
 import os
-import re
-import json
 import jinja2
-import jsonurl_py
-from time import time
-from typing import List, Dict, Any, Set
+from time import perf_counter
+from typing import List, Any, Set, Tuple
 from casbin import Model
 from casbin.persist.adapters.asyncio import AsyncAdapter
 
 from .enforcer import FluviusEnforcer
 from .adapter import SqlAdapter
-from .datadef import (
-    PolicyRequest, PolicyResponse, PolicyData, PolicyNarration, PolicyMeta,
-    PolicyScope, ConditionNode, ConditionLeaf
+from .datadef import PolicyRequest, PolicyResponse, PolicyData, PolicyNarration, PolicyScope
+from .restriction import (
+    CompiledPolicyMeta, RestrictionContext,
+    compile_policy_meta, restriction_statement, statement_to_dict
 )
+from fluvius.data.query import QueryStatement
 from fluvius.error import ForbiddenError
 from ._meta import config, logger
 from fluvius.error import BadRequestError, ForbiddenError
+from fluvius.helper.metrics import Counter, metrics
+
+POLICY_CHECK_DURATION = metrics.histogram(
+    "fluvius_policy_check_duration_seconds", "Permission check time", ("cqrs", "outcome"))
+
+
+@metrics.collector
+def restriction_cache_metrics():
+    info = compile_policy_meta.cache_info()
+    counter = Counter("fluvius_policy_restriction_cache", "Compiled policy restriction cache lookups", ("result",))
+    counter.inc(("hit",), info.hits)
+    counter.inc(("miss",), info.misses)
+    return (counter,)
 
 DEFAULT_CASBIN_TABLE = 'casbin_rule'
 
@@ -69,6 +81,15 @@ class PolicyManager:
         return self._adapter.get_filter_from_request(request)
 
     async def check_permission(self, request: PolicyRequest) -> PolicyResponse:
+        started, outcome = perf_counter(), "error"
+        try:
+            response = await self._check_permission(request)
+            outcome = "allowed" if response.allowed else "denied"
+            return response
+        finally:
+            POLICY_CHECK_DURATION.observe((request.cqrs, outcome), perf_counter() - started)
+
+    async def _check_permission(self, request: PolicyRequest) -> PolicyResponse:
         if config.SUPER_ADMIN_ROLE_KEY in request.auth_ctx.iamroles:
             return PolicyResponse(
                 allowed=True,
@@ -108,39 +129,30 @@ class PolicyManager:
                 )
                 policies.append(prule)
 
+        scope = None
         restriction = {}
-        if request.cqrs == "QUERY":
-            restriction = await self._generate_restriction(request, policies) if policies else {}
+        if request.cqrs == "QUERY" and policies:
+            scope = await self._generate_restriction(request, policies)
+            restriction = statement_to_dict(scope)
 
-        return PolicyNarration(policies=policies, trace=trace, restriction=restriction, message=request.msg)
+        return PolicyNarration(policies=policies, trace=trace, restriction=restriction, scope=scope, message=request.msg)
 
-    async def _generate_restriction(self, request: PolicyRequest, policies: List[PolicyData]) -> dict:
+    async def _generate_restriction(self, request: PolicyRequest, policies: List[PolicyData]) -> QueryStatement:
         if not policies:
-            return {}
+            return QueryStatement()
 
-        context      = self._build_context(request)
         scope, metas = self._reconcile_policies(policies)
-        conditions   = self._reconcile_condition(scope, metas, context)
-
-        return conditions.to_query_statement()
+        templates = [tmpl for tmpl in (meta.template(scope) for meta in metas) if tmpl is not None]
+        if not templates:
+            return QueryStatement()
 
-    def _parse_meta(self, policies: List[PolicyData]) -> List[PolicyMeta]:
-        """Parse the metas from the policies."""
-        parsed_metas = []
-        for policy in policies:
-            if not policy.meta:
-                continue
+        return restriction_statement(*templates, context=self._build_context(request))
 
-            try:
-                meta_dict = jsonurl_py.loads(policy.meta)
-                meta = PolicyMeta(**meta_dict)
-                parsed_metas.append(meta)
-            except (jsonurl_py.ParseError, KeyError, ValueError) as e:
-                raise BadRequestError('C00.204', f'Failed to parse policy meta: {policy.meta}, error: {e}')
+    def _parse_meta(self, policies: List[PolicyData]) -> List[CompiledPolicyMeta]:
+        """Parse the metas from the policies (compiled once per distinct meta)."""
+        return [compile_policy_meta(policy.meta) for policy in policies if policy.meta]
 
-        return parsed_metas
-
-    def _reconcile_policies(self, policies: List[PolicyData]) -> List[PolicyData]:
+    def _reconcile_policies(self, policies: List[PolicyData]) -> Tuple[PolicyScope, List[CompiledPolicyMeta]]:
         scope = self._reconcile_scope(policies)
         policies = [policy for policy in policies if policy.scope == scope]
         return scope, self._parse_meta(policies)
@@ -161,90 +173,15 @@ class PolicyManager:
 
         return PolicyScope.SYSTEM
 
-    def _retrieve_resource(self, request: PolicyRequest) -> Dict[str, Set[str]]:
+    def _retrieve_resource(self, request: PolicyRequest) -> Set[str]:
+        # The policy is reloaded (filtered) for every check, a direct scan of the g3 rules is cheaper than a closure
         return set(rule[2] for rule in self._enforcer.get_filtered_named_grouping_policy("g3", 0, str(request.auth_ctx.profile.id)))
 
-    def _build_context(self, request: PolicyRequest) -> Dict[str, Any]:
-        res_ids = self._retrieve_resource(request)
-        return {
-            "request": request.model_dump(),
-            "restriction": {
+    def _build_context(self, request: PolicyRequest) -> RestrictionContext:
+        return RestrictionContext(
+            request=request.model_dump,
+            restriction=lambda: {
                 "org": str(request.auth_ctx.organization.id),
-                "resource_ids": list(res_ids),
+                "resource_ids": list(self._retrieve_resource(request)),
             }
-        }
-
-    def _reconcile_condition(self, scope: PolicyScope, metas: List[PolicyMeta], context: Dict[str, Any]) -> ConditionNode:
-        if not metas:
-            return ConditionNode()
-
-        final_condition = []
-
-        for meta in metas:
-            ctx = context.copy()
-            meta_cond = meta.restriction.condition
-            if not meta_cond:
-                continue
-
-            scope_cond = getattr(meta_cond, scope, None)
-            if not scope_cond:
-                continue
-
-            rendered = self._render_condition(scope_cond, ctx)
-            has_all = hasattr(rendered, 'ALL') and rendered.ALL and len(rendered.ALL) > 0
-            has_any = hasattr(rendered, 'ANY') and rendered.ANY and len(rendered.ANY) > 0
-            if has_all or has_any:
-                final_condition.append(rendered)
-
-        if not final_condition:
-            return ConditionNode()
-
-        return ConditionNode(ALL=final_condition)
-
-    def _render_condition(self, condition: ConditionNode, context: Dict[str, Any]) -> ConditionNode:
-        if not condition:
-            return ConditionNode()
-
-        def _render_leaf(leaf: ConditionLeaf) -> ConditionLeaf:
-            return ConditionLeaf(
-                field=leaf.field,
-                op=leaf.op,
-                value=self._render_value(leaf.value, context)
-            )
-
-        def _render_node(node: ConditionNode) -> ConditionNode:
-            result = ConditionNode()
-
-            if node.ALL:
-                result.ALL = [
-                    _render_leaf(item) if isinstance(item, ConditionLeaf) else _render_node(item)
-                    for item in node.ALL
-                ]
-
-            if node.ANY:
-                result.ANY = [
-                    _render_leaf(item) if isinstance(item, ConditionLeaf) else _render_node(item)
-                    for item in node.ANY
-                ]
-
-            return result
-
-        return _render_node(condition)
-
-    def _render_value(self, val: str, context: Dict[str, Any]) -> Any:
-        if not isinstance(val, str):
-            return val
-
-        try:
-            match = re.match(r"^context\(\s*([^)]+?)\s*\)$", val)
-            if not match:
-                return val
-
-            result = context
-            for part in match.group(1).split("."):
-                result = result[part]
-
-            return result
-
-        except Exception as e:
-            raise BadRequestError('C00.205', f"Failed to render value: {val}, error: {e}")
+        )
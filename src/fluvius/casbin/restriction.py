@@ -0,0 +1,207 @@
+"""
+Compiled policy restrictions.
+
+A policy `meta` is parsed (jsonurl + pydantic) exactly once per distinct meta text
+and turned into a `RestrictionTemplate` per scope. Rendering a template against a
+request context is then a plain tree walk that produces a `QueryStatement`, which
+the query layer hands straight to `BackendQuery.scope` (i.e. the WHERE clause)
+without going through `process_query_statement` again.
+
+The meta text is the cache key, therefore editing a policy (a new policy version)
+naturally yields a new compiled entry.
+"""
+import re
+import jsonurl_py
+
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+from fluvius.constant import QUERY_OPERATOR_SEP
+from fluvius.data.query import QueryExpression, QueryStatement
+from fluvius.error import BadRequestError
+
+from .datadef import PolicyMeta, PolicyScope, ConditionNode, ConditionLeaf
+from ._meta import config
+
+RX_CONTEXT_VALUE = re.compile(r"^context\(\s*([^)]+?)\s*\)$")
+
+
+class ContextParam(tuple):
+    """ A compiled `context(a.b.c)` placeholder, stored as the path tuple ('a', 'b', 'c') """
+
+    @property
+    def root(self):
+        return self[0]
+
+    def resolve(self, context):
+        try:
+            result = context
+            for part in self:
+                result = result[part]
+
+            return result
+        except Exception as e:
+            raise BadRequestError('C00.205', f"Failed to render value: context({'.'.join(self)}), error: {e}")
+
+
+class RestrictionContext(dict):
+    """ Render context whose top-level entries are loaded on first access.
+        Templates that never reference e.g. `request` never pay for building it. """
+
+    def __init__(self, **loaders):
+        super().__init__()
+        self._loaders = loaders
+
+    def __missing__(self, key):
+        value = self[key] = self._loaders[key]()
+        return value
+
+
+def compile_value(value):
+    if not isinstance(value, str):
+        return value
+
+    match = RX_CONTEXT_VALUE.match(value)
+    if not match:
+        return value
+
+    return ContextParam(match.group(1).split("."))
+
+
+def render_value(value, context):
+    if isinstance(value, ContextParam):
+        return value.resolve(context)
+
+    return value
+
+
+class RestrictionTemplate(object):
+    """ Parametrised scope fragment compiled from a `ConditionNode`.
+
+        Nodes are stored as `(operator, children)` and leaves as `(field, op, value)`
+        where `value` is either a literal or a `ContextParam`.
+    """
+
+    __slots__ = ('_node', '_fields', '_params')
+
+    def __init__(self, condition: ConditionNode):
+        fields, params = set(), set()
+        self._node = self._compile_node(condition, fields, params)
+        self._fields = tuple(sorted(fields))
+        self._params = tuple(sorted(params))
+
+    @classmethod
+    def _compile_node(cls, node: ConditionNode, fields, params):
+        if node.ALL:
+            operator, items = 'and', node.ALL
+        elif node.ANY:
+            operator, items = 'or', node.ANY
+        else:
+            return None
+
+        def _compile_items():
+            for item in items:
+                if isinstance(item, ConditionLeaf):
+                    value = compile_value(item.value)
+                    fields.add(item.field)
+                    if isinstance(value, ContextParam):
+                        params.add(value.root)
+
+                    yield (item.field, item.op, value)
+                    continue
+
+                yield cls._compile_node(item, fields, params)
+
+        return (operator, tuple(_compile_items()))
+
+    @property
+    def fields(self) -> Tuple[str, ...]:
+        """ Resource fields referenced by the restriction (i.e. index candidates) """
+        return self._fields
+
+    @property
+    def params(self) -> Tuple[str, ...]:
+        """ Top-level context keys referenced by the restriction """
+        return self._params
+
+    @property
+    def empty(self) -> bool:
+        return self._node is None or not self._node[1]
+
+    def render(self, context) -> Optional[QueryExpression]:
+        """ Render to a composite `QueryExpression`, same shape as `process_query_statement` output """
+
+        def _render(node):
+            if node is None:
+                return None
+
+            operator, items = node
+            children = []
+            for item in items:
+                if item is None:
+                    continue
+
+                if len(item) == 3:
+                    field, op, value = item
+                    children.append(QueryExpression(field, op, QUERY_OPERATOR_SEP, render_value(value, context)))
+                    continue
+
+                rendered = _render(item)
+                if rendered is not None:
+                    children.append(rendered)
+
+            return QueryExpression(None, operator, QUERY_OPERATOR_SEP, tuple(children))
+
+        return _render(self._node)
+
+
+class CompiledPolicyMeta(object):
+    """ All restriction templates of a single policy meta, keyed by scope """
+
+    __slots__ = ('_templates',)
+
+    def __init__(self, meta: PolicyMeta):
+        self._templates = {}
+        condition = meta.restriction.condition
+        for scope in PolicyScope:
+            node = getattr(condition, scope.value, None) if condition else None
+            if node:
+                template = RestrictionTemplate(node)
+                if not template.empty:
+                    self._templates[scope] = template
+
+    def template(self, scope: PolicyScope) -> Optional[RestrictionTemplate]:
+        return self._templates.get(scope)
+
+
+@lru_cache(maxsize=config.RESTRICTION_CACHE_SIZE)
+def compile_policy_meta(meta: str) -> CompiledPolicyMeta:
+    try:
+        return CompiledPolicyMeta(PolicyMeta(**jsonurl_py.loads(meta)))
+    except (jsonurl_py.ParseError, KeyError, ValueError, TypeError) as e:
+        raise BadRequestError('C00.204', f'Failed to parse policy meta: {meta}, error: {e}')
+
+
+def restriction_statement(*templates: RestrictionTemplate, context) -> QueryStatement:
+    """ Render and AND-combine the templates into a backend scope statement """
+    rendered = tuple(r for r in (t.render(context) for t in templates) if r is not None)
+    if not rendered:
+        return QueryStatement()
+
+    return QueryStatement((QueryExpression(None, 'and', QUERY_OPERATOR_SEP, rendered),))
+
+
+def statement_to_dict(statement) -> Dict[str, Any]:
+    """ Dictionary form of a rendered restriction (as exposed by `PolicyNarration.restriction`) """
+
+    def _convert(expr):
+        if expr.field is None:
+            key = f"{QUERY_OPERATOR_SEP}{expr.operator}"
+            return {key: [_convert(e) for e in expr.value]}
+
+        return {f"{expr.field}{QUERY_OPERATOR_SEP}{expr.operator}": expr.value}
+
+    if not statement:
+        return {}
+
+    return _convert(statement[0])
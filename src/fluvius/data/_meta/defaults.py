@@ -11,6 +11,8 @@ UUID5_NAMESPACE = 'f853f38d-83f8-4ef4-9e1b-12b9e27bc1ad'
 SQLALCHEMY_DIALECT = 'sqlite'  # sqlite | postgresql
 BACKEND_QUERY_DEFAULT_LIMIT = 100
 BACKEND_QUERY_INTERNAL_LIMIT = 1000
+BACKEND_QUERY_STREAM_BATCH_SIZE = 1000  # rows fetched per round-trip by server-side cursors
+TEXT_SEARCH_LANGUAGE = "english"  # PostgreSQL text search configuration
 
 DB_DSN = "sqlite+aiosqlite:////tmp/fluvius_data.sqlite"
 
@@ -81,3 +81,9 @@ class DataDriver(object):
     async def flush(self):
         raise NotImplementedError('DataDriver.flush is not implemented.')
 
+    async def aggregate(self, resource, query):
+        raise NotImplementedError('DataDriver.aggregate is not implemented.')
+
+    def stream(self, resource, query, **kwargs):
+        raise NotImplementedError('DataDriver.stream is not implemented.')
+
@@ -2,6 +2,7 @@ import re
 import asyncpg
 import asyncio
 import importlib
+import weakref
 from asyncio import current_task
 import sqlalchemy as sa
 from functools import wraps
@@ -32,6 +33,9 @@ from fluvius.data.exceptions import (
 from fluvius.data.query import BackendQuery
 from fluvius.data.serializer import serialize_json
 from fluvius.data.data_driver import DataDriver
+from fluvius.data.event import data_changed
+from fluvius.helper import when
+from fluvius.helper.metrics import Gauge, metrics
 
 from sqlalchemy import exc
 from sqlalchemy.sql import func, select
@@ -51,6 +55,7 @@ DEBUG_CONNECTOR = config.DEBUG
 RAISE_NO_ITEM_MODIFIED_ERROR = True
 BACKEND_QUERY_LIMIT = config.BACKEND_QUERY_INTERNAL_LIMIT
 RAISE_NESTED_TRANSACTION_ERROR = False
+SESSION_CHANGED_TABLES = 'fluvius_changed_tables'
 
 
 def list_unwrapper(cursor):
@@ -168,10 +173,31 @@ def sqla_error_handler(code_prefix):
     return decorator
 
 
+_session_configurations = weakref.WeakSet()
+
+
+@metrics.collector
+def connection_pool_metrics():
+    gauge = Gauge("fluvius_db_pool_connections", "Connections of the database engine pools", ("engine", "state"))
+    for configuration in list(_session_configurations):
+        engine = getattr(configuration, '_async_engine', None)
+        if engine is None:
+            continue
+
+        pool = engine.sync_engine.pool
+        url = engine.url.render_as_string(hide_password=True)
+        for state, method in (("size", "size"), ("checked_out", "checkedout"), ("checked_in", "checkedin"), ("overflow", "overflow")):
+            if (stat := getattr(pool, method, None)) is not None:
+                gauge.inc((url, state), stat())
+
+    return (gauge,)
+
+
 class _AsyncSessionConfiguration(object):
     def __init__(self, config, **kwargs):
         self._config = config or kwargs
         self._async_engine, self._async_sessionmaker = self.set_bind(bind_dsn=self._config, loop=None, echo=False, **kwargs)
+        _session_configurations.add(self)
 
     def make_session(self):
         if not hasattr(self, "_async_sessionmaker"):
@@ -323,9 +349,26 @@ class SqlaDriver(DataDriver, QueryBuilder):
                 await async_session.rollback()
                 raise
             finally:
+                changed_tables = async_session.info.pop(SESSION_CHANGED_TABLES, None)
                 await async_session.close()
                 self._active_session.set(None)
 
+            if changed_tables:
+                await self.notify_changes(changed_tables)
+
+    def _track_change(self, data_schema):
+        self.active_session.info.setdefault(SESSION_CHANGED_TABLES, set()).add(data_schema.__table__.fullname)
+
+    async def notify_changes(self, tables):
+        """ Notify `data_changed` receivers (e.g. query result caches) of committed modifications.
+            The transaction is already committed: receiver errors are logged, never raised. """
+        tables = frozenset(tables)
+        for receiver in data_changed.receivers_for(self):
+            try:
+                await when(receiver(self, tables=tables))
+            except Exception as e:
+                logger.exception('Data change receiver [%s] failed for tables %s: %s', receiver, sorted(tables), e)
+
     @property
     def active_session(self):
         if self._active_session.get() is None:
@@ -394,6 +437,25 @@ class SqlaDriver(DataDriver, QueryBuilder):
 
         return items
 
+    @sqla_error_handler('E00.008')
+    async def aggregate(self, resource, query: BackendQuery):
+        data_schema = self.lookup_data_schema(resource)
+        stmt = self.build_aggregate(data_schema, query)
+        cursor = await self.active_session.execute(stmt)
+        return cursor.mappings().all()
+
+    async def stream(self, resource, query: BackendQuery, batch_size=config.BACKEND_QUERY_STREAM_BATCH_SIZE):
+        ''' Iterate over the query result with a server-side cursor, fetching `batch_size` rows at a time.
+            Must be consumed within a transaction. '''
+        data_schema = self.lookup_data_schema(resource)
+        stmt = self.build_select(data_schema, query).execution_options(yield_per=batch_size)
+        result = await self.active_session.stream(stmt)
+        try:
+            async for row in result.mappings():
+                yield row
+        finally:
+            await result.close()
+
     def _unwrap_schema_item(self, item):
         return item.serialize()
 
@@ -421,6 +483,7 @@ class SqlaDriver(DataDriver, QueryBuilder):
         data_schema = self.lookup_data_schema(resource)
         stmt = self.build_update(data_schema, query, updates)
         sess = self.active_session
+        self._track_change(data_schema)
         cursor = await sess.execute(stmt)
         self._check_no_item_modified(cursor, 1, query)
         return self._unwrap_result(cursor)
@@ -434,6 +497,7 @@ class SqlaDriver(DataDriver, QueryBuilder):
         ''' @TODO: Add etag checking for batch items '''
         stmt = self.build_delete(data_schema, query)
         sess = self.active_session
+        self._track_change(data_schema)
         cursor = await sess.execute(stmt)
         self._check_no_item_modified(cursor, 1, query)
         return self._unwrap_result(cursor)
@@ -443,6 +507,7 @@ class SqlaDriver(DataDriver, QueryBuilder):
         data_schema = self.lookup_data_schema(resource)
         stmt = self.build_insert(data_schema, values)
         sess = self.active_session
+        self._track_change(data_schema)
         cursor = await sess.execute(stmt)
 
         expect = len(values) if isinstance(values, (list, tuple)) else 1
@@ -472,6 +537,7 @@ class SqlaDriver(DataDriver, QueryBuilder):
         )
 
         sess = self.active_session
+        self._track_change(data_schema)
         cursor = await sess.execute(stmt)
         DEBUG_CONNECTOR and logger.info("UPSERT %d items => %r", len(data), cursor.rowcount)
         self._check_no_item_modified(cursor, 1)
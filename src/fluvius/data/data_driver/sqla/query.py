@@ -30,11 +30,12 @@ from fluvius.data import logger, config
 from fluvius.error import BadRequestError
 from fluvius.constant import QUERY_OPERATOR_SEP, OPERATOR_SEP_NEGATE, DEFAULT_DELETED_FIELD
 
+from .search import ts_match, ts_query, ts_rank, ts_vector, trgm_similar, TEXT_SEARCH_RANK_FIELD
+
 
 DEBUG_CONNECTOR = config.DEBUG
 
-DEFAULT_TEXT_SEARCH_LANG = 'english'
-DEFAULT_TEXT_SEARCH_ENGINE = func.plainto_tsquery
+DEFAULT_TEXT_SEARCH_LANG = config.TEXT_SEARCH_LANGUAGE
 
 FIELD_SEP = ":"
 FIELD_DEL = DEFAULT_DELETED_FIELD
@@ -64,6 +65,8 @@ FIELD_OPERATOR = {
         "ilike": ilike_op,
         "has": ilike_op,
         "between": lambda col, vals: col.between(vals[0], vals[1]),
+        "search": ts_match,
+        "similar": trgm_similar,
     },
     OPERATOR_SEP_NEGATE: {
         "gt": le,
@@ -79,9 +82,19 @@ FIELD_OPERATOR = {
         "in": lambda col, vals: col.notin_(vals),
         "has": ilike_op,
         "between": lambda col, vals: col.between(vals[0], vals[1]),
+        "search": lambda col, value: not_(ts_match(col, value)),
+        "similar": lambda col, value: not_(trgm_similar(col, value)),
     }
 }
 
+AGGREGATE_FUNCTIONS = {
+    "count": func.count,
+    "sum": func.sum,
+    "avg": func.avg,
+    "min": func.min,
+    "max": func.max,
+}
+
 def _iter_expression(statement):
     if isinstance(statement, QueryExpression):
         yield statement
@@ -113,6 +126,17 @@ class QueryBuilder(object):
         except AttributeError:
             raise BadRequestError("E00.501", f"Type object {data_schema} has no attribute {field_name}", None)
 
+    def unindexed_fields(self, data_schema, fields):
+        """ Return the fields that are neither the primary key nor the leading column of an index.
+            Useful to verify that scope (e.g. policy restriction) filters can use an index. """
+        table = data_schema.__table__
+        leading = {col.key for col in table.primary_key.columns}
+        for index in table.indexes:
+            if index.columns:
+                leading.add(index.columns[0].key)
+
+        return tuple(f for f in dict.fromkeys(fields) if f not in leading)
+
     def _build_expression(self, data_schema, expr: QueryStatement):
         if not isinstance(expr, QueryStatement):
             raise BadRequestError("E00.502", f'Invalid query expression: {expr}')
@@ -129,11 +153,29 @@ class QueryBuilder(object):
 
         yield from _gen_query(expr)
 
-    def _sort_clauses(self, data_schema, sort_query):
+    def _sort_clauses(self, data_schema, sort_query, text=None, text_fields=None):
         for field_name, sort_type in sort_query:
+            if field_name == TEXT_SEARCH_RANK_FIELD:
+                # Relevance of the text search, ignored without search terms
+                if text:
+                    yield getattr(ts_rank(self._search_vector(data_schema, text_fields), text), sort_type)()
+                continue
+
             db_field = self._field(data_schema, field_name)
             yield getattr(db_field, sort_type)()
 
+    def _search_vector(self, data_schema, fields=None):
+        ts_index = getattr(data_schema, '__ts_index__', None)
+        fields = fields or ts_index
+        if not fields:
+            raise BadRequestError("E00.503", "Data schema does not support text search")
+
+        # Use the generated column if it covers the requested fields
+        ts_vector_field = getattr(data_schema, '__ts_vector__', None)
+        if ts_vector_field and ts_index and tuple(fields) == tuple(ts_index):
+            return self._field(data_schema, ts_vector_field)
+
+        return ts_vector(*[self._field(data_schema, field) for field in fields], language=DEFAULT_TEXT_SEARCH_LANG)
 
     def _build_limit(self, data_schema, stmt, q: BackendQuery):
         if q.limit:
@@ -148,7 +190,7 @@ class QueryBuilder(object):
         if not q.sort:
             return stmt
 
-        return stmt.order_by(*self._sort_clauses(data_schema, q.sort))
+        return stmt.order_by(*self._sort_clauses(data_schema, q.sort, q.text, q.text_fields))
 
     def _build_join(self, data_schema, stmt, q: BackendQuery):
         join = q.join
@@ -177,11 +219,7 @@ class QueryBuilder(object):
                 yield (self._field(data_schema, FIELD_DEL) == None)
 
         if q.text:
-            if not hasattr(data_schema, '__ts_index__') or not isinstance(data_schema.__ts_index__, list):
-                raise BadRequestError("E00.503", "Data schema does not support text search")
-
-            index = func.concat_ws(' ', *[self._field(data_schema, field) for field in data_schema.__ts_index__])
-            yield (func.to_tsvector(DEFAULT_TEXT_SEARCH_LANG, index).op('@@')(DEFAULT_TEXT_SEARCH_ENGINE(DEFAULT_TEXT_SEARCH_LANG, q.text)))
+            yield self._search_vector(data_schema, q.text_fields).bool_op('@@')(ts_query(q.text, DEFAULT_TEXT_SEARCH_LANG))
 
     def _build_where(self, data_schema, sql, q: BackendQuery):
         return sql.where(*self._where_clauses(data_schema, q))
@@ -217,6 +255,40 @@ class QueryBuilder(object):
 
         return sql
 
+    def build_aggregate(self, data_schema, query: BackendQuery):
+        """ SELECT <group_by>, <aggregates> ... GROUP BY <group_by>. Sort keys are group-by fields or aggregate labels """
+        alias = query.alias or {}
+        groups = {name: self._field(data_schema, name) for name in query.group_by}
+        aggregates = {}
+        for func_name, field_name, label in query.aggregate:
+            if func_name not in AGGREGATE_FUNCTIONS:
+                raise BadRequestError("E00.506", f"Invalid aggregate function: {func_name}")
+
+            args = (self._field(data_schema, field_name),) if field_name else ()
+            aggregates[label] = AGGREGATE_FUNCTIONS[func_name](*args)
+
+        sql = select(
+            *(column.label(alias.get(name, name)) for name, column in groups.items()),
+            *(expr.label(label) for label, expr in aggregates.items())
+        ).select_from(data_schema)
+        sql = self._build_join(data_schema, sql, query)
+        sql = self._build_where(data_schema, sql, query)
+
+        if groups:
+            sql = sql.group_by(*groups.values())
+
+        for name, sort_type in query.sort:
+            expr = aggregates.get(name) if name in aggregates else groups.get(name)
+            if expr is None:
+                raise BadRequestError("E00.507", f"Invalid aggregate sort key: {name}")
+
+            sql = sql.order_by(getattr(expr, sort_type)())
+
+        sql = self._build_limit(data_schema, sql, query)
+
+        DEBUG_CONNECTOR and logger.info("[AGGREGATE STMT] %s", sql)
+        return sql
+
     def build_select(self, data_schema, query: BackendQuery):
         include = query.include or data_schema.__table__.columns.keys()
         exclude = query.exclude
@@ -8,9 +8,11 @@ from fluvius.helper import camel_to_lower
 from fluvius.data import logger
 from fluvius.data.constant import ITEM_ID_FIELD
 from fluvius.data.identifier import UUID_GENR
-from fluvius.data.helper import merge_table_args
+from fluvius.data.helper import merge_table_args, parse_table_args
 from fluvius.helper import timestamp
 
+from .search import ts_vector_column, search_indexes
+
 
 def create_data_schema_base(driver_cls=None):
     class DataSchemaBase(declarative_base()):
@@ -78,10 +80,24 @@ def create_data_schema_base(driver_cls=None):
             if cls.__dict__.get('__abstract__', False):
                 return
 
+            cls._setup_search_columns()
 
             if driver_cls is not None:
                 driver_cls.register_schema(cls)
 
+        @classmethod
+        def _setup_search_columns(cls):
+            """ Generated `tsvector` column (`__ts_vector__`) and GIN indexes, see `.search` """
+            ts_vector_field = cls.__dict__.get('__ts_vector__')
+            if ts_vector_field:
+                setattr(cls, ts_vector_field, ts_vector_column(cls.__ts_index__))
+
+            table_name = getattr(cls, '__tablename__', None) or camel_to_lower(cls.__name__)
+            indexes = tuple(search_indexes(table_name, ts_vector_field, cls.__dict__.get('__trgm_index__', ())))
+            if indexes:
+                args, opts = parse_table_args(cls.__table_args__)
+                cls.__table_args__ = tuple(args + list(indexes) + ([opts] if opts else []))
+
         def __init__(self, **kwargs):
             super().__init__()
             self._set_columns(_force=True, **kwargs)
@@ -0,0 +1,86 @@
+''' PostgreSQL full-text / trigram search
+
+A data schema declares the columns of its search document with `__ts_index__`.
+Setting `__ts_vector__` to a column name additionally materialises the document
+as a generated `tsvector` column with a GIN index, which text searches then use
+instead of computing the vector for every row:
+
+```
+    class ArticleSchema(DataSchemaBase):
+        __tablename__ = 'article'
+        __ts_index__ = ['title', 'body']
+        __ts_vector__ = '_tsv'
+        __trgm_index__ = ['title']      # GIN trigram indexes, for the `similar` operator
+```
+
+Without `__ts_vector__` the same expression is computed on the fly; it is
+immutable, so an expression index on `ts_vector_sql(fields)` serves it as well.
+'''
+import sqlalchemy as sa
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql as pg
+
+from fluvius.data import config
+
+TEXT_SEARCH_LANGUAGE = config.TEXT_SEARCH_LANGUAGE
+TEXT_SEARCH_RANK_FIELD = "_rank"
+
+
+def ts_config(language=TEXT_SEARCH_LANGUAGE):
+    # Inlined (not bound) so that the planner can match expression indexes
+    return sa.literal_column(f"'{language}'::regconfig")
+
+
+def ts_document(*columns):
+    ''' `coalesce(a, '') || ' ' || coalesce(b, '')`, unlike `concat_ws` this is immutable (indexable) '''
+    parts = [func.coalesce(col, '') for col in columns]
+    document = parts[0]
+    for part in parts[1:]:
+        document = document.op('||')(' ').op('||')(part)
+
+    return document
+
+
+def ts_vector(*columns, language=TEXT_SEARCH_LANGUAGE):
+    if len(columns) == 1 and isinstance(getattr(columns[0], 'type', None), pg.TSVECTOR):
+        return columns[0]
+
+    return func.to_tsvector(ts_config(language), ts_document(*columns))
+
+
+def ts_query(text, language=TEXT_SEARCH_LANGUAGE):
+    return func.websearch_to_tsquery(ts_config(language), text)
+
+
+def ts_match(column, text, language=TEXT_SEARCH_LANGUAGE):
+    return ts_vector(column, language=language).bool_op('@@')(ts_query(text, language))
+
+
+def ts_rank(vector, text, language=TEXT_SEARCH_LANGUAGE):
+    return func.ts_rank(vector, ts_query(text, language))
+
+
+def trgm_similar(column, text):
+    return column.bool_op('%')(text)
+
+
+def ts_vector_sql(fields, language=TEXT_SEARCH_LANGUAGE) -> str:
+    document = " || ' ' || ".join(f"coalesce(\"{f}\", '')" for f in fields)
+    return f"to_tsvector('{language}'::regconfig, {document})"
+
+
+def ts_vector_column(fields, language=TEXT_SEARCH_LANGUAGE) -> sa.Column:
+    ''' Generated (stored) `tsvector` column over `fields` '''
+    return sa.Column(pg.TSVECTOR, sa.Computed(ts_vector_sql(fields, language), persisted=True))
+
+
+def search_indexes(table_name, ts_vector_field=None, trgm_fields=()):
+    ''' GIN indexes for the generated `tsvector` column and trigram matching '''
+    if ts_vector_field:
+        yield sa.Index(f"ix_{table_name}_{ts_vector_field.strip('_')}", ts_vector_field, postgresql_using='gin')
+
+    for field in trgm_fields:
+        yield sa.Index(
+            f"ix_{table_name}_{field.strip('_')}_trgm", field,
+            postgresql_using='gin', postgresql_ops={field: 'gin_trgm_ops'}
+        )
@@ -356,6 +356,16 @@ class DataAccessManager(DataAccessManagerBase):
         q = BackendQuery.create(q, **query)
         return await self.connector.query(model_name, q, return_meta)
 
+    async def connector_aggregate(self, model_name: str, q=None, **query):
+        """ Grouped aggregates (see `BackendQuery.group_by` / `BackendQuery.aggregate`) """
+        q = BackendQuery.create(q, **query)
+        return await self.connector.aggregate(model_name, q)
+
+    def connector_stream(self, model_name: str, q=None, **query):
+        """ Stream the raw query result (no offset / limit unless given) """
+        q = BackendQuery.create(q, **query)
+        return self.connector.stream(model_name, q)
+
     async def invalidate(self, record: DataModel):
         model_name = self.lookup_record_model(record)
         query   = BackendQuery.create(identifier=record._id, etag=record._etag)
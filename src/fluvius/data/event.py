@@ -0,0 +1,5 @@
+from blinker import signal
+
+# Sent once a transaction that modified data has been committed.
+# sender: the data driver, kwargs: tables=frozenset of the modified table names (schema qualified)
+data_changed = signal("fluvius_data__data_changed")
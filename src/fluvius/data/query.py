@@ -1,5 +1,6 @@
 import re
 from collections import namedtuple
+from functools import lru_cache
 from fluvius.data.helper import nullable
 from contextlib import contextmanager
 from pyrsistent import PClass, field, pvector_field
@@ -10,6 +11,7 @@ from fluvius.data import logger
 from . import config
 
 BACKEND_QUERY_LIMIT = config.BACKEND_QUERY_INTERNAL_LIMIT
+OPERATOR_STATEMENT_CACHE_SIZE = 4096
 OperatorStatement = namedtuple('OperatorStatement', 'field operator mode')
 QueryExpression   = namedtuple('QE',   'field operator mode value')
 
@@ -64,7 +66,9 @@ def process_query_statement(statements, expr_schema=None, allowed_composites=('a
     return QueryStatement(_process(statements))
 
 
+@lru_cache(maxsize=OPERATOR_STATEMENT_CACHE_SIZE)
 def operator_statement(op_stmt: str, default_operator: str=DEFAULT_OPERATOR) -> OperatorStatement:
+    """ Split `field.operator` / `field!operator` keys. Cached, the set of keys used by clients is small """
     result = RX_PARAM_SPLIT.split(op_stmt)
 
     if len(result) == 1:  # no operator specified
@@ -82,6 +86,16 @@ def operator_statement(op_stmt: str, default_operator: str=DEFAULT_OPERATOR) ->
         raise BadRequestError('E00.303', f'Invalid query operator statement: {op_stmt}')
 
 
+def statement_fields(statement):
+    """ Yield the field names referenced by a processed query statement (composites are walked) """
+    for expr in statement or ():
+        if expr.field is None:
+            yield from statement_fields(expr.value)
+            continue
+
+        yield expr.field
+
+
 def validate_list(sort_stmt):
     if sort_stmt is None:
         return tuple()
@@ -136,6 +150,11 @@ class BackendQuery(PClass):
 
     # Search field, used for full-text search
     text = field(nullable(str), initial=None)
+    text_fields = field(tuple, factory=validate_list, initial=tuple)   # Defaults to the schema `__ts_index__`
+
+    # Aggregate queries, aggregates are (function, field or None, label)
+    group_by  = field(tuple, factory=validate_list, initial=tuple)
+    aggregate = field(tuple, factory=validate_list, initial=tuple)
 
     @classmethod
     def create(cls, query_data=None, **kwargs):
@@ -15,6 +15,7 @@ from .event import Event, EventRecord
 from .message import MessageBundle
 from .response import DomainResponse, ResponseRecord
 from .helper import consume_queue
+from .tracing import span
 
 IF_MATCH_HEADER = config.IF_MATCH_HEADER
 IF_MATCH_VERIFY = config.IF_MATCH_VERIFY
@@ -118,22 +119,24 @@ class Aggregate(object):
             self._command.domain_iid,
         )
 
-        self._rootobj = (
-            await self.fetch_command_rootobj(self._aggroot)
-        )
-
-        await self.before_command(context, command_bundle, command_class)
-        yield RestrictedAggregateProxy(self)
-        
-        if not self._evt_queue.empty():
-            raise InternalServerError('D00.102', 'All events must be consumed by the command handler.')
-
-        await self.after_command(context, command_bundle, command_class)
-        self._command = None
-        self._cmdclass = None
-        self._aggroot = None
-        self._rootobj = None
-        self._context = None
+        # Always release the aggregate, the session may go on with the next command (see `Domain.process_command_batch`)
+        try:
+            with span("root_fetch"):
+                self._rootobj = await self.fetch_command_rootobj(self._aggroot)
+
+            await self.before_command(context, command_bundle, command_class)
+            yield RestrictedAggregateProxy(self)
+
+            if not self._evt_queue.empty():
+                raise InternalServerError('D00.102', 'All events must be consumed by the command handler.')
+
+            await self.after_command(context, command_bundle, command_class)
+        finally:
+            self._command = None
+            self._cmdclass = None
+            self._aggroot = None
+            self._rootobj = None
+            self._context = None
     
     async def before_command(self, context, command_bundle, command_class):
         pass
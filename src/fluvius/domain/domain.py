@@ -4,6 +4,7 @@ import contextvars
 
 from contextlib import contextmanager
 from operator import itemgetter
+from time import perf_counter
 from pyrsistent import PClass, field
 from types import SimpleNamespace
 from typing import Iterator, Optional, List, Type
@@ -13,7 +14,8 @@ from fluvius.data import UUID_GENR, UUID_TYPE, DataModel
 from fluvius.helper import camel_to_lower, select_value, camel_to_title, ImmutableNamespace
 from fluvius.helper.timeutil import timestamp
 from fluvius.helper.registry import ClassRegistry
-from fluvius.error import BadRequestError, ForbiddenError, InternalServerError
+from fluvius.helper.metrics import metrics
+from fluvius.error import BadRequestError, ForbiddenError, InternalServerError, FluviusException
 from fluvius.casbin import PolicyManager, PolicyRequest
 from fluvius.domain.event import EventHandler
 
@@ -33,6 +35,11 @@ from .helper import consume_queue
 from .logstore import DomainLogStore
 from .signal import DomainSignal as sig, DomainSignalManager
 from .state import StateManager, ReadonlyDataManagerProxy
+from .tracing import span, timed_exit, timed_iter
+
+COMMAND_DURATION = metrics.histogram(
+    "fluvius_command_duration_seconds", "Command processing time (authorization and handler)",
+    ("domain", "command", "outcome"))
 
 
 def _build_handler_map(handler_list):
@@ -103,6 +110,13 @@ class Domain(DomainSignalManager, DomainEntityRegistry):
             self.msg_queue = queue.Queue()
             self.cmd_queue = queue.Queue()
             self.act_queue = queue.Queue()
+            self.logged = False
+
+        def clear_queues(self):
+            ''' Drop the leftovers of a failed transaction '''
+            for q in (self.rsp_queue, self.evt_queue, self.msg_queue, self.cmd_queue, self.act_queue):
+                for _ in consume_queue(q):
+                    pass
 
         def prepare_context_data(self, domain, authorization: Optional[AuthorizationContext]=None, **kwargs):
             if authorization:
@@ -388,7 +402,7 @@ class Domain(DomainSignalManager, DomainEntityRegistry):
         no_handler = True
         async with ctx.aggregate.command_aggregate(ctx, cmd_bundle, cmd_def) as agg_proxy:
             for processor in self.cmd_processors(cmd_bundle):
-                async for particle in processor(agg_proxy, statemgr, cmd_bundle):
+                async for particle in timed_iter("handler", processor(agg_proxy, statemgr, cmd_bundle)):
                     if particle is None:
                         continue
 
@@ -469,42 +483,89 @@ class Domain(DomainSignalManager, DomainEntityRegistry):
             logger.warning('No commands provided to process.')
             return
 
+        return self.collect_responses(await self.process_transaction(commands))
+
+    async def process_command_batch(self, *commands, atomic=True) -> List:
+        """ Process `commands` in order and return the responses of each command.
+
+            atomic=True: all commands run in a single transaction, any failure aborts the batch.
+            atomic=False: each command runs in its own transaction, the exception of a failed
+                          command is returned in place of its responses and the batch continues. """
+        if atomic:
+            records = await self.process_transaction(commands)
+            by_command = {cmd._id: [] for cmd in commands}
+            for resp in records:
+                by_command[resp.src_cmd].append(resp)
+
+            return [self.collect_responses(by_command[cmd._id]) for cmd in commands]
+
+        results = []
+        for cmd in commands:
+            try:
+                results.append(self.collect_responses(await self.process_transaction((cmd,))))
+            except FluviusException as e:
+                self.context.clear_queues()
+                results.append(e)
+
+        return results
+
+    async def process_transaction(self, commands):
+        """ Run `commands` within a single state/log transaction, returns the response records """
         ctx = self.context
         agg = ctx.aggregate
-        responses = {}
         assert isinstance(ctx, self.Context), f'Invalid domain context: {ctx}. Must be a subclass of {self.Context}'
 
-        async with self.statemgr.transaction("statemgr") as stm, \
-                   self.logstore.transaction("logstore") as log:
+        async with timed_exit(self.statemgr.transaction("statemgr"), "state_commit") as stm, \
+                   timed_exit(self.logstore.transaction("logstore"), "log_commit") as log:
+
+            # The context is logged once per session (i.e. with the first committed transaction)
+            if not ctx.logged:
+                await self.logstore.add_context(ctx.data)
 
-            await self.logstore.add_context(ctx.data)
             ''' Run all command within a single transaction context,
                 expose a readonly state manager '''
 
             for cmd in commands:
-                preauth_cmd = cmd.set(
-                    context=ctx.data._id,
-                    domain=self.namespace,
-                    revision=self.revision
-                )
-                auth_cmd = await self.authorize_command(ctx, preauth_cmd)
-                async for evt in self.process_command_internal(ctx, stm, auth_cmd):
-                    ctx.evt_queue.put(evt)
-                    await self.logstore.add_event(evt)
+                started, outcome = perf_counter(), "error"
+                try:
+                    preauth_cmd = cmd.set(
+                        context=ctx.data._id,
+                        domain=self.namespace,
+                        revision=self.revision
+                    )
+                    with span("policy"):
+                        auth_cmd = await self.authorize_command(ctx, preauth_cmd)
+
+                    async for evt in self.process_command_internal(ctx, stm, auth_cmd):
+                        ctx.evt_queue.put(evt)
+                        await self.logstore.add_event(evt)
+
+                    outcome = "ok"
+                finally:
+                    COMMAND_DURATION.observe((self.namespace, cmd.command, outcome), perf_counter() - started)
             
             # Before exiting transaction manager context                    
             await self.trigger_reconciliation(ctx.cmd_queue, aggregate=agg)
             await self.publish(sig.TRANSACTION_COMMITTING, self, aggregate=agg)
 
+        ctx.logged = True
         await self.publish(sig.TRANSACTION_COMMITTED, self)
-        await self.handle_events(ctx.evt_queue)
-        await self.dispatch_messages(ctx.msg_queue)
+        with span("event_handlers"):
+            await self.handle_events(ctx.evt_queue)
+
+        with span("message_dispatch"):
+            await self.dispatch_messages(ctx.msg_queue)
 
-        for resp in consume_queue(ctx.rsp_queue):
+        return list(consume_queue(ctx.rsp_queue))
+
+    def collect_responses(self, records) -> dict:
+        responses = {}
+        for resp in records:
             if resp.response in responses:
                 raise InternalServerError('D00.109', f'Duplicated responses: [{resp.response}].')
 
             responses[resp.response] = resp.data
+
         return responses
 
 
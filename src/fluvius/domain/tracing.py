@@ -0,0 +1,238 @@
+"""
+Per-stage timing of the command pipeline.
+
+`span(stage)` times a stage of the pipeline (auth, policy, root fetch, handler,
+state/log commit, event handlers, message dispatch ...) and reports it to:
+
+- the stage timings of the current request, if any (see `stage_timings`), which
+  are rendered as a `Server-Timing` header by the FastAPI command endpoints;
+- the in-process per-stage histograms (`stage_histograms`), also exported as
+  `fluvius_stage_duration_seconds` by the metrics registry;
+- the configured tracer. The tracer follows the OpenTelemetry API
+  (`start_as_current_span`) and defaults to a no-op. `TRACING_BACKEND = "otel"`
+  uses the global OpenTelemetry tracer & meter, `"log"` logs every span and
+  `"memory"` keeps finished spans in memory (see `RecordingTracer`).
+"""
+import bisect
+
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+from fluvius.helper.metrics import Histogram, metrics
+
+from . import config, logger
+
+HISTOGRAM_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SERVER_TIMING_SEPARATOR = ", "
+
+_stage_timings: ContextVar[Optional["StageTimings"]] = ContextVar('stage_timings', default=None)
+
+
+class StageTimings(object):
+    """ Stage durations (in seconds) of a single request, in order of completion """
+
+    __slots__ = ('entries',)
+
+    def __init__(self):
+        self.entries: List[Tuple[str, float]] = []
+
+    def add(self, stage: str, duration: float):
+        self.entries.append((stage, duration))
+
+    def totals(self) -> Dict[str, float]:
+        totals = {}
+        for stage, duration in self.entries:
+            totals[stage] = totals.get(stage, 0.0) + duration
+
+        return totals
+
+    def server_timing(self) -> str:
+        """ `Server-Timing` header value, durations in milliseconds """
+        return SERVER_TIMING_SEPARATOR.join(
+            f"{stage};dur={duration * 1000:.3f}" for stage, duration in self.totals().items()
+        )
+
+
+class StageHistogram(object):
+    __slots__ = ('count', 'sum', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS) + 1)   # last bucket is +Inf
+
+    def observe(self, duration: float):
+        self.count += 1
+        self.sum += duration
+        self.buckets[bisect.bisect_left(HISTOGRAM_BUCKETS, duration)] += 1
+
+    def snapshot(self) -> dict:
+        return dict(count=self.count, sum=self.sum, buckets=dict(zip(HISTOGRAM_BUCKETS + (float('inf'),), self.buckets)))
+
+
+class NoopTracer(object):
+    def start_as_current_span(self, name, attributes=None):
+        return nullcontext()
+
+
+class LoggingTracer(object):
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        started = perf_counter()
+        try:
+            yield None
+        finally:
+            logger.info('[SPAN] %s %.3fms %s', name, (perf_counter() - started) * 1000, attributes or '')
+
+
+class RecordingTracer(object):
+    """ In-memory exporter, keeps (name, duration, attributes) of the finished spans """
+
+    def __init__(self):
+        self.spans = []
+
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        started = perf_counter()
+        try:
+            yield None
+        finally:
+            self.spans.append((name, perf_counter() - started, attributes or {}))
+
+
+class _Tracing(object):
+    tracer = NoopTracer()
+    meter_histogram = None
+    histograms: Dict[str, StageHistogram] = {}
+    record_histograms = config.TRACING_HISTOGRAMS
+
+
+_tracing = _Tracing()
+
+
+def configure_tracing(backend=config.TRACING_BACKEND, tracer=None, meter=None, histograms=None):
+    """ Select the tracer (and the OpenTelemetry meter) used by `span` """
+    if tracer is None:
+        if backend == 'otel':
+            from opentelemetry import trace, metrics
+            tracer = trace.get_tracer('fluvius.domain')
+            meter = meter or metrics.get_meter('fluvius.domain')
+        elif backend == 'log':
+            tracer = LoggingTracer()
+        elif backend == 'memory':
+            tracer = RecordingTracer()
+        else:
+            tracer = NoopTracer()
+
+    _tracing.tracer = tracer
+    _tracing.meter_histogram = meter.create_histogram(
+        'fluvius.command.stage.duration', unit='s', description='Duration of the command pipeline stages'
+    ) if meter is not None else None
+
+    if histograms is not None:
+        _tracing.record_histograms = histograms
+
+    return tracer
+
+
+def get_tracer():
+    return _tracing.tracer
+
+
+def stage_histograms() -> Dict[str, dict]:
+    return {stage: histogram.snapshot() for stage, histogram in _tracing.histograms.items()}
+
+
+def reset_stage_histograms():
+    _tracing.histograms = {}
+
+
+@metrics.collector
+def stage_metrics():
+    histogram = Histogram("fluvius_stage_duration_seconds", "Command pipeline stage durations", ("stage",), HISTOGRAM_BUCKETS)
+    for stage, stage_histogram in list(_tracing.histograms.items()):
+        histogram.values[(stage,)] = [*stage_histogram.buckets, stage_histogram.sum]
+
+    return (histogram,)
+
+
+def record_stage(stage: str, duration: float, attributes=None):
+    if timings := _stage_timings.get():
+        timings.add(stage, duration)
+
+    if _tracing.record_histograms:
+        histogram = _tracing.histograms.get(stage)
+        if histogram is None:
+            histogram = _tracing.histograms[stage] = StageHistogram()
+
+        histogram.observe(duration)
+
+    if _tracing.meter_histogram is not None:
+        _tracing.meter_histogram.record(duration, dict(attributes or {}, stage=stage))
+
+
+@contextmanager
+def span(stage: str, **attributes):
+    started = perf_counter()
+    with _tracing.tracer.start_as_current_span(f"fluvius.{stage}", attributes=attributes or None):
+        try:
+            yield
+        finally:
+            record_stage(stage, perf_counter() - started, attributes)
+
+
+@contextmanager
+def stage_timings():
+    """ Collect the stage timings of the enclosed (request) processing """
+    timings = StageTimings()
+    token = _stage_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _stage_timings.reset(token)
+
+
+def current_stage_timings() -> Optional[StageTimings]:
+    return _stage_timings.get()
+
+
+class timed_exit(object):
+    """ Async context manager proxy that times the exit (e.g. commit) of a transaction as `stage` """
+
+    __slots__ = ('_manager', '_stage')
+
+    def __init__(self, manager, stage: str):
+        self._manager = manager
+        self._stage = stage
+
+    async def __aenter__(self):
+        return await self._manager.__aenter__()
+
+    async def __aexit__(self, *exc_info):
+        with span(self._stage):
+            return await self._manager.__aexit__(*exc_info)
+
+
+async def timed_iter(stage: str, aiter):
+    """ Time only the work done by `aiter`, i.e. excluding the time its consumer spends on each item """
+    elapsed = 0.0
+    iterator = aiter.__aiter__()
+    try:
+        while True:
+            started = perf_counter()
+            try:
+                item = await iterator.__anext__()
+            except StopAsyncIteration:
+                break
+            finally:
+                elapsed += perf_counter() - started
+
+            yield item
+    finally:
+        record_stage(stage, elapsed)
+
+
+if config.TRACING_BACKEND:
+    configure_tracing()
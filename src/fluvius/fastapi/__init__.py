@@ -10,4 +10,7 @@ from .domain import configure_domain_manager
 from .query import configure_query_manager
 from .kcadmin import KCAdmin
 from .media import configure_media
-from .mqtt import configure_mqtt
\ No newline at end of file
+from .mqtt import configure_mqtt
+from .notify import configure_notify
+from .profiler import configure_profiler
+from .metrics import configure_metrics
\ No newline at end of file
@@ -10,6 +10,18 @@ APPLICATION_SERIAL_NUMBER = 1001
 APPLICATION_VERSION = __version__
 AUTH_PROFILE_PROVIDER = None
 
+# Built auth contexts are cached per token fingerprint until the token expires
+AUTH_CONTEXT_CACHE_SIZE = 4096          # 0 disables the cache
+AUTH_CONTEXT_CACHE_TTL = 300            # upper bound (seconds), the token expiry always applies
+AUTH_CONTEXT_CACHE_REDIS_URL = None     # e.g. "redis://localhost:6379/1" to share across workers
+
+# Realm signing keys (JWKS)
+JWKS_URI = None                 # defaults to the Keycloak realm certs endpoint, may be a local file
+JWKS_CACHE_TTL = 3600           # used when the response has no Cache-Control max-age
+JWKS_REFRESH_AHEAD = 300        # background refresh this many seconds before expiry
+JWKS_STALE_GRACE = 86400        # keep serving the previous keys while refreshes fail
+JWKS_MIN_REFRESH_INTERVAL = 30  # throttle for refreshes triggered by an unknown kid
+
 SES_CLIENT_TOKEN_FIELD = "client_token"
 SES_ID_TOKEN_FIELD = "id_token"
 SES_AC_TOKEN_FIELD = "access_token"
@@ -30,9 +42,46 @@ SESSION_COOKIE = "session"
 SAFE_REDIRECT_DOMAINS = ["localhost",]
 RESP_HEADER_IDEMPOTENCY = 'Idempotency-Key'
 RESP_HEADER_RESPONSE_STATUS = 'Response-Status'
+RESP_HEADER_IDEMPOTENT_REPLAYED = 'Idempotent-Replayed'
+
+# Responses of command requests with an `Idempotency-Key` are replayed to retries
+COMMAND_IDEMPOTENCY_TTL = 86400            # retention window (seconds), 0 disables idempotency keys
+COMMAND_IDEMPOTENCY_CACHE_SIZE = 10000     # in-process entries
+COMMAND_IDEMPOTENCY_REDIS_URL = None       # e.g. "redis://localhost:6379/2" to share across workers
+COMMAND_IDEMPOTENCY_WAIT = 30              # seconds a duplicate waits for the in-flight execution
+COMMAND_IDEMPOTENCY_LEASE = 30             # seconds an in-flight reservation outlives a dead worker (renewed while running)
+COMMAND_BATCH_MAX_SIZE = 100   # commands per `/_batch/{domain}` request, 0 disables the batch endpoints
+COMMAND_WORKER_CLIENT = None   # DomainWorkerClient class (path), enables `?async=true` on command endpoints
+COMMAND_JOB_TRACKER = "fluvius.worker.SQLWorkTracker"  # backs the `/_job/{job_id}` status endpoint
+COMMAND_JOB_AUTH_REQUIRED = True
+COMMAND_ENDPOINT_MODE = "route"    # "route": routes per command, "dispatch": one parameterised route set per domain
+OPENAPI_CACHE_PATH = None          # file caching the generated OpenAPI document across restarts (per app version & routes)
+SERVER_TIMING_HEADER = True    # `Server-Timing` header with the stage timings of command requests
+QUERY_CACHE_CONTROL = "private, no-cache"   # Cache-Control of cached query resources (revalidate with ETag)
+QUERY_EXPORT_CHUNK_SIZE = 500  # rows per chunk of streamed exports
+
+# Response compression (zstd requires the `zstandard` package, gzip otherwise) and ETags
+RESPONSE_COMPRESSION = True
+RESPONSE_COMPRESSION_MINIMUM_SIZE = 1024    # bytes, smaller buffered responses are sent as-is
+RESPONSE_COMPRESSION_GZIP_LEVEL = 6
+RESPONSE_COMPRESSION_ZSTD_LEVEL = 3
+RESPONSE_COMPRESSION_EXCLUDED_TYPES = ["image/", "video/", "audio/", "application/zip", "application/gzip", "application/zstd"]
+RESPONSE_ETAG = True                        # content hash ETag / If-None-Match for GET responses
+
+# Request profiler (see `configure_profiler`), settings can be changed at runtime
+PROFILER_ENABLED = False
+PROFILER_SAMPLE_RATE = 0.0          # fraction of requests profiled at random
+PROFILER_HEADER = "X-Fluvius-Profile"   # profile requests carrying this header (or `_profiler` query param)
+PROFILER_KEY = None                 # required header value / admin key. Admin endpoints need it outside developer mode
+PROFILER_BACKEND = "pyinstrument"   # or "cprofile"
+PROFILER_INTERVAL = 0.001           # pyinstrument sampling interval (seconds)
+PROFILER_BUFFER_SIZE = 20           # number of slowest profiles kept
+PROFILER_ADMIN_PATH = "/_profiler"
 
 WHITELIST_DOMAIN = None
 BLACKLIST_DOMAIN = None
+EMAIL_DOMAIN_RESTRICTION_PATH = "./data/email_domain_restriction.txt"
+EMAIL_DOMAIN_RESTRICTION_FILES = []     # Additional restriction lists (one domain per line)
 
 # Redis configuration for MQTT authentication
 REDIS_URL = "redis://localhost:6379"
@@ -45,6 +94,8 @@ MQTT_CLIENT_RETAIN = False
 MQTT_BROKER_HOST = None
 MQTT_BROKER_PORT = 1883
 MQTT_USER_PREFIX = "mqtt"
+MQTT_ACL_TTL = 86400               # seconds, when the token carries no expiry (`exp`)
+MQTT_ACL_HASH_CACHE_SIZE = 4096    # sessions whose client token hash is kept in memory
 MQTT_PERMISSIONS = [
     ("last-will", 4),
     ("notify", 4),
@@ -54,6 +105,31 @@ MQTT_PERMISSIONS = [
 ]
 
 MQTT_DEBUG = True
+MQTT_NOTIFY_WINDOW = 0.05      # seconds notifications are coalesced for (latest wins per `_target`), 0 publishes immediately
+MQTT_NOTIFY_MERGE = False      # publish the coalesced notifications of a channel as one array payload
+MQTT_BATCH_MAX_SIZE = 1000     # pending messages per batch (and window), the oldest are dropped
+MQTT_BATCH_TTL = 300           # batches that are never sent are discarded after (seconds)
+MQTT_STATS_INTERVAL = 60       # log the publish rates every (seconds), 0 disables
+MQTT_OUTBOUND_MAX_SIZE = 10000 # messages buffered while the broker is slow or disconnected
+MQTT_OUTBOUND_POLICY = "drop-oldest"   # when full: "drop-oldest", "drop-newest" or "block"
+MQTT_MAX_INFLIGHT = 100        # unacknowledged QoS>=1 messages handed to the connection
+
+# In-process notification hub (SSE / WebSocket), an alternative to the MQTT broker
+NOTIFY_HUB_PATH = "/_notify"   # `{path}/sse` and `{path}/ws` endpoints
+NOTIFY_AUTH_REQUIRED = True    # subscribe to the user scopes, otherwise to the `scope` query params
+NOTIFY_QUEUE_SIZE = 256        # messages buffered per connection, the oldest are dropped
+NOTIFY_KEEPALIVE = 15          # seconds between keep-alive frames of an idle connection
+NOTIFY_BATCH_MAX_SIZE = 1000   # pending messages per batch, the oldest are dropped
+NOTIFY_BATCH_TTL = 300         # batches that are never sent are discarded after (seconds)
+NOTIFY_REDIS_URL = None        # fan out through Redis pub/sub (multi-process deployments)
+NOTIFY_REDIS_CHANNEL = "fluvius:notify"
+
+# Prometheus metrics (see `configure_metrics`)
+METRICS_PATH = "/metrics"
+METRICS_KEY = None              # required bearer token of the scrapes when set
+METRICS_MULTIPROC_DIR = None    # snapshot directory shared by the worker processes, merged at scrape time
+METRICS_FLUSH_INTERVAL = 5      # seconds between the snapshots of a process
+METRICS_STALE_AFTER = 60        # gauges of the processes that have not written since (seconds) are dropped
 VALIDATE_CSRF_TOKEN = False
 AUTH_REALMS_CONFIG = {}
 ERROR_TRACKING_PROVIDER = "NullTracker" # "PosthogTracker" or "SentryTracker"
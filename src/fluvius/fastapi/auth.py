@@ -1,12 +1,13 @@
 import secrets
 import base64
-import httpx
 import json
 
+from time import perf_counter
+
 from urllib.parse import urlencode
 
 from authlib.integrations.starlette_client import OAuth
-from authlib.jose import jwt, JsonWebKey
+from authlib.jose import jwt
 from authlib.jose.util import extract_header
 from fastapi import Request, Depends, HTTPException, Response
 from fastapi.responses import RedirectResponse, JSONResponse
@@ -32,11 +33,14 @@ from fluvius.auth import (
     event as auth_event,
     helper as auth_helper)
 from fluvius.helper import when
+from fluvius.domain.tracing import span
 from pipe import Pipe
 from typing import Optional, Awaitable, Callable
 
 from . import config, logger
-from .setup import on_startup
+from .setup import on_startup, on_shutdown
+from .auth_cache import AuthContextCache, token_fingerprint
+from .jwks import JWKSCache
 from .helper import uri, generate_client_token, generate_session_id, validate_direct_url
 
 IDEMPOTENCY_KEY = config.RESP_HEADER_IDEMPOTENCY
@@ -62,7 +66,9 @@ def auth_required(inject_ctx=False, **auth_kwargs):
     def decorator(endpoint):
         @wraps(endpoint)
         async def wrapper(request: Request, *args, **kwargs):
-            auth_context = await request.app.state.get_auth_context(request, **auth_kwargs)
+            with span("auth"):
+                auth_context = await request.app.state.get_auth_context(request, **auth_kwargs)
+
             if inject_ctx:
                 return await endpoint(request, auth_context, *args, **kwargs)
 
@@ -124,6 +130,42 @@ class FluviusAuthProfileProvider(object):
     def authorize_claims(self, claims_token: dict) -> KeycloakTokenPayload:
         return KeycloakTokenPayload(**claims_token)
 
+    def get_token_fingerprint(self, request: Request) -> Optional[str]:
+        """ Cache key of the credentials presented by the request (None: not cacheable).
+
+            Cookie requests are authenticated by the signed session (the id token cookie alone is not
+            a credential), they are keyed on the session identity. Bearer tokens are keyed on the token. """
+        if request.cookies.get(config.SES_ID_TOKEN_FIELD):
+            user = (request.scope.get("session") or {}).get(config.SES_USER_FIELD) or {}
+            session_id = user.get("session_id")
+            return token_fingerprint(f"session:{session_id}") if session_id else None
+
+        auth_header = request.headers.get("Authorization")
+        if auth_header and auth_header.lower().startswith("bearer "):
+            return token_fingerprint(auth_header[7:])
+
+        return None
+
+    async def invalidate_auth_context(self, request: Request):
+        """ Forget the cached context of the request credentials (logout, profile switch, etc.) """
+        cache = getattr(request.app.state, 'auth_context_cache', None)
+        if cache and (fingerprint := self.get_token_fingerprint(request)):
+            await cache.invalidate(fingerprint)
+
+    async def ensure_signing_key(self, request: Request):
+        """ Make sure the key of a bearer token is known, refreshing the key set on an unknown kid """
+        jwks_cache = getattr(request.app.state, 'jwks_cache', None)
+        auth_header = request.headers.get("Authorization")
+        if not (jwks_cache and auth_header and auth_header.lower().startswith("bearer ")):
+            return
+
+        try:
+            kid = auth_helper.extract_jwt_kid(auth_header[7:])
+        except Exception:
+            return  # Malformed token, reported by the decoder
+
+        await jwks_cache.ensure_kid(kid)
+
     def get_auth_token(self, request: Request) -> Optional[str]:
         if request.cookies.get(config.SES_ID_TOKEN_FIELD):
             return request.session.get(config.SES_USER_FIELD)
@@ -135,15 +177,39 @@ class FluviusAuthProfileProvider(object):
         return None
 
     async def get_auth_context(self, request: Request, **kwargs) -> Optional[AuthorizationContext]:
+        cache = getattr(request.app.state, 'auth_context_cache', None)
+        fingerprint = self.get_token_fingerprint(request) if cache else None
+        timing = request.state.auth_timing = {}
+
+        if fingerprint:
+            started = perf_counter()
+            auth_context = await cache.get(fingerprint)
+            timing['cache'] = perf_counter() - started
+            if auth_context is not None:
+                return auth_context
+
+        started = perf_counter()
         try:
+            await self.ensure_signing_key(request)
             auth_token = self.get_auth_token(request)
             if not auth_token:
                 return None
             auth_user = self.authorize_claims(auth_token)
         except (KeyError, ValueError):
             raise UnauthorizedError("S00.004", "Authorization Failed: Missing or invalid claims token")
+        finally:
+            timing['decode'] = perf_counter() - started
 
+        started = perf_counter()
         auth_context = await self.setup_context(auth_user)
+        timing['lookup'] = perf_counter() - started
+
+        if fingerprint:
+            await cache.set(fingerprint, auth_context, getattr(auth_user, 'exp', None))
+
+        if DEVELOPER_MODE:
+            logger.debug('Auth context built [decode: %.6fs, lookup: %.6fs]', timing['decode'], timing['lookup'])
+
         return auth_context
 
     async def setup_context(self, auth_user: KeycloakTokenPayload) -> AuthorizationContext:
@@ -180,7 +246,7 @@ class FluviusAuthProfileProvider(object):
         iamroles = tuple(role for role in realm_roles if role in ('sysadmin', 'operator', 'admin'))
 
         # Extract realm from token issuer or use a default
-        realm = getattr(auth_user, 'iss', '').split('/realms/')[-1] if hasattr(auth_user, 'iss') else 'default'
+        realm = str(auth_user.iss).split('/realms/')[-1] if getattr(auth_user, 'iss', None) else 'default'
 
         return AuthorizationContext(
             realm = realm,
@@ -235,14 +301,36 @@ def configure_authentication(app, config=config, base_path="/auth", auth_profile
         return oauth
 
 
+    if config.AUTH_CONTEXT_CACHE_SIZE:
+        app.state.auth_context_cache = AuthContextCache(
+            maxsize=config.AUTH_CONTEXT_CACHE_SIZE,
+            ttl=config.AUTH_CONTEXT_CACHE_TTL,
+            redis_url=config.AUTH_CONTEXT_CACHE_REDIS_URL
+        )
+
+    def set_jwks_keyset(app, keyset):
+        app.state.jwks_keyset = keyset  # Store JWKS in app state
+        if cache := getattr(app.state, 'auth_context_cache', None):
+            cache.rotate(keyset)
+
+    app.state.jwks_cache = JWKSCache(
+        config.JWKS_URI or KEYCLOAK_JWKS_URI,
+        on_refresh=lambda keyset: set_jwks_keyset(app, keyset)
+    )
+
     # Async code at server startup
     @on_startup
     async def fetch_jwks_keyset_on_startup(app):
-        async with httpx.AsyncClient() as client:
-            response = await client.get(KEYCLOAK_JWKS_URI)
-            data = response.json()
+        await app.state.jwks_cache.start()
+
+    @on_shutdown
+    async def stop_jwks_refresh(app):
+        await app.state.jwks_cache.stop()
 
-        app.state.jwks_keyset = JsonWebKey.import_key_set(data)  # Store JWKS in app state
+    @on_shutdown
+    async def close_auth_context_cache(app):
+        if cache := getattr(app.state, 'auth_context_cache', None):
+            await cache.close()
 
     @on_startup
     async def setup_auth_profile_provider(app):
@@ -253,7 +341,8 @@ def configure_authentication(app, config=config, base_path="/auth", auth_profile
         else:
             raise BadRequestError('S00.001', f'Invalid Auth Profile Provider: {auth_profile_provider}')
 
-        app.state.get_auth_context = provider_cls(app).get_auth_context
+        app.state.auth_profile_provider = provider_cls(app)
+        app.state.get_auth_context = app.state.auth_profile_provider.get_auth_context
 
 
     # === Routes ===
@@ -270,6 +359,7 @@ def configure_authentication(app, config=config, base_path="/auth", auth_profile
         if not id_token:
             raise HTTPException(status_code=400, detail="Missing ID token")
 
+        await request.app.state.jwks_cache.ensure_kid(auth_helper.extract_jwt_kid(id_token))
         id_data = auth_helper.decode_id_token(request.app.state.jwks_keyset, id_token, KEYCLOAK_ISSUER, KEYCLOAK_CLIENT_ID)
         ac_data = auth_helper.decode_ac_token(request.app.state.jwks_keyset, ac_token)
 
@@ -369,6 +459,7 @@ def configure_authentication(app, config=config, base_path="/auth", auth_profile
             # No valid session, just redirect
             keycloak_logout_url = redirect_uri
 
+        await request.app.state.auth_profile_provider.invalidate_auth_context(request)
         request.session.clear()
         response = RedirectResponse(url=keycloak_logout_url)
         response.delete_cookie(
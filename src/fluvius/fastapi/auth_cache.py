@@ -0,0 +1,123 @@
+"""
+Cache of built `AuthorizationContext` objects keyed by the token fingerprint.
+
+A token is only ever decoded, verified and turned into an auth context once for
+as long as it is valid: the entry expires with the token (capped at
+`AUTH_CONTEXT_CACHE_TTL`). The in-process LRU is always used; a Redis tier is
+added when `AUTH_CONTEXT_CACHE_REDIS_URL` is set so that workers share entries.
+
+Redis keys embed the realm key-set generation, therefore a key rotation
+invalidates every entry on every worker without scanning Redis.
+"""
+import hashlib
+import time
+
+from typing import Optional
+
+from fluvius.auth import AuthorizationContext
+from fluvius.helper import LRUCache
+
+from . import config, logger
+
+REDIS_KEY_PREFIX = "fluvius:auth-ctx"
+
+
+def token_fingerprint(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def keyset_generation(jwks_keyset) -> str:
+    """ Stable identifier of a realm key set (the sorted key ids) """
+    kids = sorted(str(k.kid) for k in getattr(jwks_keyset, 'keys', ()) or ())
+    return hashlib.sha256(",".join(kids).encode('utf-8')).hexdigest()[:16]
+
+
+class AuthContextCache(object):
+    def __init__(self, maxsize=config.AUTH_CONTEXT_CACHE_SIZE, ttl=config.AUTH_CONTEXT_CACHE_TTL,
+                 redis_url=config.AUTH_CONTEXT_CACHE_REDIS_URL, context_cls=AuthorizationContext):
+        self._ttl = ttl
+        self._local = LRUCache(maxsize)
+        self._redis_url = redis_url
+        self._redis = None
+        self._context_cls = context_cls
+        self._generation = '0'
+
+    @property
+    def generation(self):
+        return self._generation
+
+    @property
+    def redis(self):
+        if self._redis is None and self._redis_url:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(self._redis_url, encoding="utf-8", decode_responses=True)
+
+        return self._redis
+
+    def _redis_key(self, fingerprint):
+        return f"{REDIS_KEY_PREFIX}:{self._generation}:{fingerprint}"
+
+    def _ttl_for(self, expires_at: Optional[int]) -> float:
+        if not expires_at:
+            return self._ttl
+
+        return min(self._ttl, expires_at - time.time())
+
+    async def get(self, fingerprint: str) -> Optional[AuthorizationContext]:
+        auth_context = self._local.get(fingerprint)
+        if auth_context is not None or self.redis is None:
+            return auth_context
+
+        try:
+            key = self._redis_key(fingerprint)
+            data = await self.redis.get(key)
+            if data is None:
+                return None
+
+            ttl = await self.redis.ttl(key)
+        except Exception as e:
+            logger.warning('Auth context cache (redis) lookup failed: %s', e)
+            return None
+
+        auth_context = self._context_cls.model_validate_json(data)
+        self._local.set(fingerprint, auth_context, ttl=ttl if ttl and ttl > 0 else None)
+        return auth_context
+
+    async def set(self, fingerprint: str, auth_context: AuthorizationContext, expires_at: Optional[int] = None):
+        ttl = self._ttl_for(expires_at)
+        if ttl <= 0:
+            return
+
+        self._local.set(fingerprint, auth_context, ttl=ttl)
+        if self.redis is None:
+            return
+
+        try:
+            await self.redis.set(self._redis_key(fingerprint), auth_context.model_dump_json(), ex=max(1, int(ttl)))
+        except Exception as e:
+            logger.warning('Auth context cache (redis) update failed: %s', e)
+
+    async def invalidate(self, fingerprint: str):
+        """ Drop a single token, e.g. on logout or profile switch """
+        self._local.pop(fingerprint)
+        if self.redis is None:
+            return
+
+        try:
+            await self.redis.delete(self._redis_key(fingerprint))
+        except Exception as e:
+            logger.warning('Auth context cache (redis) invalidation failed: %s', e)
+
+    def rotate(self, jwks_keyset):
+        """ Realm key set has changed: drop every context built with the previous keys """
+        generation = keyset_generation(jwks_keyset)
+        if generation == self._generation:
+            return
+
+        self._generation = generation
+        self._local.clear()
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
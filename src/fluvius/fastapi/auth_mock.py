@@ -4,6 +4,7 @@ from typing import Literal, Optional, Awaitable, Callable
 from fluvius.error import BadRequestError
 
 from .auth import FluviusAuthProfileProvider
+from .auth_cache import token_fingerprint
 
 
 class FluviusMockProfileProvider(FluviusAuthProfileProvider):
@@ -42,6 +43,10 @@ class FluviusMockProfileProvider(FluviusAuthProfileProvider):
         }
     }
 
+    def get_token_fingerprint(self, request: Request) -> Optional[str]:
+        auth_header = request.headers.get("Authorization")
+        return token_fingerprint(auth_header) if auth_header else None
+
     def get_auth_token(self, request: Request) -> Optional[str]:
         auth_header = request.headers.get("Authorization")
         if auth_header and not auth_header.startswith("MockAuth "):
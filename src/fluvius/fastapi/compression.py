@@ -0,0 +1,171 @@
+"""
+Response compression.
+
+Responses are compressed with zstd when the client accepts it and the
+`zstandard` package is installed, else with gzip. Buffered responses smaller
+than `RESPONSE_COMPRESSION_MINIMUM_SIZE` and already encoded or binary media
+types are sent as-is. Streamed responses (e.g. exports) are compressed chunk by
+chunk and flushed after every chunk, so they keep streaming.
+"""
+import zlib
+
+from typing import Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from . import config
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+class GzipEncoder(object):
+    name = "gzip"
+
+    def __init__(self, level=config.RESPONSE_COMPRESSION_GZIP_LEVEL):
+        self._level = level
+        self._stream = None
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self._level, wbits=31)
+
+    def compress_chunk(self, data: bytes, final=False) -> bytes:
+        if self._stream is None:
+            self._stream = zlib.compressobj(self._level, zlib.DEFLATED, 31)
+
+        chunk = self._stream.compress(data)
+        return chunk + self._stream.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class ZstdEncoder(object):
+    name = "zstd"
+
+    def __init__(self, level=config.RESPONSE_COMPRESSION_ZSTD_LEVEL):
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._stream = None
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def compress_chunk(self, data: bytes, final=False) -> bytes:
+        if self._stream is None:
+            self._stream = self._compressor.compressobj()
+
+        chunk = self._stream.compress(data)
+        return chunk + self._stream.flush(
+            zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        )
+
+
+ENCODERS = {"gzip": GzipEncoder}
+if zstandard is not None:
+    ENCODERS = {"zstd": ZstdEncoder, **ENCODERS}   # Preferred when accepted
+
+
+def select_encoding(accept_encoding: Optional[str], available: Iterable[str]) -> Optional[str]:
+    """ First of `available` accepted by the client (q > 0) """
+    accepted = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        qvalue = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                qvalue = float(params[2:])
+            except ValueError:
+                qvalue = 0.0
+
+        accepted[name.strip().lower()] = qvalue
+
+    for name in available:
+        if accepted.get(name, accepted.get("*", 0.0)) > 0:
+            return name
+
+    return None
+
+
+class CompressionMiddleware(object):
+    def __init__(self, app, minimum_size=config.RESPONSE_COMPRESSION_MINIMUM_SIZE,
+                 excluded_types: Iterable[str] = tuple(config.RESPONSE_COMPRESSION_EXCLUDED_TYPES),
+                 encoders=None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.excluded_types = tuple(excluded_types)
+        self.encoders = encoders or ENCODERS
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        encoding = select_encoding(Headers(scope=scope).get("accept-encoding"), self.encoders)
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        encoder = self.encoders[encoding]()
+        start = None
+        mode = None     # None (undecided) / "identity" / "buffered" / "stream"
+
+        async def send_wrapper(message):
+            nonlocal start, mode
+
+            if message["type"] == "http.response.start":
+                start = message
+                return
+
+            if mode == "identity":
+                return await send(message)
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if mode is None:
+                headers = MutableHeaders(raw=start["headers"])
+                if not self._compressible(start["status"], headers) or \
+                        (not more_body and len(body) < self.minimum_size):
+                    mode = "identity"
+                    await send(start)
+                    return await send(message)
+
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+
+                if not more_body:
+                    mode = "buffered"
+                    body = encoder.compress(body)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    return await send({"type": "http.response.body", "body": body})
+
+                mode = "stream"
+                del headers["Content-Length"]
+                await send(start)
+
+            await send({
+                "type": "http.response.body",
+                "body": encoder.compress_chunk(body, final=not more_body),
+                "more_body": more_body,
+            })
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _compressible(self, status, headers) -> bool:
+        if status < 200 or status in (204, 206, 304) or "content-encoding" in headers:
+            return False
+
+        content_type = headers.get("content-type", "")
+        return not content_type.startswith(self.excluded_types)
+
+
+def setup_compression(app, compression=config.RESPONSE_COMPRESSION, etag=config.RESPONSE_ETAG):
+    """ ETags are computed on the uncompressed body, i.e. before compression """
+    from .conditional import ConditionalGetMiddleware
+
+    if etag:
+        app.add_middleware(ConditionalGetMiddleware)
+
+    if compression:
+        app.add_middleware(CompressionMiddleware)
+
+    return app
@@ -0,0 +1,109 @@
+"""
+Conditional GET (ETag / If-None-Match).
+
+Endpoints that know the version of their result up front (cached query results,
+items with an `_etag` column) answer `304 Not Modified` before the result is
+serialised, see `conditional_response`. Every other successful GET response gets
+a weak ETag computed from a hash of its body by `ConditionalGetMiddleware`.
+HEAD responses have no body to hash and streamed responses are passed through
+unchanged, unless the endpoint set the ETag itself.
+"""
+import hashlib
+
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+SAFE_METHODS = ("GET", "HEAD")
+NOT_MODIFIED_HEADERS = ("cache-control", "content-location", "date", "etag", "expires", "vary")
+
+
+def weak_etag(value) -> str:
+    value = str(value)
+    if value.startswith(('W/"', '"')):
+        return value
+
+    return f'W/"{value}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """ Weak comparison (RFC 9110, 13.1.2) of `etag` against an If-None-Match header """
+    if not if_none_match or not etag:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def conditional_response(request, content, etag, response_class, headers=None) -> Response:
+    """ `304 Not Modified` if the client already has `etag`, otherwise serialise `content` """
+    headers = dict(headers or {}, ETag=weak_etag(etag))
+
+    if request.method in SAFE_METHODS and etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    return response_class(content, headers=headers)
+
+
+class ConditionalGetMiddleware(object):
+    """ Adds a content hash ETag to buffered GET responses and short-circuits them to 304 """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in SAFE_METHODS:
+            return await self.app(scope, receive, send)
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, passthrough
+
+            if passthrough:
+                return await send(message)
+
+            if message["type"] == "http.response.start":
+                if message["status"] != 200:
+                    passthrough = True
+                    return await send(message)
+
+                start = message
+                return
+
+            # Streamed response, the full body is not known
+            if message.get("more_body", False):
+                passthrough = True
+                await send(start)
+                return await send(message)
+
+            headers = MutableHeaders(raw=start["headers"])
+            etag = headers.get("etag")
+            if etag is None and scope["method"] == "HEAD":
+                # The body hash of GET is not known, a hash of the HEAD body would never match it
+                passthrough = True
+                await send(start)
+                return await send(message)
+
+            if etag is None:
+                etag = weak_etag(hashlib.blake2b(message.get("body", b""), digest_size=16).hexdigest())
+                headers["ETag"] = etag
+
+            if etag_matches(if_none_match, etag):
+                await send({
+                    "type": "http.response.start",
+                    "status": 304,
+                    "headers": [(k, v) for k, v in headers.raw if k.decode("latin-1") in NOT_MODIFIED_HEADERS],
+                })
+                return await send({"type": "http.response.body", "body": b""})
+
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
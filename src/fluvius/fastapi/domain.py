@@ -1,26 +1,45 @@
 import os
 
 
-from typing import Annotated, Union, Any, Optional, Dict
+from typing import Annotated, Union, Any, Optional, Dict, List
 from types import SimpleNamespace
 from fastapi import Request, Path, Body, Query
-from fluvius.data import UUID_TYPE, DataModel, UUID_GENR
+from pydantic import Field, ValidationError
+from fluvius.data import UUID_TYPE, DataModel, UUID_GENR, serialize_mapping
+from fluvius.data.exceptions import ItemNotFoundError
 from fluvius.data.serializer import serialize_json
 from fluvius.domain import Domain
 from fluvius.domain.context import DomainContext, DomainTransport, DomainServiceProxy
 from fluvius.domain.manager import DomainManager
+from fluvius.domain.tracing import span, stage_timings
 from fluvius.query import FrontendQuery, QueryResourceMeta
+from fluvius.query.cache import setup_cache_invalidation
 from fluvius.query.helper import scope_decoder
 from fluvius.helper import load_class
-from fluvius.error import InternalServerError
+from fluvius.error import InternalServerError, BadRequestError, NotFoundError, FluviusException
+from functools import cache, wraps
 from pipe import Pipe
 
 from . import logger, config
 from .auth import auth_required
 from .helper import uri, SCOPE_SELECTOR
+from .idempotency import IdempotencyStore
+from .response import FastJSONResponse
+from .setup import on_shutdown
+
+ASYNC_PARAM_DESC = "Enqueue the command for the domain worker. Responds with `202` and a job id, see `/_job/{job_id}`"
+ASYNC_DROPPED_HEADERS = ("authorization", "cookie")
+IDEMPOTENCY_KEY = config.RESP_HEADER_IDEMPOTENCY
+ENDPOINT_MODES = ("route", "dispatch")
+NEW_RESOURCE = ":new"
 
 
 class FastAPIDomainManager(DomainManager):
+    __response_class__ = FastJSONResponse
+    __worker_client__ = config.COMMAND_WORKER_CLIENT    # DomainWorkerClient (class or path), enables `?async=true`
+    __job_tracker__ = config.COMMAND_JOB_TRACKER        # Worker job tracker (or path) backing `/_job/{job_id}`
+    __endpoint_mode__ = config.COMMAND_ENDPOINT_MODE    # "route" (per command) or "dispatch" (per domain)
+
     def __init__(self, app):
         super().__init__()
         self._app = app
@@ -29,22 +48,71 @@ class FastAPIDomainManager(DomainManager):
     def app(self):
         return self._app
 
+    def create_worker_client(self):
+        if not self.__worker_client__:
+            return None
+
+        from fluvius.worker import DomainWorkerClient
+        return load_class(self.__worker_client__, DomainWorkerClient)()
+
+    def create_idempotency_store(self):
+        if not config.COMMAND_IDEMPOTENCY_TTL:
+            return None
+
+        store = IdempotencyStore()
+
+        @on_shutdown
+        async def close_idempotency_store(app):
+            await store.close()
+
+        return store
+
     def setup_domain_endpoints(self):
+        if self.__endpoint_mode__ not in ENDPOINT_MODES:
+            raise InternalServerError('S00.311', f'Invalid command endpoint mode: {self.__endpoint_mode__}')
+
         self.initialize_domains(self.app)
+        worker_client = self.create_worker_client()
+        idempotency = self.create_idempotency_store()
+
         def _setup_domain(domain):
             namespace = domain.Meta.namespace
             metadata_uri = f"/_meta/{namespace}/"
-            cmd_details = {
-                cmd['key']: cmd for cmd in
-                (
-                    register_command_handler(self.app, *params)
-                    for params in self._enumerate_command_handlers(domain)
-                ) if cmd is not None
-            }
+            dispatcher = {} if self.__endpoint_mode__ == "dispatch" else None
+            commands = {}
+            for params in self._enumerate_command_handlers(domain):
+                cmd_info = register_command_handler(
+                    self.app, *params,
+                    response_class=self.__response_class__,
+                    worker_client=worker_client,
+                    idempotency=idempotency,
+                    dispatcher=dispatcher
+                )
+                if cmd_info is not None:
+                    commands[cmd_info['key']] = (params[1], cmd_info)
+
+            if dispatcher is not None:
+                register_command_dispatcher(self.app, domain, dispatcher, response_class=self.__response_class__)
+
+            if config.COMMAND_BATCH_MAX_SIZE:
+                register_batch_handler(
+                    self.app, domain, self._enumerate_command_handlers(domain),
+                    response_class=self.__response_class__,
+                    idempotency=idempotency
+                )
+
+            metadata = None
 
             @self.app.get(metadata_uri, summary=f"Domain Metadata [{domain.Meta.name}]", tags=['Metadata'])
             async def domain_metadata(request: Request):
-                return domain.metadata(commands = cmd_details)
+                # Generated (with the command schemas) on first request
+                nonlocal metadata
+                if metadata is None:
+                    metadata = domain.metadata(commands={
+                        key: command_metadata(cmd_cls, cmd_info) for key, (cmd_cls, cmd_info) in commands.items()
+                    })
+
+                return self.__response_class__(metadata)
 
             return {
                 "id": namespace,
@@ -57,6 +125,11 @@ class FastAPIDomainManager(DomainManager):
             }
 
         tags = [_setup_domain(domain) for domain in self._domains]
+        if worker_client:
+            # Jobs are looked up with the tracker that registered them, if the client has one
+            tracker = worker_client._tracker or load_class(self.__job_tracker__)
+            register_job_endpoints(self.app, tracker, response_class=self.__response_class__)
+
         self.app.openapi_tags = self.app.openapi_tags or []
         self.app.openapi_tags.extend(tags)
 
@@ -73,7 +146,39 @@ class FastAPIDomainManager(DomainManager):
         return app
 
 
-def register_command_handler(app, domain, cmd_cls, cmd_key, fq_name):
+def server_timing(name):
+    ''' Time the whole command request (incl. authentication) and report the stages in `Server-Timing` '''
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with stage_timings() as timings:
+                with span("command", command=name):
+                    response = await func(*args, **kwargs)
+
+            response.headers["Server-Timing"] = timings.server_timing()
+            return response
+
+        return wrapper
+    return decorator
+
+
+@cache
+def command_schema(cmd_cls) -> dict:
+    """ JSON schema of the command payload, generated on first use """
+    return cmd_cls.Data.model_json_schema()
+
+
+def command_metadata(cmd_cls, cmd_info) -> dict:
+    return cmd_info | {"schema": command_schema(cmd_cls)}
+
+
+def register_command_handler(app, domain, cmd_cls, cmd_key, fq_name, response_class=FastJSONResponse, worker_client=None, idempotency=None, dispatcher=None):
+    """
+    Register the endpoints of a command and return its metadata (without the payload schema, see `command_metadata`).
+
+    With a `dispatcher` (dict), the handler is added to it instead, to be served by the
+    routes of `register_command_dispatcher`.
+    """
     if cmd_cls.Meta.internal:
         # Note: Internal commands are not exposed to the API, registered for worker only.
         return None
@@ -85,17 +190,19 @@ def register_command_handler(app, domain, cmd_cls, cmd_key, fq_name):
     endpoint_info = dict(
         summary=cmd_cls.Meta.name,
         description=cmd_cls.Meta.desc,
-        tags=domain.Meta.tags
+        tags=domain.Meta.tags,
+        response_class=response_class
     )
 
-    def endpoint(*paths, base=f"/{fq_name}", method=app.post, auth={}, **kwargs):
+    def endpoint(*paths, base=f"/{fq_name}", method=app.post, auth={}, timing=config.SERVER_TIMING_HEADER, **kwargs):
         api_decorator = method(uri(base, *paths), **(endpoint_info | kwargs))
+        timing_decorator = server_timing(fq_name) if timing else (lambda func: func)
         if not cmd_cls.Meta.auth_required:
-            return api_decorator
+            return lambda func: api_decorator(timing_decorator(func))
 
         auth_decorator = auth_required(**auth)
         def _api_def(func):
-            return api_decorator(auth_decorator(func))
+            return api_decorator(timing_decorator(auth_decorator(func)))
 
         return _api_def
 
@@ -104,10 +211,21 @@ def register_command_handler(app, domain, cmd_cls, cmd_key, fq_name):
         payload: PayloadType,  # type: ignore
         resource: str,
         identifier: Optional[UUID_TYPE] = None,
-        scope: Optional[dict] = None
+        scope: Optional[dict] = None,
+        run_async: bool = False
     ) -> Any:
         identifier = identifier or UUID_GENR()
-        
+
+        if run_async and worker_client is None:
+            raise BadRequestError('S00.306', f'Asynchronous processing is not enabled for command [{fq_name}]')
+
+        execute = lambda: _execute_command(request, payload, resource, identifier, scope, run_async)
+        if idempotency and (idempotency_key := request.headers.get(IDEMPOTENCY_KEY)):
+            return await idempotency.execute(request, idempotency_key, request_user_id(request), execute)
+
+        return await execute()
+
+    async def _execute_command(request, payload, resource, identifier, scope, run_async):
         with domain.session(
             authorization=getattr(request.state, 'auth_context', None),
             headers=dict(request.headers),
@@ -127,31 +245,55 @@ def register_command_handler(app, domain, cmd_cls, cmd_key, fq_name):
                 )
             )
 
+            if run_async:
+                return await submit_command(request, domain, worker_client, command, fq_name, response_class)
+
             responses = await domain.process_command(command)
-            return {
-                "data": responses,
-                "status": "OK"
-            }
+            with span("serialize"):
+                return response_class({
+                    "data": responses,
+                    "status": "OK"
+                })
 
 
+    identifier_spec = NEW_RESOURCE if cmd_cls.Meta.resource_init else "{identifier}"
     cmd_endpoints = {'meta': f"/_meta/{fq_name}/"}
+    if unscoped_path:
+        cmd_endpoints['path'] = uri(f"/{fq_name}", "{resource}", identifier_spec)
+
     if scope_schema:
+        cmd_endpoints['scoped'] = uri(f"/{fq_name}", SCOPE_SELECTOR, "{resource}", identifier_spec)
         scope_keys = list(scope_schema.keys())
 
+    cmd_metadata = {
+        "key": cmd_cls.Meta.key,
+        "name": cmd_cls.Meta.name,
+        "description": cmd_cls.Meta.desc,
+        "urls": cmd_endpoints,
+        "genid": cmd_cls.Meta.resource_init
+    }
+
+    if dispatcher is not None:
+        handler = _command_handler
+        if cmd_cls.Meta.auth_required:
+            handler = auth_required()(handler)
+
+        if config.SERVER_TIMING_HEADER:
+            handler = server_timing(fq_name)(handler)
+
+        dispatcher[cmd_key] = (cmd_cls, cmd_metadata, handler)
+        return cmd_metadata
+
     @endpoint(
         base=f"/_meta/{fq_name}/",
         method=app.get,
+        timing=False,
         summary=cmd_cls.Meta.name,
         description=cmd_cls.Meta.desc, tags=["Metadata"])
-    async def command_metadata(request: Request):
-        return cmd_metadata
-
-    identifier_spec = "{identifier}"
-    if cmd_cls.Meta.resource_init:
-        identifier_spec = ":new"
+    async def command_metadata_handler(request: Request):
+        return command_metadata(cmd_cls, cmd_metadata)
 
     if unscoped_path:
-        cmd_endpoints['path'] = uri(f"/{fq_name}", "{resource}", identifier_spec)
         @endpoint(
             "{resource}",
             identifier_spec,
@@ -163,11 +305,11 @@ def register_command_handler(app, domain, cmd_cls, cmd_key, fq_name):
             payload: PayloadType,  # type: ignore
             resource: Annotated[str, Path(description=cmd_cls.Meta.resource_desc)],
             identifier: Optional[UUID_TYPE] = None,
+            run_async: Annotated[bool, Query(alias="async", description=ASYNC_PARAM_DESC)] = False,
         ):
-            return await _command_handler(request, payload, resource, identifier, {})
+            return await _command_handler(request, payload, resource, identifier, {}, run_async)
 
     if scope_schema:
-        cmd_endpoints['scoped'] = uri(f"/{fq_name}", SCOPE_SELECTOR, "{resource}", identifier_spec)
         @endpoint(
             SCOPE_SELECTOR,
             "{resource}",
@@ -181,24 +323,326 @@ def register_command_handler(app, domain, cmd_cls, cmd_key, fq_name):
             resource: Annotated[str, Path(description=cmd_cls.Meta.resource_desc)],
             scoping: Annotated[str, Path(description=f"Resource scoping: `{', '.join(scope_keys)}`. E.g. `domain_sid~H9cNmGXLEc8NWcZzSThA9S`")],
             identifier: Annotated[UUID_TYPE, Path(description="Resource identifier")],
+            run_async: Annotated[bool, Query(alias="async", description=ASYNC_PARAM_DESC)] = False,
         ):
             scope = scope_decoder(scoping, scope_schema)
-            return await _command_handler(request, payload, resource, identifier, scope)
+            return await _command_handler(request, payload, resource, identifier, scope, run_async)
 
+    return cmd_metadata
 
-    cmd_metadata ={
-        "key": cmd_cls.Meta.key,
-        "name": cmd_cls.Meta.name,
-        "description": cmd_cls.Meta.desc,
-        "schema": cmd_cls.Data.model_json_schema(),
-        "urls": cmd_endpoints,
-        "genid": cmd_cls.Meta.resource_init
+
+def register_command_dispatcher(app, domain, dispatcher, response_class=FastJSONResponse):
+    """
+    Serve all the commands of a domain with parameterised routes (`COMMAND_ENDPOINT_MODE = "dispatch"`).
+
+    The URLs are the same as the per command routes, the payload is validated by the
+    command (not by FastAPI) and the OpenAPI document lists the routes once per domain.
+    """
+    namespace = domain.Meta.namespace
+    base = f"/{namespace}:{{command}}"
+
+    def lookup(command):
+        if (entry := dispatcher.get(command)) is None:
+            raise NotFoundError('S00.312', f'Unknown command [{namespace}:{command}]')
+
+        return entry
+
+    async def dispatch(request: Request, command: str, resource: str, identifier: str, scoping: Optional[str], run_async: bool):
+        cmd_cls, _, handler = lookup(command)
+        if cmd_cls.Meta.resource_init != (identifier == NEW_RESOURCE):
+            raise NotFoundError('S00.312', f'Unknown command endpoint [{namespace}:{command}/{resource}/{identifier}]')
+
+        scope_schema = cmd_cls.Meta.scope_required or cmd_cls.Meta.scope_optional
+        if scoping is None:
+            if cmd_cls.Meta.scope_required:
+                raise BadRequestError('S00.304', f'Scoping is required for command [{command}]')
+            scope = {}
+        elif not scope_schema:
+            raise BadRequestError('S00.303', f'Scoping is not allowed for command [{command}]')
+        else:
+            scope = scope_decoder(scoping, scope_schema)
+
+        try:
+            identifier = None if cmd_cls.Meta.resource_init else UUID_TYPE(identifier)
+        except ValueError:
+            raise BadRequestError('S00.313', f'Invalid resource identifier: {identifier}')
+
+        payload = await request.json() if await request.body() else {}
+        return await handler(request, payload, resource, identifier, scope, run_async)
+
+    endpoint_info = dict(tags=domain.Meta.tags, response_class=response_class)
+
+    @app.post(uri(base, "{resource}", "{identifier}"), summary=f"Command [{domain.Meta.name}]", **endpoint_info)
+    async def command_dispatcher(
+        request: Request,
+        command: Annotated[str, Path(description="Command key")],
+        resource: Annotated[str, Path()],
+        identifier: Annotated[str, Path(description=f"Resource identifier, `{NEW_RESOURCE}` for commands creating a resource")],
+        run_async: Annotated[bool, Query(alias="async", description=ASYNC_PARAM_DESC)] = False,
+    ):
+        return await dispatch(request, command, resource, identifier, None, run_async)
+
+    @app.post(uri(base, SCOPE_SELECTOR, "{resource}", "{identifier}"), summary=f"Command [{domain.Meta.name}] (Scoped)", **endpoint_info)
+    async def scoped_command_dispatcher(
+        request: Request,
+        command: Annotated[str, Path(description="Command key")],
+        scope: Annotated[str, Path(description="Resource scoping. E.g. `domain_sid~H9cNmGXLEc8NWcZzSThA9S`")],
+        resource: Annotated[str, Path()],
+        identifier: Annotated[str, Path(description=f"Resource identifier, `{NEW_RESOURCE}` for commands creating a resource")],
+        run_async: Annotated[bool, Query(alias="async", description=ASYNC_PARAM_DESC)] = False,
+    ):
+        return await dispatch(request, command, resource, identifier, scope, run_async)
+
+    @app.get(f"/_meta/{namespace}:{{command}}/", summary=f"Command Metadata [{domain.Meta.name}]", tags=["Metadata"])
+    async def command_metadata_dispatcher(request: Request, command: Annotated[str, Path()]):
+        cmd_cls, cmd_info, _ = lookup(command)
+        return command_metadata(cmd_cls, cmd_info)
+
+    return app
+
+def request_user_id(request: Request):
+    """ Idempotency keys are scoped to the authenticated user """
+    if auth := getattr(request.state, 'auth_context', None):
+        return auth.user._id
+
+    return None
+
+
+def worker_context(request: Request, domain):
+    from fluvius.worker.datadef import WorkerContext, WorkerAudit
+
+    audit = WorkerAudit()
+    if auth := getattr(request.state, 'auth_context', None):
+        audit = WorkerAudit(
+            user_id=auth.user._id,
+            profile_id=auth.profile.id,
+            organization_id=auth.organization.id,
+            realm=auth.realm,
+            iam_roles=list(auth.iamroles),
+        )
+
+    return WorkerContext(
+        audit=audit,
+        source=request.client.host,
+        realm=audit.realm,
+        domain=domain.namespace,
+        revision=domain.revision,
+    )
+
+
+async def submit_command(request: Request, domain, worker_client, command, fq_name, response_class=FastJSONResponse):
+    """ Authorize `command` and enqueue it for the domain worker. Responds with 202 and the job id """
+    with span("policy"):
+        await domain.authorize_command(domain.context, command.set(
+            context=domain.context.data._id,
+            domain=domain.namespace,
+            revision=domain.revision
+        ))
+
+    # Credentials are not forwarded to the job queue, the worker trusts the authorized request
+    headers = {k: v for k, v in request.headers.items() if k not in ASYNC_DROPPED_HEADERS}
+    with span("enqueue"):
+        job = await worker_client.send(
+            fq_name,
+            _context=worker_context(request, domain),
+            _headers=headers,
+            command=command.command,
+            resource=command.resource,
+            identifier=command.identifier,
+            domain_sid=command.domain_sid,
+            domain_iid=command.domain_iid,
+            payload=serialize_mapping(command.payload),
+        )
+
+    job_id = UUID_TYPE(job.job_id)
+    status_url = f"/_job/{job_id}"
+    return response_class(
+        {"data": {"job_id": job_id, "status_url": status_url}, "status": "ACCEPTED"},
+        status_code=202,
+        headers={"Location": status_url}
+    )
+
+
+def job_status_info(job) -> dict:
+    from fluvius.worker import JobStatus
+
+    status = JobStatus(job.job_status) if job.job_status else JobStatus.SUBMITTED
+    return {
+        "job_id": job._id,
+        "function": job.function,
+        "status": status.value,
+        "label": status.label,
+        "progress": job.job_progress,
+        "message": job.job_message,
+        "result": job.result,
+        "error": job.err_message or None,
+        "enqueue_time": job.enqueue_time,
+        "start_time": job.start_time,
+        "finish_time": job.finish_time,
     }
 
-    return cmd_metadata
+
+def job_submitter(job) -> Optional[str]:
+    """ User id of the submitter, recorded in the context of the worker request (first job argument) """
+    try:
+        request = job.args[0]
+        if isinstance(request, dict):
+            user_id = (request["context"].get("audit") or {}).get("user_id")
+        else:
+            user_id = request.context.audit.user_id
+    except (AttributeError, IndexError, KeyError, TypeError):
+        return None
+
+    return str(user_id) if user_id else None
+
+
+def register_job_endpoints(app, tracker, response_class=FastJSONResponse):
+    from fluvius.tracker import config as tracker_config
+
+    async def job_status(request: Request, job_id: Annotated[UUID_TYPE, Path()]):
+        try:
+            job = await tracker.fetch_entry(tracker_config.WORKER_JOB_TABLE, job_id)
+        except ItemNotFoundError:
+            job = None
+
+        # Jobs of other users are not disclosed (nor their existence)
+        if job is None or ((submitter := job_submitter(job)) and submitter != str(request_user_id(request))):
+            raise NotFoundError('S00.307', f'Job not found: {job_id}')
+
+        return response_class({"data": job_status_info(job), "status": "OK"})
+
+    if config.COMMAND_JOB_AUTH_REQUIRED:
+        job_status = auth_required()(job_status)
+
+    app.get("/_job/{job_id}", summary="Job Status", tags=["Metadata"], response_class=response_class)(job_status)
+    return app
+
+
+class BatchCommandItem(DataModel):
+    command: str = Field(description="Command key, e.g. `create-object`")
+    resource: str
+    identifier: Optional[UUID_TYPE] = None
+    scope: Optional[Dict[str, Any]] = Field(default=None, description="E.g. `{\"domain_sid\": ...}` for scoped commands")
+    payload: Dict[str, Any] = Field(default_factory=dict)
+
+
+class BatchCommandRequest(DataModel):
+    commands: List[BatchCommandItem]
+    atomic: bool = Field(default=True, description="All-or-nothing (single transaction) or independent commands")
+
+
+def batch_item_error(exc) -> dict:
+    if isinstance(exc, FluviusException):
+        return {"status": "ERROR", "status_code": exc.status_code, "error": exc.content}
+
+    # Payload validation errors
+    return {
+        "status": "ERROR",
+        "status_code": 422,
+        "error": {"errcode": "A422.01", "errmesg": str(exc), "errdata": exc.errors()}
+    }
+
+
+def register_batch_handler(app, domain, command_handlers, response_class=FastJSONResponse, idempotency=None):
+    """ `POST /_batch/{namespace}`: run an ordered list of commands within a single domain session """
+
+    namespace = domain.Meta.namespace
+    commands = {
+        cmd_key: cmd_cls for _, cmd_cls, cmd_key, _ in command_handlers
+        if not cmd_cls.Meta.internal
+    }
+    auth_required_ = any(cmd_cls.Meta.auth_required for cmd_cls in commands.values())
+
+    def create_command(item: BatchCommandItem):
+        cmd_cls = commands.get(item.command)
+        if cmd_cls is None:
+            raise BadRequestError('S00.302', f'Unknown command [{item.command}] for domain [{namespace}]')
+
+        scope = item.scope or {}
+        scope_schema = cmd_cls.Meta.scope_required or cmd_cls.Meta.scope_optional or {}
+        if unknown := set(scope) - set(scope_schema):
+            raise BadRequestError('S00.303', f'Invalid scope for command [{item.command}]: {unknown}')
+
+        if cmd_cls.Meta.scope_required and not scope:
+            raise BadRequestError('S00.304', f'Scoping is required for command [{item.command}]')
+
+        identifier = None if cmd_cls.Meta.resource_init else item.identifier
+        return domain.create_command(
+            item.command,
+            item.payload,
+            aggroot=(
+                item.resource,
+                identifier or UUID_GENR(),
+                scope.get('domain_sid'),
+                scope.get('domain_iid'),
+            )
+        )
+
+    async def batch_handler(request: Request, batch: BatchCommandRequest):
+        if len(batch.commands) > config.COMMAND_BATCH_MAX_SIZE:
+            raise BadRequestError('S00.305', f'Too many commands in batch: {len(batch.commands)} > {config.COMMAND_BATCH_MAX_SIZE}')
+
+        execute = lambda: execute_batch(request, batch)
+        if idempotency and (idempotency_key := request.headers.get(IDEMPOTENCY_KEY)):
+            return await idempotency.execute(request, idempotency_key, request_user_id(request), execute)
+
+        return await execute()
+
+    async def execute_batch(request: Request, batch: BatchCommandRequest):
+        results = [None] * len(batch.commands)
+
+        with domain.session(
+            authorization=getattr(request.state, 'auth_context', None),
+            headers=dict(request.headers),
+            transport=DomainTransport.FASTAPI,
+            source=request.client.host,
+            service_proxy=DomainServiceProxy(app.state)
+        ):
+            pending = []
+            for index, item in enumerate(batch.commands):
+                try:
+                    pending.append((index, create_command(item)))
+                except (FluviusException, ValidationError) as e:
+                    if batch.atomic:
+                        raise
+
+                    results[index] = batch_item_error(e)
+
+            responses = await domain.process_command_batch(*(cmd for _, cmd in pending), atomic=batch.atomic)
+
+        for (index, _), resp in zip(pending, responses):
+            results[index] = batch_item_error(resp) if isinstance(resp, Exception) else {"status": "OK", "data": resp}
+
+        failed = sum(1 for r in results if r["status"] != "OK")
+        with span("serialize"):
+            return response_class({
+                "data": results,
+                "status": "OK" if not failed else "PARTIAL"
+            })
+
+    handler = batch_handler
+    if auth_required_:
+        handler = auth_required()(handler)
+
+    if config.SERVER_TIMING_HEADER:
+        handler = server_timing(f"{namespace}:batch")(handler)
+
+    app.post(
+        f"/_batch/{namespace}",
+        summary=f"Batch Commands [{domain.Meta.name}]",
+        description="Run an ordered list of commands in a single session. "
+                    "`atomic=true`: single transaction, all-or-nothing. "
+                    "`atomic=false`: each command in its own transaction, per-item results.",
+        tags=domain.Meta.tags,
+        response_class=response_class
+    )(handler)
+
+    return handler
+
 
 @Pipe
 def configure_domain_manager(app, *domains, **kwargs):
     FastAPIDomainManager.setup_app(app, *domains, **kwargs)
+    setup_cache_invalidation()
     return app
 
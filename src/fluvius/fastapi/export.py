@@ -0,0 +1,104 @@
+"""
+Streaming exports of query resources (NDJSON / CSV).
+
+Rows are read from a server-side cursor and flushed every `QUERY_EXPORT_CHUNK_SIZE`
+rows, so memory stays constant whatever the size of the export. The connection is
+checked between chunks: once the client is gone the iteration stops, which closes
+the cursor and the transaction.
+"""
+import csv
+import io
+
+from contextlib import aclosing
+from datetime import date, datetime, time
+from enum import Enum
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from fluvius.error import BadRequestError
+
+from . import config, logger
+from .response import dumps
+
+
+def encode_ndjson(rows) -> bytes:
+    return b"".join(dumps(row) + b"\n" for row in rows)
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+
+    if isinstance(value, (str, int, float)):
+        return value
+
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+
+    if isinstance(value, Enum):
+        return value.value
+
+    if isinstance(value, (dict, list, tuple)):
+        return dumps(value).decode("utf-8")
+
+    return str(value)
+
+
+class CSVEncoder(object):
+    """ The header row is taken from the columns of the first row """
+
+    def __init__(self):
+        self._columns = None
+
+    def __call__(self, rows) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        if self._columns is None:
+            self._columns = list(rows[0].keys())
+            writer.writerow(self._columns)
+
+        for row in rows:
+            writer.writerow([_csv_value(row[col]) for col in self._columns])
+
+        return buffer.getvalue().encode("utf-8")
+
+
+EXPORT_FORMATS = {
+    # format: (media type, file extension, encoder factory)
+    "ndjson": ("application/x-ndjson", "ndjson", lambda: encode_ndjson),
+    "csv": ("text/csv; charset=utf-8", "csv", CSVEncoder),
+}
+
+
+async def stream_chunks(request: Request, rows, encoder, chunk_size: int):
+    async with aclosing(rows):
+        chunk = []
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) < chunk_size:
+                continue
+
+            yield encoder(chunk)
+            chunk = []
+
+            if await request.is_disconnected():
+                logger.info('Export cancelled, client disconnected: %s', request.url.path)
+                return
+
+        if chunk:
+            yield encoder(chunk)
+
+
+def export_response(request: Request, rows, export_format: str, filename: str) -> StreamingResponse:
+    try:
+        media_type, extension, encoder_factory = EXPORT_FORMATS[export_format]
+    except KeyError:
+        raise BadRequestError('Q00.516', f'Unsupported export format: {export_format}')
+
+    return StreamingResponse(
+        stream_chunks(request, rows, encoder_factory(), config.QUERY_EXPORT_CHUNK_SIZE),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{extension}"'}
+    )
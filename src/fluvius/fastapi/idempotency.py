@@ -0,0 +1,213 @@
+"""
+Idempotency keys for the command endpoints.
+
+A command request carrying an `Idempotency-Key` header is executed at most once
+per key and user within `COMMAND_IDEMPOTENCY_TTL`:
+
+- the response of the first successful execution is stored and replayed to the
+  later retries (with the `Idempotent-Replayed: true` header) without touching
+  the domain;
+- a duplicate received while the first execution is still in flight waits for
+  it (up to `COMMAND_IDEMPOTENCY_WAIT` seconds, then `423 Locked`);
+- reusing a key with a different request (method, path, query or body) is
+  rejected with `422`.
+
+Failed executions are not stored (the command transaction has been rolled back),
+i.e. the key is released and the client may retry with the same key.
+
+Entries are kept in an in-process LRU. When `COMMAND_IDEMPOTENCY_REDIS_URL` is
+set, they are stored in Redis as well and the in-flight reservation is a Redis
+`SET NX` so that duplicates are also detected across workers. The reservation is
+a lease of `COMMAND_IDEMPOTENCY_LEASE` seconds, renewed while the command runs
+(however long it takes) and released on completion. It only expires on its own
+when the worker dies mid-execution.
+"""
+import asyncio
+import hashlib
+import json
+
+from time import monotonic
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+
+from fluvius.error import BadRequestError, LockedError, UnprocessableError
+from fluvius.helper import LRUCache
+
+from . import config, logger
+
+REDIS_KEY_PREFIX = "fluvius:idempotency"
+PENDING = "PENDING"
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+REPLAYED_HEADERS = ("location",)
+
+
+def request_fingerprint(method: str, path: str, query: str, body: bytes) -> str:
+    digest = hashlib.sha256(f"{method} {path}?{query}\n".encode('utf-8'))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class IdempotencyStore(object):
+    def __init__(self, ttl=config.COMMAND_IDEMPOTENCY_TTL, maxsize=config.COMMAND_IDEMPOTENCY_CACHE_SIZE,
+                 redis_url=config.COMMAND_IDEMPOTENCY_REDIS_URL, wait=config.COMMAND_IDEMPOTENCY_WAIT,
+                 lease=config.COMMAND_IDEMPOTENCY_LEASE):
+        self._ttl = ttl
+        self._wait = wait
+        self._lease = lease
+        self._local = LRUCache(maxsize)
+        self._inflight = {}
+        self._redis_url = redis_url
+        self._redis = None
+
+    @property
+    def redis(self):
+        if self._redis is None and self._redis_url:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(self._redis_url, encoding="utf-8", decode_responses=True)
+
+        return self._redis
+
+    def _redis_key(self, key):
+        return f"{REDIS_KEY_PREFIX}:{key}"
+
+    async def lookup(self, key: str) -> Optional[dict]:
+        """ Stored response of a completed execution, if any """
+        entry = self._local.get(key)
+        if entry is not None or self.redis is None:
+            return entry
+
+        try:
+            data = await self.redis.get(self._redis_key(key))
+        except Exception as e:
+            logger.warning('Idempotency store (redis) lookup failed: %s', e)
+            return None
+
+        if data is None or data == PENDING:
+            return None
+
+        entry = json.loads(data)
+        self._local.set(key, entry, ttl=self._ttl)
+        return entry
+
+    async def reserve(self, key: str) -> bool:
+        """ Claim the execution of `key`, False when another worker holds it """
+        if self.redis is None:
+            return True
+
+        try:
+            return bool(await self.redis.set(self._redis_key(key), PENDING, nx=True, ex=max(1, int(self._lease))))
+        except Exception as e:
+            logger.warning('Idempotency store (redis) reservation failed: %s', e)
+            return True
+
+    async def renew(self, key: str):
+        """ Extend the reservation of `key` until cancelled (i.e. while the command runs) """
+        while True:
+            await asyncio.sleep(self._lease / 3)
+            try:
+                await self.redis.expire(self._redis_key(key), max(1, int(self._lease)))
+            except Exception as e:
+                logger.warning('Idempotency store (redis) reservation renewal failed: %s', e)
+
+    def keep_reserved(self, key: str) -> Optional[asyncio.Task]:
+        return asyncio.create_task(self.renew(key)) if self.redis is not None else None
+
+    @staticmethod
+    async def stop_renewal(renewal: Optional[asyncio.Task]):
+        if renewal is None:
+            return
+
+        # Waited for: a renewal must not shorten the expiry of the saved entry
+        renewal.cancel()
+        await asyncio.gather(renewal, return_exceptions=True)
+
+    async def save(self, key: str, entry: dict):
+        self._local.set(key, entry, ttl=self._ttl)
+        if self.redis is None:
+            return
+
+        try:
+            await self.redis.set(self._redis_key(key), json.dumps(entry), ex=max(1, int(self._ttl)))
+        except Exception as e:
+            logger.warning('Idempotency store (redis) update failed: %s', e)
+
+    async def release(self, key: str):
+        if self.redis is None:
+            return
+
+        try:
+            await self.redis.delete(self._redis_key(key))
+        except Exception as e:
+            logger.warning('Idempotency store (redis) release failed: %s', e)
+
+    async def execute(self, request: Request, idempotency_key: str, user_id, handler: Callable[[], Awaitable[Response]]) -> Response:
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            raise BadRequestError('S00.308', f'Idempotency key is too long (max. {MAX_KEY_LENGTH} characters)')
+
+        key = hashlib.sha256(f"{user_id}:{idempotency_key}".encode('utf-8')).hexdigest()
+        fingerprint = request_fingerprint(request.method, request.url.path, request.url.query, await request.body())
+        deadline = monotonic() + self._wait
+
+        while True:
+            if (entry := await self.lookup(key)) is not None:
+                return self.replay(entry, fingerprint)
+
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                if await self.reserve(key):
+                    break
+
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                raise LockedError('S00.309', 'A request with the same idempotency key is still being processed')
+
+            if inflight is not None:
+                # Waiters are woken up when the execution completes (or fails)
+                await asyncio.wait([inflight], timeout=remaining)
+            else:
+                await asyncio.sleep(min(POLL_INTERVAL, remaining))
+
+        done = self._inflight[key] = asyncio.get_running_loop().create_future()
+        renewal = self.keep_reserved(key)
+        try:
+            try:
+                response = await handler()
+            finally:
+                await self.stop_renewal(renewal)
+
+            if response.status_code < 400 and getattr(response, 'body', None) is not None:
+                await self.save(key, {
+                    "fingerprint": fingerprint,
+                    "status_code": response.status_code,
+                    "media_type": response.media_type,
+                    "body": response.body.decode('latin-1'),
+                    "headers": {h: response.headers[h] for h in REPLAYED_HEADERS if h in response.headers},
+                })
+            else:
+                await self.release(key)
+
+            return response
+        except BaseException:
+            await self.release(key)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            done.set_result(None)
+
+    def replay(self, entry: dict, fingerprint: str) -> Response:
+        if entry["fingerprint"] != fingerprint:
+            raise UnprocessableError('S00.310', 'Idempotency key has already been used for a different request')
+
+        return Response(
+            entry["body"].encode('latin-1'),
+            status_code=entry["status_code"],
+            media_type=entry["media_type"],
+            headers=entry["headers"] | {config.RESP_HEADER_IDEMPOTENT_REPLAYED: "true"}
+        )
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
@@ -0,0 +1,150 @@
+"""
+Realm signing keys (JWKS) with a refresh policy.
+
+- The key set is refreshed in the background `JWKS_REFRESH_AHEAD` seconds before
+  it expires (`Cache-Control: max-age` of the response, else `JWKS_CACHE_TTL`).
+- When a refresh fails the previous keys keep being served for `JWKS_STALE_GRACE`
+  seconds past expiry.
+- A token signed with an unknown `kid` triggers a single refresh, shared by every
+  concurrent request, at most once per `JWKS_MIN_REFRESH_INTERVAL` seconds.
+
+`uri` may be an http(s) URL, a `file://` URL or a plain path (e.g. a fake key set
+for tests).
+"""
+import asyncio
+import json
+import re
+
+from time import monotonic
+from typing import Callable, Optional
+
+import httpx
+
+from authlib.jose import JsonWebKey, KeySet
+
+from . import config, logger
+
+RX_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class JWKSCache(object):
+    def __init__(self, uri, ttl=config.JWKS_CACHE_TTL, refresh_ahead=config.JWKS_REFRESH_AHEAD,
+                 stale_grace=config.JWKS_STALE_GRACE, min_refresh_interval=config.JWKS_MIN_REFRESH_INTERVAL,
+                 on_refresh: Optional[Callable[[KeySet], None]] = None):
+        self._uri = uri
+        self._ttl = ttl
+        self._refresh_ahead = refresh_ahead
+        self._stale_grace = stale_grace
+        self._min_refresh_interval = min_refresh_interval
+        self._on_refresh = on_refresh
+
+        self._keyset = KeySet([])
+        self._keys = {}
+        self._expires_at = 0.0
+        self._last_attempt = None
+        self._inflight = None
+        self._worker = None
+
+    @property
+    def keyset(self) -> KeySet:
+        return self._keyset
+
+    @property
+    def expires_at(self) -> float:
+        return self._expires_at
+
+    @property
+    def stale(self) -> bool:
+        return monotonic() >= self._expires_at
+
+    def get_key(self, kid):
+        return self._keys.get(kid)
+
+    async def _fetch(self):
+        if self._uri.startswith(("http://", "https://")):
+            async with httpx.AsyncClient() as client:
+                response = await client.get(self._uri)
+                response.raise_for_status()
+                match = RX_MAX_AGE.search(response.headers.get("cache-control", ""))
+                return response.json(), int(match.group(1)) if match else None
+
+        path = self._uri[7:] if self._uri.startswith("file://") else self._uri
+        with open(path) as f:
+            return json.load(f), None
+
+    async def _refresh(self):
+        self._last_attempt = monotonic()
+        try:
+            data, max_age = await self._fetch()
+            keyset = JsonWebKey.import_key_set(data)
+        except Exception as e:
+            if not self._keys:
+                raise
+
+            if monotonic() < self._expires_at + self._stale_grace:
+                logger.warning('JWKS refresh failed, serving stale keys: %s', e)
+                return self._keyset
+
+            logger.error('JWKS refresh failed and stale keys are past the grace period: %s', e)
+            self._set_keyset(KeySet([]), 0.0)
+            raise
+
+        self._set_keyset(keyset, monotonic() + (max_age if max_age is not None else self._ttl))
+        return keyset
+
+    def _set_keyset(self, keyset, expires_at):
+        changed = {k.kid for k in keyset.keys} != set(self._keys)
+        self._keyset = keyset
+        self._keys = {k.kid: k for k in keyset.keys}
+        self._expires_at = expires_at
+
+        if changed and self._on_refresh:
+            self._on_refresh(keyset)
+
+    async def refresh(self) -> KeySet:
+        """ Refresh the key set; concurrent callers share the same request """
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self._refresh())
+
+        return await asyncio.shield(self._inflight)
+
+    async def ensure_kid(self, kid):
+        """ Return the key for `kid`, refreshing once if it is unknown (e.g. after a key rotation) """
+        if kid in self._keys:
+            return self._keys[kid]
+
+        inflight = self._inflight is not None and not self._inflight.done()
+        if not inflight and self._last_attempt is not None \
+                and monotonic() - self._last_attempt < self._min_refresh_interval:
+            return None
+
+        try:
+            await self.refresh()
+        except Exception:
+            return None
+
+        return self._keys.get(kid)
+
+    async def _refresh_loop(self):
+        while True:
+            delay = max(self._expires_at - self._refresh_ahead - monotonic(), self._min_refresh_interval)
+            await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning('JWKS background refresh failed: %s', e)
+
+    async def start(self):
+        await self.refresh()
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+
+            self._worker = None
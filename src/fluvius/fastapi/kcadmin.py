@@ -1,10 +1,11 @@
 import os
 import re
+from typing import Iterable
 from aiohttp import BasicAuth, ClientSession
 from fluvius.data import nullable, PClass, field
 from fluvius.error import BadRequestError, ForbiddenError
 from fluvius.fastapi import config, logger
-from .restriction import EMAIL_DOMAIN_RESTRICTION
+from .restriction import blacklist_domain_restriction, is_restricted_domain
 
 RX_EMAIL = re.compile(r"(?<=@)(\S+$)")
 
@@ -278,11 +279,11 @@ class KCAdmin(object):
                 "To prevent member data exposure, this email address is not allowed to log in to the system."  # noqa: E501
             )
 
-    def check_blacklist_email(self, domain: str, blacklist: list):
+    def check_blacklist_email(self, domain: str, blacklist: Iterable[str]):
         if not blacklist:
             return
 
-        if (domain in EMAIL_DOMAIN_RESTRICTION) or (domain in blacklist):
+        if is_restricted_domain(domain, blacklist):
             raise ForbiddenError(
                 "S00.404",
                 "To prevent member data exposure, this email address is not allowed to log in to the system."  # noqa: E501
@@ -292,7 +293,7 @@ class KCAdmin(object):
         try:
             domain = RX_EMAIL.search(user_data.get("email")).group(0)
             self.check_whitelist_email(domain, config.WHITELIST_DOMAIN)
-            self.check_blacklist_email(domain, config.BLACKLIST_DOMAIN)
+            self.check_blacklist_email(domain, blacklist_domain_restriction())
         except AttributeError:
             raise BadRequestError(
                 "S00.203",
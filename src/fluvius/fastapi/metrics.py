@@ -0,0 +1,112 @@
+"""
+Prometheus metrics endpoint.
+
+`app | configure_metrics()` serves the framework metrics at `METRICS_PATH` in the
+Prometheus text format:
+
+- HTTP request latency per method, route template and status (this middleware);
+- command latency and outcome per command (`fluvius.domain`), pipeline stage
+  durations (`fluvius.domain.tracing`);
+- query latency per resource (`fluvius.query`);
+- permission check latency and restriction cache lookups (`fluvius.casbin`);
+- database pool usage (`fluvius.data`), worker job durations (`fluvius.worker`)
+  and MQTT publish counts (`configure_mqtt`).
+
+The metrics are kept in process (see `fluvius.helper.metrics`). With several
+uvicorn workers set `METRICS_MULTIPROC_DIR`, shared by all the workers and emptied
+(`clear_snapshots`) when the deployment starts. Every process writes its snapshot
+there each `METRICS_FLUSH_INTERVAL` seconds, the process serving the scrape
+flushes its own and merges them. Worker processes with the same
+`METRICS_MULTIPROC_DIR` (worker config) are merged as well.
+"""
+import asyncio
+import os
+
+from time import perf_counter
+
+from fastapi import Request, Response
+from pipe import Pipe
+
+from fluvius.error import ForbiddenError
+from fluvius.helper.metrics import metrics
+
+from . import config, logger
+from .setup import on_startup, on_shutdown
+
+EXPOSITION_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+UNMATCHED_ROUTE = "<unmatched>"
+
+HTTP_DURATION = metrics.histogram(
+    "fluvius_http_request_duration_seconds", "HTTP request processing time", ("method", "route", "status"))
+
+
+class MetricsMiddleware(object):
+    """ Request latency labelled with the route template (set by the router in the scope), never the raw path """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_DURATION.observe(
+                (scope["method"], route.path if route is not None else UNMATCHED_ROUTE, status),
+                perf_counter() - started
+            )
+
+
+async def flush_metrics(directory, interval):
+    while True:
+        await asyncio.sleep(interval)
+        metrics.flush(directory)
+
+
+@Pipe
+def configure_metrics(app, path=config.METRICS_PATH, directory=config.METRICS_MULTIPROC_DIR,
+                      flush_interval=config.METRICS_FLUSH_INTERVAL, stale_after=config.METRICS_STALE_AFTER,
+                      key=config.METRICS_KEY):
+    if hasattr(app.state, 'metrics'):
+        return app
+
+    app.state.metrics = metrics
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get(path, tags=["Metrics"], include_in_schema=False)
+    async def metrics_exposition(request: Request):
+        ''' Prometheus exposition of the metrics of all the processes '''
+        if key and request.headers.get("Authorization") != f"Bearer {key}":
+            raise ForbiddenError('S00.607', 'Invalid metrics key')
+
+        return Response(metrics.exposition(directory, stale_after), media_type=EXPOSITION_CONTENT_TYPE)
+
+    if not directory:
+        return app
+
+    os.makedirs(directory, exist_ok=True)
+
+    @on_startup
+    async def start_metrics_flush(app):
+        metrics.flush(directory)
+        app.state.metrics_flush = asyncio.create_task(flush_metrics(directory, flush_interval))
+        logger.info('Metrics snapshots are written to %s every %ss', directory, flush_interval)
+
+    @on_shutdown
+    async def stop_metrics_flush(app):
+        app.state.metrics_flush.cancel()
+        metrics.flush(directory)
+
+    return app
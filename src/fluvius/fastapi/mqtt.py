@@ -1,18 +1,26 @@
 import os
 import json
-import queue
+import time
+import hashlib
 import secrets
 import asyncio
+import itertools
+from collections import OrderedDict, deque
+from time import monotonic
 from pipe import Pipe
 from blinker import signal
 from gmqtt import Client as MQTTClient
+from gmqtt.storage import PersistentStorage
 import redis.asyncio as aioredis
 
 from ._meta import config, logger
 from .setup import on_startup, on_shutdown
 from fluvius.auth import event as auth_event
-from fluvius.auth.hashes import make_hash
+from fluvius.auth.hashes import make_hash_async
 from fluvius.data import serialize_json
+from fluvius.error import BadRequestError
+from fluvius.helper import LRUCache
+from fluvius.helper.metrics import Counter, Gauge, metrics
 
 
 MQTT_DEBUG = config.MQTT_DEBUG
@@ -20,7 +28,7 @@ MQTT_CLIENT_QOS = config.MQTT_CLIENT_QOS
 MQTT_CLIENT_RETAIN = config.MQTT_CLIENT_RETAIN
 MQTT_CLIENT_CHANNEL = config.MQTT_CLIENT_CHANNEL
 
-MQTT_QUEUES = {}
+OVERFLOW_POLICIES = ("drop-oldest", "drop-newest", "block")
 
 
 class MqttEvent:
@@ -30,9 +38,402 @@ class MqttEvent:
     on_subscribe = signal("mqtt_subscribe")
 
 
+class NotifyBuffer(object):
+    """ Pending notifications in arrival order. The latest message wins for the same channel, `_kind` and `_target` """
+
+    __slots__ = ('entries', 'max_size', 'created', 'dropped')
+
+    _seq = itertools.count()
+
+    def __init__(self, max_size=config.MQTT_BATCH_MAX_SIZE):
+        self.entries = OrderedDict()
+        self.max_size = max_size
+        self.created = monotonic()
+        self.dropped = 0
+
+    @classmethod
+    def message_key(cls, channel, message):
+        target = message.get('_target')
+        if target is None:
+            return (channel, next(cls._seq))
+
+        return (channel, message.get('_kind'), target)
+
+    def add(self, key, channel, message) -> bool:
+        """ Returns True when the message replaced a pending one """
+        coalesced = self.entries.pop(key, None) is not None
+        self.entries[key] = (channel, message)
+        if self.max_size and len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.dropped += 1
+
+        return coalesced
+
+    def channels(self):
+        """ Pending (key, message) grouped by channel """
+        channels = {}
+        for key, (channel, message) in self.entries.items():
+            channels.setdefault(channel, []).append((key, message))
+
+        return channels
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class PublishStats(object):
+    __slots__ = ('notified', 'coalesced', 'dropped', 'expired', 'messages', 'payloads', 'started', '_reported')
+
+    def __init__(self):
+        self.notified = self.coalesced = self.dropped = self.expired = 0
+        self.messages = self.payloads = 0
+        self.started = monotonic()
+        self._reported = (self.started, 0, 0)
+
+    def snapshot(self) -> dict:
+        elapsed = max(monotonic() - self.started, 1e-9)
+        return dict(
+            notified=self.notified,
+            coalesced=self.coalesced,
+            dropped=self.dropped,
+            expired=self.expired,
+            messages=self.messages,
+            payloads=self.payloads,
+            messages_per_second=self.messages / elapsed,
+            payloads_per_second=self.payloads / elapsed,
+        )
+
+    def report(self, interval, outbound=None):
+        """ Log the publish rates of the last `interval` seconds """
+        now = monotonic()
+        since, messages, payloads = self._reported
+        if not interval or now - since < interval:
+            return
+
+        elapsed = now - since
+        self._reported = (now, self.messages, self.payloads)
+        logger.info(
+            "/MQTT/ Published %.1f msg/s in %.1f payloads/s [notified: %d, coalesced: %d, dropped: %d, expired batches: %d]",
+            (self.messages - messages) / elapsed, (self.payloads - payloads) / elapsed,
+            self.notified, self.coalesced, self.dropped, self.expired
+        )
+        if outbound is not None:
+            logger.info("/MQTT/ Outbound queue: %s", outbound.metrics())
+
+
+class InflightStorage(PersistentStorage):
+    """ gmqtt store of the unacknowledged QoS>=1 messages, keeps the outbound queue in sync """
+
+    def __init__(self, outbound=None):
+        super().__init__()
+        self.outbound = outbound
+
+    def push_message(self, mid, raw_package):
+        super().push_message(mid, raw_package)
+        if self.outbound is not None:
+            self.outbound.stored(mid)
+
+    def remove_message_by_mid(self, mid):
+        super().remove_message_by_mid(mid)
+        if self.outbound is not None:
+            self.outbound.acknowledged(mid)
+
+    def clear(self):
+        # The broker has no session for the client (or it was reset): in-flight messages are lost
+        super().clear()
+        if self.outbound is not None:
+            self.outbound.session_lost()
+
+
+class OutboundQueue(object):
+    """
+    Bounded buffer between the publisher and the broker connection.
+
+    Messages are handed to the client while it is connected and has less than
+    `max_inflight` unacknowledged QoS>=1 messages, i.e. a slow broker fills the
+    queue instead of the client's write buffer. While the client is offline
+    QoS>=1 messages are kept and published on reconnect, QoS 0 messages are
+    dropped. In-flight messages are replayed when the broker did not keep the
+    session of the client (gmqtt only resends them with the session).
+    When the queue is full the `policy` applies:
+
+    - `drop-oldest`: the oldest queued message is discarded;
+    - `drop-newest`: the new message is discarded;
+    - `block`: the message is refused (`offer` returns False) and the producer
+      holds it until the queue is writable again (see `on_writable` and `put`).
+    """
+
+    def __init__(self, client, maxsize=config.MQTT_OUTBOUND_MAX_SIZE, policy=config.MQTT_OUTBOUND_POLICY,
+                 max_inflight=config.MQTT_MAX_INFLIGHT):
+        if policy not in OVERFLOW_POLICIES:
+            raise BadRequestError('S00.701', f'Invalid MQTT overflow policy: {policy} (expected one of {OVERFLOW_POLICIES})')
+
+        self.client = client
+        self.maxsize = maxsize
+        self.policy = policy
+        self.max_inflight = max_inflight
+        self.on_writable = None
+        self._queue = deque()
+        self._inflight = OrderedDict()    # mid -> message, until acknowledged
+        self._publishing = None
+        self._waiters = deque()
+        self._draining = False
+        self.accepted = self.published = self.blocked = self.replayed = 0
+        self.dropped_oldest = self.dropped_newest = self.dropped_offline = 0
+        self.high_watermark = 0
+
+    def __len__(self):
+        return len(self._queue)
+
+    @property
+    def full(self):
+        return bool(self.maxsize) and len(self._queue) >= self.maxsize
+
+    def offer(self, topic, payload, qos=MQTT_CLIENT_QOS, retain=MQTT_CLIENT_RETAIN) -> bool:
+        if not qos and not self.client.is_connected:
+            self.dropped_offline += 1
+            return True
+
+        if self.full:
+            if self.policy == "block":
+                self.blocked += 1
+                return False
+
+            if self.policy == "drop-newest":
+                self.dropped_newest += 1
+                return True
+
+            self._queue.popleft()
+            self.dropped_oldest += 1
+
+        self._queue.append((topic, payload, qos, retain))
+        self.accepted += 1
+        self.high_watermark = max(self.high_watermark, len(self._queue))
+        self.drain()
+        return True
+
+    async def put(self, topic, payload, qos=MQTT_CLIENT_QOS, retain=MQTT_CLIENT_RETAIN):
+        """ Like `offer`, waits for room under the `block` policy """
+        while not self.offer(topic, payload, qos, retain):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            await waiter
+
+    def drain(self):
+        """ Hand the queued messages to the client, as far as the connection and the in-flight window allow """
+        if self._draining:
+            return
+
+        self._draining = True
+        was_full = self.full
+        try:
+            client = self.client
+            while self._queue and client.is_connected and len(self._inflight) < self.max_inflight:
+                message = self._publishing = self._queue[0]
+                topic, payload, qos, retain = message
+                try:
+                    client.publish(topic, payload, qos=qos, retain=retain)
+                except Exception as e:
+                    # Connection lost in between, kept for the reconnect
+                    logger.warning("/MQTT/ Publish failed, %d message(s) kept for the reconnect: %s", len(self._queue), e)
+                    break
+
+                self._queue.popleft()
+                self.published += 1
+        finally:
+            self._publishing = None
+            self._draining = False
+
+        if was_full and not self.full:
+            self._writable()
+
+    def stored(self, mid):
+        if self._publishing is not None and mid not in self._inflight:
+            self._inflight[mid] = self._publishing
+
+    def acknowledged(self, mid):
+        if self._inflight.pop(mid, None) is not None:
+            self.drain()
+
+    def session_lost(self):
+        if not self._inflight:
+            return
+
+        # Replayed ahead of the queued messages, in their original order
+        self._queue.extendleft(reversed(self._inflight.values()))
+        self.replayed += len(self._inflight)
+        self._inflight.clear()
+
+    def _writable(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+        if self.on_writable is not None:
+            # Deferred, the producer may be the one draining the queue
+            try:
+                asyncio.get_running_loop().call_soon(self.on_writable)
+            except RuntimeError:
+                self.on_writable()
+
+    def metrics(self) -> dict:
+        return dict(
+            depth=len(self._queue),
+            inflight=len(self._inflight),
+            high_watermark=self.high_watermark,
+            accepted=self.accepted,
+            published=self.published,
+            blocked=self.blocked,
+            dropped_oldest=self.dropped_oldest,
+            dropped_newest=self.dropped_newest,
+            dropped_offline=self.dropped_offline,
+            replayed=self.replayed,
+            policy=self.policy,
+        )
+
+
+class NotifyPublisher(object):
+    """
+    Coalesces the notifications of a client before publishing them.
+
+    Messages are held for `window` seconds (0 publishes immediately); within the
+    window only the latest message for the same channel, `_kind` and `_target`
+    is kept and, with `merge`, the messages of a channel are published as a
+    single array payload. Batched messages (`batch_id`) are held until the batch
+    is sent; batches are capped at `batch_max_size` messages (oldest dropped) and
+    discarded when they are not sent within `batch_ttl` seconds.
+
+    Payloads go through the client's `OutboundQueue`. When it refuses them
+    (`block` policy) they stay pending, still coalesced, until it is writable.
+    """
+
+    def __init__(self, client, window=config.MQTT_NOTIFY_WINDOW, merge=config.MQTT_NOTIFY_MERGE,
+                 batch_max_size=config.MQTT_BATCH_MAX_SIZE, batch_ttl=config.MQTT_BATCH_TTL,
+                 stats_interval=config.MQTT_STATS_INTERVAL, outbound=None):
+        self.client = client
+        self.outbound = outbound if outbound is not None else OutboundQueue(client)
+        self.outbound.on_writable = self._schedule
+        self.window = window
+        self.merge = merge
+        self.batch_max_size = batch_max_size
+        self.batch_ttl = batch_ttl
+        self.stats_interval = stats_interval
+        self.stats = PublishStats()
+        self._pending = NotifyBuffer(batch_max_size)
+        self._batches = {}
+        self._flush_handle = None
+
+    def notify(self, channel, message, batch_id=None):
+        self.stats.notified += 1
+        if batch_id is not None:
+            self.expire_batches()
+            batch = self._batches.get(batch_id)
+            if batch is None:
+                batch = self._batches[batch_id] = NotifyBuffer(self.batch_max_size)
+
+            return self._add(batch, NotifyBuffer.message_key(channel, message), channel, message)
+
+        self._add(self._pending, NotifyBuffer.message_key(channel, message), channel, message)
+        self._schedule()
+
+    def send(self, batch_id):
+        batch = self._batches.pop(batch_id, None)
+        if batch is None:
+            logger.warning("/MQTT/ Message queue for context_id: %s not found", batch_id)
+            return
+
+        for key, (channel, message) in batch.entries.items():
+            self._add(self._pending, key, channel, message)
+
+        self._schedule()
+
+        MQTT_DEBUG and logger.info("/MQTT/ Published queued messages of context: %s", batch_id)
+
+    def discard(self, batch_id):
+        self._batches.pop(batch_id, None)
+
+    def expire_batches(self):
+        if not self.batch_ttl:
+            return
+
+        deadline = monotonic() - self.batch_ttl
+        expired = [batch_id for batch_id, batch in self._batches.items() if batch.created < deadline]
+        for batch_id in expired:
+            del self._batches[batch_id]
+            logger.warning("/MQTT/ Discarded message queue of context: %s (not sent within %ss)", batch_id, self.batch_ttl)
+
+        self.stats.expired += len(expired)
+
+    def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        # Whatever the outbound queue refuses stays pending
+        self._publish_buffer(self._pending)
+        self.expire_batches()
+        self.stats.report(self.stats_interval, self.outbound)
+
+    def _add(self, buffer, key, channel, message):
+        dropped = buffer.dropped
+        if buffer.add(key, channel, message):
+            self.stats.coalesced += 1
+
+        self.stats.dropped += buffer.dropped - dropped
+
+    def _schedule(self):
+        if self._flush_handle is not None or not self._pending:
+            return
+
+        if not self.window:
+            return self.flush()
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Not called from the event loop, nothing to schedule the flush with
+            return self.flush()
+
+        self._flush_handle = loop.call_later(self.window, self.flush)
+
+    def _publish_buffer(self, buffer) -> bool:
+        """ Publish (and remove) the entries of `buffer`, stops at the first payload refused by the outbound queue """
+        for channel, entries in buffer.channels().items():
+            if self.merge and len(entries) > 1:
+                payloads = [([key for key, _ in entries], serialize_json([message for _, message in entries]))]
+            else:
+                payloads = [([key], serialize_json(message)) for key, message in entries]
+
+            for keys, payload in payloads:
+                if not self.outbound.offer(channel, payload):
+                    return False
+
+                for key in keys:
+                    del buffer.entries[key]
+
+                self.stats.messages += len(keys)
+                self.stats.payloads += 1
+
+        return True
+
+
 class FastapiMQTTClient(MQTTClient):
+    def __init__(self, client_id, *args, **kwargs):
+        storage = InflightStorage()
+        super().__init__(client_id, *args, persistent_storage=storage, **kwargs)
+        self.outbound = storage.outbound = OutboundQueue(self)
+        self.publisher = NotifyPublisher(self, outbound=self.outbound)
+
+        # The handler is shadowed by the static method, register it with gmqtt
+        MQTTClient.on_connect.fset(self, type(self).on_connect)
+
+    def metrics(self) -> dict:
+        return dict(publisher=self.publisher.stats.snapshot(), outbound=self.outbound.metrics())
+
     @staticmethod
     def on_connect(self, flags, rc, properties):
+        self.outbound.drain()
         MqttEvent.on_connect.send(self, flags=flags, rc=rc, properties=properties)
         logger.warning(f"/MQTT/ CONNECTED {self._client_id}")
         MQTT_DEBUG and logger.info(f"/MQTT/ CONNECTED {self._client_id}")
@@ -57,30 +458,37 @@ class FastapiMQTTClient(MQTTClient):
         MQTT_DEBUG and logger.info(f"/MQTT/ SUBSCRIBED [{self._client_id}] QOS: {qos}")
 
     def notify(self, scope_id, kind: str, target: str, msg: dict, batch_id=None):
-        payl = serialize_json(dict(**msg, _kind=kind, _target=target))
         chan = f"{scope_id}/{MQTT_CLIENT_CHANNEL}"
+        return self.publisher.notify(chan, dict(**msg, _kind=kind, _target=target), batch_id)
 
-        if batch_id is None:
-            return self.publish(
-                chan, payl, qos=MQTT_CLIENT_QOS, retain=MQTT_CLIENT_RETAIN
-            )
+    def send(self, batch_id):
+        return self.publisher.send(batch_id)
 
-        if batch_id not in MQTT_QUEUES:
-            MQTT_QUEUES[batch_id] = queue.Queue()
+    def discard(self, batch_id):
+        """ Drop the queued messages of a batch, e.g. when its transaction failed """
+        return self.publisher.discard(batch_id)
 
-        q = MQTT_QUEUES[batch_id]
-        return q.put((chan, payl))
 
-    def send(self, batch_id):
-        try:
-            q = MQTT_QUEUES.pop(batch_id)
-            while not q.empty():
-                chan, payl = q.get()
-                self.publish(chan, payl, qos=MQTT_CLIENT_QOS, retain=MQTT_CLIENT_RETAIN)
-                q.task_done()
-            logger.info("/MQTT/ Published queued messages of context: %s", batch_id)
-        except KeyError:
-            logger.warning("/MQTT/ Message queue for context_id: %s not found", batch_id)
+def client_metrics(client):
+    stats = client.metrics()
+    publisher, outbound = stats["publisher"], stats["outbound"]
+
+    notifications = Counter("fluvius_mqtt_notifications", "Notifications handed to the MQTT publisher", ("result",))
+    for result in ("notified", "coalesced", "dropped", "expired"):
+        notifications.inc((result,), publisher[result])
+
+    published = Counter("fluvius_mqtt_published", "Messages and payloads (after merging) published", ("kind",))
+    published.inc(("message",), publisher["messages"])
+    published.inc(("payload",), publisher["payloads"])
+
+    messages = Counter("fluvius_mqtt_outbound_messages", "Messages of the MQTT outbound queue", ("result",))
+    for result in ("accepted", "published", "blocked", "dropped_oldest", "dropped_newest", "dropped_offline", "replayed"):
+        messages.inc((result,), outbound[result])
+
+    queue = Gauge("fluvius_mqtt_outbound_queue", "Messages queued and in flight", ("state",))
+    queue.set(("queued",), outbound["depth"])
+    queue.set(("inflight",), outbound["inflight"])
+    return (notifications, published, messages, queue)
 
 
 def configure_mqtt_client(app, client_channel=None):
@@ -108,6 +516,7 @@ def configure_mqtt_client(app, client_channel=None):
     client.set_auth_credentials(MQTT_CLIENT_USER, MQTT_CLIENT_SECRET)
 
     app.state.mqtt_client = client
+    metrics.collector(lambda: client_metrics(client), name="fluvius.mqtt")
 
     @on_startup
     async def connect_mqtt(app):
@@ -116,57 +525,115 @@ def configure_mqtt_client(app, client_channel=None):
 
     @on_shutdown
     async def disconnect_mqtt(app):
+        app.state.mqtt_client.publisher.flush()
         await app.state.mqtt_client.disconnect()
         logger.info("/MQTT/ Disconnected from MQTT broker")
 
     return app
 
 
-def configure_mqtt_auth(app):
-    MQTT_USER_PREFIX = config.MQTT_USER_PREFIX
-    MQTT_PERMISSIONS = config.MQTT_PERMISSIONS
-    MQTT_DEBUG = config.MQTT_DEBUG
-    MQTT_AUTH_PREFIX = f"{MQTT_USER_PREFIX}-auth"
-    MQTT_ACL_PREFIX = f"{MQTT_USER_PREFIX}-acl"
-
-    def auth_key(user):
-        return f"{MQTT_AUTH_PREFIX}:{user['session_id']}"
-
-    def acl_key(user, channel):
-        return f"{MQTT_ACL_PREFIX}:{user['session_id']}:{user['sub']}/{channel}"
-
-    # @TODO: Handling token expiration and user logout
-    def authorize_user(user):
-        yield (auth_key(user), make_hash(user["client_token"]))
-        for chn, perm in MQTT_PERMISSIONS:
-            yield (acl_key(user, chn), perm)
-        logger.info(f"/MQTT/ Authorized user: {user['sub']} => {user['client_token']}")
-
-    def deauthorize_user(user):
-        yield auth_key(user)
-        for chn, _ in MQTT_PERMISSIONS:
-            yield acl_key(user, chn)
-        MQTT_DEBUG and logger.info(f"/MQTT/ De-authorized user: {user}")
+class MqttAclProvisioner(object):
+    """
+    Broker credentials and ACLs of the user sessions, stored in Redis.
+
+    All the keys of a session are written in a single MULTI/EXEC round trip and
+    expire with the token (`exp` claim, `MQTT_ACL_TTL` when missing). A session
+    whose credentials are still present is not provisioned again, its keys are
+    only extended. The (PBKDF2) hash of the client token is computed off the
+    event loop and cached per session.
+    """
+
+    def __init__(self, redis, prefix=config.MQTT_USER_PREFIX, permissions=config.MQTT_PERMISSIONS,
+                 ttl=config.MQTT_ACL_TTL, hash_cache_size=config.MQTT_ACL_HASH_CACHE_SIZE):
+        self.redis = redis
+        self.auth_prefix = f"{prefix}-auth"
+        self.acl_prefix = f"{prefix}-acl"
+        self.permissions = permissions
+        self.ttl = ttl
+        self._hashes = LRUCache(hash_cache_size)
+        self._tasks = set()
+
+    def auth_key(self, user):
+        return f"{self.auth_prefix}:{user['session_id']}"
+
+    def acl_key(self, user, channel):
+        return f"{self.acl_prefix}:{user['session_id']}:{user['sub']}/{channel}"
+
+    def keys(self, user):
+        return [self.auth_key(user)] + [self.acl_key(user, chn) for chn, _ in self.permissions]
+
+    def ttl_for(self, user) -> int:
+        expires_at = user.get('exp')
+        if not expires_at:
+            return self.ttl
+
+        return int(expires_at - time.time())
+
+    async def client_token_hash(self, user):
+        fingerprint = hashlib.sha256(user["client_token"].encode('utf-8')).hexdigest()
+        cached = self._hashes.get(user['session_id'])
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+
+        value = await make_hash_async(user["client_token"])
+        self._hashes.set(user['session_id'], (fingerprint, value))
+        return value
+
+    async def authorize(self, user) -> bool:
+        """ Returns False when the session was already provisioned (its keys are extended) """
+        ttl = self.ttl_for(user)
+        if ttl <= 0:
+            return False
+
+        if await self.redis.exists(self.auth_key(user)):
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key in self.keys(user):
+                    pipe.expire(key, ttl)
+                await pipe.execute()
+
+            return False
+
+        credential = await self.client_token_hash(user)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(self.auth_key(user), credential, ex=ttl)
+            for chn, perm in self.permissions:
+                pipe.set(self.acl_key(user, chn), perm, ex=ttl)
+            await pipe.execute()
+
+        MQTT_DEBUG and logger.info("/MQTT/ Authorized user: %s (expires in %ss)", user['sub'], ttl)
+        return True
+
+    async def deauthorize(self, user):
+        self._hashes.pop(user['session_id'])
+        await self.redis.delete(*self.keys(user))
+        MQTT_DEBUG and logger.info("/MQTT/ De-authorized user: %s", user['sub'])
+
+    def schedule(self, coro):
+        """ Run `coro` in the background (from the sync signal receivers), errors are logged """
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("/MQTT/ ACL provisioning failed: %r", task.exception())
+
 
+def configure_mqtt_auth(app):
     def mqtt_auth(sender, user, **kwargs):
-        ops = (
-            asyncio.create_task(app.state.mqtt_session.set(k, v))
-            for k, v in authorize_user(user)
-        )
-        asyncio.gather(*ops)
+        app.state.mqtt_acl.schedule(app.state.mqtt_acl.authorize(user))
 
     def mqtt_deauth(sender, user, **kwargs):
-        ops = (
-            asyncio.create_task(app.state.mqtt_session.delete(k))
-            for k in deauthorize_user(user)
-        )
-        asyncio.gather(*ops)
+        app.state.mqtt_acl.schedule(app.state.mqtt_acl.deauthorize(user))
 
     @on_startup
     async def setup_mqtt_redis(app) -> None:
         # Initialize aioredis client
         redis_url = getattr(config, 'REDIS_URL', 'redis://localhost:6379')
         app.state.mqtt_session = aioredis.from_url(redis_url, encoding="utf-8", decode_responses=True)
+        app.state.mqtt_acl = MqttAclProvisioner(app.state.mqtt_session)
         logger.info("/MQTT/ Redis client initialized successfully")
 
     @on_shutdown
@@ -0,0 +1,340 @@
+"""
+In-process notification hub, an alternative to the MQTT broker for deployments
+that only push notifications to the UI.
+
+`NotifyHub.notify(scope_id, kind, target, msg, batch_id=None)` has the same
+signature as `FastapiMQTTClient.notify`. Clients subscribe with Server-Sent
+Events (`{NOTIFY_HUB_PATH}/sse`) or a WebSocket (`{NOTIFY_HUB_PATH}/ws`) to the
+scopes of the authenticated user (the `{user_id}/notify` channel of the MQTT
+setup), or to the `scope` query parameters when `NOTIFY_AUTH_REQUIRED` is off.
+
+- connections are indexed by scope, a notification is serialized once and
+  appended to the queues of its subscribers only;
+- every connection has a bounded queue (`NOTIFY_QUEUE_SIZE`), a slow client
+  loses its oldest frames instead of holding memory or the publishers;
+- with `NOTIFY_REDIS_URL` the notifications are fanned out through a Redis
+  pub/sub channel, so that every process delivers them to its own connections.
+"""
+import asyncio
+
+from collections import deque
+from time import monotonic
+from typing import Iterable, Optional
+
+from fastapi import Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pipe import Pipe
+from starlette.requests import HTTPConnection
+
+from fluvius.data import serialize_json
+from fluvius.error import BadRequestError, FluviusException, UnauthorizedError
+
+from ._meta import config, logger
+from .setup import on_startup, on_shutdown
+
+WS_POLICY_VIOLATION = 1008
+REDIS_RETRY_DELAY = 1.0
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+class NotifyConnection(object):
+    """ Frames pending delivery to a client, the oldest are dropped past `maxsize` """
+
+    __slots__ = ('scopes', 'dropped', 'closed', '_frames', '_ready')
+
+    def __init__(self, scopes: Iterable[str], maxsize: int = config.NOTIFY_QUEUE_SIZE):
+        self.scopes = frozenset(str(scope) for scope in scopes)
+        self.dropped = 0
+        self.closed = False
+        self._frames = deque(maxlen=maxsize)
+        self._ready = asyncio.Event()
+
+    def __len__(self):
+        return len(self._frames)
+
+    def put(self, frame: str):
+        if len(self._frames) == self._frames.maxlen:
+            self.dropped += 1
+
+        self._frames.append(frame)
+        self._ready.set()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[list]:
+        """ All the pending frames, `[]` after `timeout` seconds without any and None once closed """
+        if not self._frames and not self.closed:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        if self.closed:
+            return None
+
+        frames = list(self._frames)
+        self._frames.clear()
+        self._ready.clear()
+        return frames
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+
+class NotifyHub(object):
+    def __init__(self, queue_size=config.NOTIFY_QUEUE_SIZE, batch_max_size=config.NOTIFY_BATCH_MAX_SIZE,
+                 batch_ttl=config.NOTIFY_BATCH_TTL, redis_url=config.NOTIFY_REDIS_URL,
+                 channel=config.NOTIFY_REDIS_CHANNEL):
+        self.queue_size = queue_size
+        self.batch_max_size = batch_max_size
+        self.batch_ttl = batch_ttl
+        self.redis_url = redis_url
+        self.channel = channel
+        self.notified = 0
+        self.delivered = 0
+        self.expired = 0
+        self._subscribers = {}      # scope -> connections
+        self._connections = set()
+        self._batches = {}          # batch_id -> (created, frames)
+        self._outbox = deque()
+        self._redis = None
+        self._publisher = None
+        self._listener = None
+
+    @property
+    def redis(self):
+        if self._redis is None and self.redis_url:
+            import redis.asyncio as aioredis
+            self._redis = aioredis.from_url(self.redis_url, encoding="utf-8", decode_responses=True)
+
+        return self._redis
+
+    def scopes(self, auth_context) -> Iterable[str]:
+        """ Scopes an authenticated user is subscribed to """
+        return (str(auth_context.user._id),)
+
+    def subscribe(self, scopes: Iterable[str]) -> NotifyConnection:
+        connection = NotifyConnection(scopes, self.queue_size)
+        for scope in connection.scopes:
+            self._subscribers.setdefault(scope, set()).add(connection)
+
+        self._connections.add(connection)
+        return connection
+
+    def unsubscribe(self, connection: NotifyConnection):
+        connection.close()
+        self._connections.discard(connection)
+        for scope in connection.scopes:
+            subscribers = self._subscribers.get(scope)
+            if subscribers is None:
+                continue
+
+            subscribers.discard(connection)
+            if not subscribers:
+                del self._subscribers[scope]
+
+    @staticmethod
+    def frame(scope_id, message: dict) -> str:
+        return serialize_json({"scope": scope_id, "data": message})
+
+    def notify(self, scope_id, kind: str, target: str, msg: dict, batch_id=None):
+        self.notified += 1
+        scope = str(scope_id)
+        frame = self.frame(scope, dict(**msg, _kind=kind, _target=target))
+        if batch_id is None:
+            return self.publish(scope, frame)
+
+        self.expire_batches()
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            batch = self._batches[batch_id] = (monotonic(), deque(maxlen=self.batch_max_size))
+
+        batch[1].append((scope, frame))
+
+    def send(self, batch_id):
+        batch = self._batches.pop(batch_id, None)
+        if batch is None:
+            logger.warning("/NOTIFY/ Message queue for context_id: %s not found", batch_id)
+            return
+
+        for scope, frame in batch[1]:
+            self.publish(scope, frame)
+
+    def discard(self, batch_id):
+        """ Drop the queued messages of a batch, e.g. when its transaction failed """
+        self._batches.pop(batch_id, None)
+
+    def expire_batches(self):
+        if not self.batch_ttl:
+            return
+
+        deadline = monotonic() - self.batch_ttl
+        expired = [batch_id for batch_id, (created, _) in self._batches.items() if created < deadline]
+        for batch_id in expired:
+            del self._batches[batch_id]
+            logger.warning("/NOTIFY/ Discarded message queue of context: %s (not sent within %ss)", batch_id, self.batch_ttl)
+
+        self.expired += len(expired)
+
+    def publish(self, scope: str, frame: str):
+        if self.redis is None:
+            return self.fanout(scope, frame)
+
+        self._outbox.append((scope, frame))
+        if self._publisher is None or self._publisher.done():
+            try:
+                self._publisher = asyncio.get_running_loop().create_task(self._publish())
+            except RuntimeError:
+                # Not called from the event loop, published along with the next notification
+                pass
+
+    def fanout(self, scope: str, frame: str) -> int:
+        """ Queue `frame` on the connections subscribed to `scope` """
+        subscribers = self._subscribers.get(scope)
+        if not subscribers:
+            return 0
+
+        for connection in subscribers:
+            connection.put(frame)
+
+        self.delivered += len(subscribers)
+        return len(subscribers)
+
+    async def _publish(self):
+        while self._outbox:
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    while self._outbox:
+                        scope, frame = self._outbox.popleft()
+                        pipe.publish(self.channel, f"{scope}\n{frame}")
+
+                    await pipe.execute()
+            except Exception as e:
+                logger.warning("/NOTIFY/ Redis publish failed: %s", e)
+
+    async def _listen(self):
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            scope, _, frame = message["data"].partition("\n")
+                            self.fanout(scope, frame)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("/NOTIFY/ Redis subscription lost: %s", e)
+                await asyncio.sleep(REDIS_RETRY_DELAY)
+
+    def start(self):
+        if self.redis is not None and self._listener is None:
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def close(self):
+        for connection in list(self._connections):
+            self.unsubscribe(connection)
+
+        if self._publisher is not None:
+            await asyncio.gather(self._publisher, return_exceptions=True)
+            self._publisher = None
+
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    def metrics(self) -> dict:
+        return dict(
+            connections=len(self._connections),
+            scopes=len(self._subscribers),
+            queued=sum(len(connection) for connection in self._connections),
+            dropped=sum(connection.dropped for connection in self._connections),
+            notified=self.notified,
+            delivered=self.delivered,
+            batches=len(self._batches),
+            expired=self.expired,
+        )
+
+
+async def event_stream(hub: NotifyHub, connection: NotifyConnection, keepalive=config.NOTIFY_KEEPALIVE):
+    """ Server-Sent Events of a connection, a comment is sent every `keepalive` seconds while idle """
+    try:
+        yield ": connected\n\n"
+        while (frames := await connection.get(keepalive)) is not None:
+            yield "".join(f"data: {frame}\n\n" for frame in frames) if frames else ": keepalive\n\n"
+    finally:
+        hub.unsubscribe(connection)
+
+
+async def connection_scopes(hub: NotifyHub, connection: HTTPConnection):
+    if config.NOTIFY_AUTH_REQUIRED:
+        auth_context = await connection.app.state.get_auth_context(connection)
+        if not auth_context:
+            raise UnauthorizedError("S00.401", "User is not authenticated")
+
+        scopes = hub.scopes(auth_context)
+    else:
+        scopes = connection.query_params.getlist("scope")
+
+    if not scopes:
+        raise BadRequestError("S00.801", "No notification scope to subscribe to")
+
+    return scopes
+
+
+@Pipe
+def configure_notify(app, hub=None):
+    if hasattr(app.state, 'notify_hub'):
+        return app
+
+    hub = app.state.notify_hub = hub or NotifyHub()
+    path = config.NOTIFY_HUB_PATH
+
+    @app.get(f"{path}/sse", tags=["Notification"], response_class=StreamingResponse)
+    async def notify_sse(request: Request):
+        ''' Server-Sent Events stream of the notifications '''
+        connection = hub.subscribe(await connection_scopes(hub, request))
+        return StreamingResponse(event_stream(hub, connection), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    @app.websocket(f"{path}/ws")
+    async def notify_ws(websocket: WebSocket):
+        try:
+            scopes = await connection_scopes(hub, websocket)
+        except FluviusException as e:
+            await websocket.close(code=WS_POLICY_VIOLATION, reason=f"{e.errcode} {e.errmesg}")
+            return
+
+        await websocket.accept()
+        connection = hub.subscribe(scopes)
+
+        async def receive():
+            # The client is not expected to send anything, wait for it to disconnect
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+
+            connection.close()
+
+        receiver = asyncio.create_task(receive())
+        try:
+            while (frames := await connection.get()) is not None:
+                for frame in frames:
+                    await websocket.send_text(frame)
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            receiver.cancel()
+            hub.unsubscribe(connection)
+
+    @on_startup
+    async def start_notify_hub(app):
+        app.state.notify_hub.start()
+
+    @on_shutdown
+    async def close_notify_hub(app):
+        await app.state.notify_hub.close()
+
+    return app
@@ -0,0 +1,88 @@
+"""
+OpenAPI document cache.
+
+FastAPI generates the OpenAPI document on the first `/openapi.json` request and
+keeps it for the lifetime of the process. With hundreds of routes this takes
+seconds for every new process. When `OPENAPI_CACHE_PATH` is set, the generated
+document is also written to that file and reused by the next processes as long
+as the application version and the routes (paths, methods, names and models)
+are the same.
+"""
+import hashlib
+import json
+import os
+
+import fluvius
+
+from fastapi.routing import APIRoute
+
+from . import config, logger
+
+
+def model_name(field) -> str:
+    if field is None:
+        return ""
+
+    annotation = getattr(field.field_info, 'annotation', None) or field.type_
+    return f"{getattr(annotation, '__module__', '')}.{getattr(annotation, '__qualname__', repr(annotation))}"
+
+
+def openapi_fingerprint(app) -> str:
+    """ Identifies the OpenAPI document of `app` without generating it """
+    digest = hashlib.sha256(json.dumps([
+        fluvius.__version__, app.title, app.version, app.openapi_version, str(config.APPLICATION_SERIAL_NUMBER)
+    ]).encode('utf-8'))
+
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or not route.include_in_schema:
+            continue
+
+        digest.update(f"{sorted(route.methods)} {route.path} {route.name} {route.summary} "
+                      f"{model_name(route.body_field)} {model_name(route.response_field)}\n".encode('utf-8'))
+
+    return digest.hexdigest()
+
+
+def load_openapi(path, fingerprint):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    return cached.get("openapi") if cached.get("fingerprint") == fingerprint else None
+
+
+def save_openapi(path, fingerprint, schema):
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"fingerprint": fingerprint, "openapi": schema}, f)
+
+        # Atomic, concurrent workers may write the same document
+        os.replace(temp_path, path)
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning('Unable to cache the OpenAPI document at %s: %s', path, e)
+
+
+def setup_openapi_cache(app, path=config.OPENAPI_CACHE_PATH):
+    if not path:
+        return app
+
+    generate = app.openapi
+
+    def openapi():
+        if app.openapi_schema:
+            return app.openapi_schema
+
+        fingerprint = openapi_fingerprint(app)
+        if (schema := load_openapi(path, fingerprint)) is not None:
+            app.openapi_schema = schema
+            return schema
+
+        schema = generate()
+        save_openapi(path, fingerprint, schema)
+        return schema
+
+    app.openapi = openapi
+    return app
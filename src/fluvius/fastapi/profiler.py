@@ -1,29 +1,319 @@
+"""
+Request profiler.
+
+A request is profiled when the profiler is enabled and either
+- it is picked by the random sampler (`PROFILER_SAMPLE_RATE`), or
+- it carries the `PROFILER_HEADER` header or the `_profiler` query parameter
+  (whose value must be `PROFILER_KEY`; without a key, only in `DEVELOPER_MODE`).
+
+The `PROFILER_BUFFER_SIZE` slowest profiles are kept in memory and are served by
+the admin endpoints under `PROFILER_ADMIN_PATH` as HTML or speedscope JSON
+(pyinstrument) / pstats text (cProfile). The profiler is toggled at runtime with
+`PUT {PROFILER_ADMIN_PATH}`; when it is disabled the middleware costs a single
+attribute lookup per request.
+
+Note: cProfile profiles the whole thread, i.e. concurrent requests served by the
+same event loop show up in the profile as well. pyinstrument only attributes the
+time spent awaiting in the profiled request.
+"""
+import heapq
+import io
+import itertools
+import random
+
+from dataclasses import dataclass, field
+from time import perf_counter, time
+from typing import Any, Optional
+from urllib.parse import parse_qs
+
+from fastapi import Request, Response, Body
 from pipe import Pipe
+from starlette.datastructures import Headers
+
+from fluvius.error import BadRequestError, ForbiddenError, NotFoundError
+
+from . import config, logger
+
+PROFILER_BACKENDS = ("pyinstrument", "cprofile")
+PROFILE_FORMATS = {
+    "pyinstrument": ("html", "speedscope"),
+    "cprofile": ("html", "pstats"),
+}
+
+
+@dataclass(order=True)
+class ProfileRecord(object):
+    duration: float
+    id: int = field(compare=False)
+    method: str = field(compare=False)
+    path: str = field(compare=False)
+    status: Optional[int] = field(compare=False)
+    timestamp: float = field(compare=False)
+    backend: str = field(compare=False)
+    profile: Any = field(compare=False, repr=False)
+
+    def info(self) -> dict:
+        return dict(
+            id=self.id,
+            method=self.method,
+            path=self.path,
+            status=self.status,
+            duration=round(self.duration, 6),
+            timestamp=self.timestamp,
+            backend=self.backend,
+            formats=PROFILE_FORMATS[self.backend],
+        )
+
+
+class ProfileBuffer(object):
+    """ Keeps the `size` slowest profiles (min-heap on the request duration) """
+
+    def __init__(self, size=config.PROFILER_BUFFER_SIZE):
+        self.size = size
+        self._heap = []
+
+    def add(self, record: ProfileRecord) -> bool:
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, record)
+            return True
+
+        if self._heap and record.duration > self._heap[0].duration:
+            heapq.heapreplace(self._heap, record)
+            return True
+
+        return False
+
+    def get(self, record_id: int) -> Optional[ProfileRecord]:
+        return next((r for r in self._heap if r.id == record_id), None)
+
+    def records(self):
+        return sorted(self._heap, reverse=True)
+
+    def clear(self):
+        self._heap = []
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class PyinstrumentSession(object):
+    def __init__(self, interval):
+        from pyinstrument import Profiler
+        self._profiler = Profiler(interval=interval, async_mode="enabled")
+
+    def start(self):
+        self._profiler.start()
+
+    def stop(self):
+        self._profiler.stop()
+        return self._profiler.last_session
+
+
+class CProfileSession(object):
+    def __init__(self, interval):
+        import cProfile
+        self._profiler = cProfile.Profile()
+
+    def start(self):
+        self._profiler.enable()
+
+    def stop(self):
+        self._profiler.disable()
+        return self._profiler
+
+
+PROFILER_SESSIONS = {
+    "pyinstrument": PyinstrumentSession,
+    "cprofile": CProfileSession,
+}
+
+
+def render_profile(record: ProfileRecord, fmt: str):
+    """ Returns (content, media type) """
+    if fmt not in PROFILE_FORMATS[record.backend]:
+        raise BadRequestError('S00.601', f'Unsupported profile format for {record.backend}: {fmt}')
+
+    if record.backend == "pyinstrument":
+        from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+
+        if fmt == "speedscope":
+            return SpeedscopeRenderer().render(record.profile), "application/json"
+
+        return HTMLRenderer().render(record.profile), "text/html"
+
+    import pstats
+
+    output = io.StringIO()
+    pstats.Stats(record.profile, stream=output).sort_stats("cumulative").print_stats(100)
+    if fmt == "pstats":
+        return output.getvalue(), "text/plain"
+
+    from html import escape
+    title = escape(f"{record.method} {record.path} [{record.duration:.3f}s]")
+    return f"<html><head><title>{title}</title></head><body><pre>{escape(output.getvalue())}</pre></body></html>", "text/html"
+
+
+class RequestProfiler(object):
+    """ Runtime state of the profiler, shared by the middleware and the admin endpoints """
+
+    def __init__(self, enabled=config.PROFILER_ENABLED, sample_rate=config.PROFILER_SAMPLE_RATE,
+                 backend=config.PROFILER_BACKEND, interval=config.PROFILER_INTERVAL,
+                 buffer_size=config.PROFILER_BUFFER_SIZE, header=config.PROFILER_HEADER, key=config.PROFILER_KEY):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.backend = backend
+        self.interval = interval
+        self.header = header.lower()
+        self.key = key
+        self.buffer = ProfileBuffer(buffer_size)
+        self._counter = itertools.count(1)
+
+    def update(self, enabled=None, sample_rate=None, backend=None):
+        if backend is not None and backend not in PROFILER_BACKENDS:
+            raise BadRequestError('S00.602', f'Unsupported profiler backend: {backend}')
+
+        if sample_rate is not None and not 0.0 <= sample_rate <= 1.0:
+            raise BadRequestError('S00.603', f'Sample rate must be in [0, 1]: {sample_rate}')
+
+        if enabled is not None:
+            self.enabled = enabled
+
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+
+        if backend is not None:
+            self.backend = backend
+
+    def settings(self) -> dict:
+        return dict(
+            enabled=self.enabled,
+            sample_rate=self.sample_rate,
+            backend=self.backend,
+            buffer_size=self.buffer.size,
+            profiles=len(self.buffer),
+        )
+
+    def valid_key(self, value: Optional[str]) -> bool:
+        # Without a key only developer mode lets clients trigger profiling (same rule as the admin endpoints)
+        if value is None:
+            return False
+
+        return value == self.key if self.key else config.DEVELOPER_MODE
+
+    def requested(self, scope) -> bool:
+        if self.valid_key(Headers(scope=scope).get(self.header)):
+            return True
+
+        if b"_profiler" in scope.get("query_string", b""):
+            values = parse_qs(scope["query_string"].decode("latin-1"), keep_blank_values=True).get("_profiler")
+            if values and self.valid_key(values[0]):
+                return True
+
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def record(self, scope, status, duration, profile):
+        record = ProfileRecord(
+            duration=duration,
+            id=next(self._counter),
+            method=scope["method"],
+            path=scope["path"],
+            status=status,
+            timestamp=time(),
+            backend=self.backend,
+            profile=profile,
+        )
+        self.buffer.add(record)
+        return record
+
+
+class ProfilerMiddleware(object):
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        profiler = self.profiler
+        if not profiler.enabled or scope["type"] != "http" or not profiler.requested(scope):
+            return await self.app(scope, receive, send)
+
+        status = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            session = PROFILER_SESSIONS[profiler.backend](profiler.interval)
+            session.start()
+        except Exception as e:
+            # e.g. another profiler is already active on this thread
+            logger.warning('Unable to start the request profiler: %s', e)
+            return await self.app(scope, receive, send)
+
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = perf_counter() - started
+            profiler.record(scope, status, duration, session.stop())
 
 
 @Pipe
-def configure_profiler(app):
-    from pyinstrument import Profiler
-    from starlette.middleware.base import BaseHTTPMiddleware
+def configure_profiler(app, **kwargs):
+    if hasattr(app.state, 'profiler'):
+        return app
 
-    # @TODO: Should we create the profiler right here?
-    # profiler = Profiler()
+    profiler = app.state.profiler = RequestProfiler(**kwargs)
+    app.add_middleware(ProfilerMiddleware, profiler=profiler)
+    admin_path = config.PROFILER_ADMIN_PATH
 
-    class FluviusProfilerMiddleware(BaseHTTPMiddleware):
-        """ Collect performance information by passing
-            _profiler=True as a http request parameter """
+    def check_access(request: Request):
+        if profiler.key:
+            if request.headers.get(profiler.header) != profiler.key:
+                raise ForbiddenError('S00.604', 'Invalid profiler key')
+        elif not config.DEVELOPER_MODE:
+            raise ForbiddenError('S00.605', 'Profiler admin endpoints require PROFILER_KEY outside of developer mode')
 
-        async def dispatch(self, request: Request, call_next):
-            if "_profiler" not in request.args:
-                return await call_next(request)
+    @app.get(admin_path, tags=["Profiler"])
+    async def profiler_status(request: Request):
+        ''' Profiler settings and the slowest profiled requests '''
+        check_access(request)
+        return dict(
+            settings=profiler.settings(),
+            profiles=[record.info() for record in profiler.buffer.records()]
+        )
 
-            profiler = Profiler()
-            profiler.start()
-            response = await call_next(request)
-            profiler.stop()
-            return profiler.output_html()
+    @app.put(admin_path, tags=["Profiler"])
+    async def profiler_update(
+        request: Request,
+        enabled: Optional[bool] = Body(None),
+        sample_rate: Optional[float] = Body(None),
+        backend: Optional[str] = Body(None),
+        clear: bool = Body(False),
+    ):
+        ''' Toggle the profiler at runtime '''
+        check_access(request)
+        profiler.update(enabled=enabled, sample_rate=sample_rate, backend=backend)
+        if clear:
+            profiler.buffer.clear()
 
-    app.add_middleware(FluviusProfilerMiddleware)
-    return app
+        return profiler.settings()
+
+    @app.get(f"{admin_path}/{{profile_id}}", tags=["Profiler"])
+    async def profiler_profile(request: Request, profile_id: int, format: str = "html"):
+        ''' Profile of a request as HTML, speedscope JSON (https://speedscope.app) or pstats text '''
+        check_access(request)
+        record = profiler.buffer.get(profile_id)
+        if record is None:
+            raise NotFoundError('S00.606', f'Profile not found: {profile_id}')
 
+        content, media_type = render_profile(record, format)
+        headers = {}
+        if format == "speedscope":
+            headers["Content-Disposition"] = f'attachment; filename="profile-{profile_id}.speedscope.json"'
 
+        return Response(content, media_type=media_type, headers=headers)
+
+    return app
@@ -6,18 +6,29 @@ from typing import Annotated, Union, Any, Optional, Dict, List
 from types import MethodType
 from pydantic import BaseModel
 from fastapi import Request, Path, Body, Query
+from fastapi.responses import StreamingResponse
+from fluvius.query.cache import setup_cache_invalidation
 from fluvius.query.helper import scope_decoder
-from fluvius.query import QueryParams, FrontendQuery, QueryResourceMeta, QueryManager
+from fluvius.query import QueryParams, ExportParams, AggregateParams, FrontendQuery, QueryResourceMeta, QueryManager
 from fluvius.helper import load_class
 from fluvius.error import ForbiddenError, BadRequestError
+from fluvius.data.constant import ETAG_FIELD
 
 from . import logger, config
 from .auth import auth_required
 from .helper import uri, SCOPE_SELECTOR, PATH_QUERY_SELECTOR
+from .response import FastJSONResponse
+from .export import export_response
+from .conditional import conditional_response
 from pydantic import BaseModel
 
 
-def register_resource_endpoints(app, query_manager, query_resource):
+def cached_response(request: Request, result, cache_info, response_class=FastJSONResponse):
+    headers = {"Cache-Control": config.QUERY_CACHE_CONTROL}
+    return conditional_response(request, result, cache_info["etag"], response_class, headers)
+
+
+def register_resource_endpoints(app, query_manager, query_resource, response_class=FastJSONResponse):
     query_id = query_resource._identifier
     meta = query_resource.Meta
 
@@ -25,11 +36,12 @@ def register_resource_endpoints(app, query_manager, query_resource):
     api_tags = meta.tags or query_manager.Meta.tags
     api_docs = meta.desc or query_manager.Meta.desc
     scope_schema = (meta.scope_required or meta.scope_optional)
+    etag_field = query_resource._alias.get(ETAG_FIELD, ETAG_FIELD)
 
     if meta.strict_response:
         class ListResultSchema(BaseModel):
             data: List[query_resource]
-            meta: Dict
+            pagination: Dict
     else:
         ListResultSchema = None
 
@@ -44,27 +56,75 @@ def register_resource_endpoints(app, query_manager, query_resource):
         if meta.scope_required and not fe_query.scope:
             raise ForbiddenError('Q00.002', f"Scoping is required for resource: {query_resource}")
 
-        data, page = await query_manager.query_resource(auth_ctx, query_id, fe_query)
-        return {
+        cache_info = {} if meta.cache_ttl else None
+        data, page = await query_manager.query_resource(auth_ctx, query_id, fe_query, cache_info=cache_info)
+        result = {
             'data': data,
             'pagination': page
         }
 
-    async def item_query(request: Request, item_identifier, scope: str=None):
+        # Rows are trusted, the response model (if any) is only used for the API schema
+        if not cache_info:
+            return response_class(result)
+
+        return cached_response(request, result, cache_info, response_class)
+
+    async def item_query(request: Request, item_identifier, scope: str=None, fields: str=None):
+        auth_ctx = getattr(request.state, 'auth_context', None)
+        if not scope_schema and scope:
+            raise BadRequestError('Q00.001', f'Scoping is not allowed for resource: {query_resource}')
+
+        fe_query = FrontendQuery.from_query_params(QueryParams(fields=fields), scope=scope, scope_schema=scope_schema)
+
+        if meta.scope_required and not fe_query.scope:
+            raise ForbiddenError('Q00.002', f"Scoping is required for resource: {query_resource}")
+
+        item = await query_manager.query_item(auth_ctx, query_id, item_identifier, fe_query)
+        if etag := item.get(etag_field):
+            return conditional_response(request, item, etag, response_class)
+
+        return response_class(item)
+
+    async def resource_export(request: Request, export_params: ExportParams, scope: str=None):
+        auth_ctx = getattr(request.state, 'auth_context', None)
+
+        if not scope_schema and scope:
+            raise BadRequestError('Q00.001', f'Scoping is not allowed for resource: {query_resource}')
+
+        fe_query = FrontendQuery.from_query_params(export_params, scope=scope, scope_schema=scope_schema)
+
+        if meta.scope_required and not fe_query.scope:
+            raise ForbiddenError('Q00.002', f"Scoping is required for resource: {query_resource}")
+
+        rows = await query_manager.export_resource(auth_ctx, query_id, fe_query, max_rows=export_params.max_rows)
+        return export_response(request, rows, export_params.format, query_id)
+
+    async def resource_aggregate(request: Request, aggregate_params: AggregateParams, scope: str=None):
         auth_ctx = getattr(request.state, 'auth_context', None)
+
         if not scope_schema and scope:
             raise BadRequestError('Q00.001', f'Scoping is not allowed for resource: {query_resource}')
 
-        fe_query = FrontendQuery.from_query_params(QueryParams(), scope=scope, scope_schema=scope_schema)
+        fe_query = FrontendQuery.from_query_params(aggregate_params, scope=scope, scope_schema=scope_schema)
 
         if meta.scope_required and not fe_query.scope:
             raise ForbiddenError('Q00.002', f"Scoping is required for resource: {query_resource}")
 
-        return await query_manager.query_item(auth_ctx, query_id, item_identifier, fe_query)
+        cache_info = {} if meta.cache_ttl else None
+        data, info = await query_manager.aggregate_resource(auth_ctx, query_id, fe_query, cache_info=cache_info)
+        result = {
+            'data': data,
+            'meta': info
+        }
+
+        if not cache_info:
+            return response_class(result)
+
+        return cached_response(request, result, cache_info, response_class)
 
     def endpoint(*paths, method=app.get, base=base_uri, auth={}, **kwargs):
         api_path = uri(base, *paths)
-        api_meta = {"tags": api_tags, "description": api_docs} | kwargs
+        api_meta = {"tags": api_tags, "description": api_docs, "response_class": response_class} | kwargs
         api_decorator = method(api_path, **api_meta)
         if not meta.auth_required:
             return api_decorator
@@ -102,10 +162,41 @@ def register_resource_endpoints(app, query_manager, query_resource):
             async def query_resource_default(request: Request, query_params: Annotated[QueryParams, Query()]):
                 return await resource_query(request, query_params, None, None)
 
+    if meta.allow_export:
+        export_params = dict(description=meta.desc, response_class=StreamingResponse)
+        if scope_schema:
+            @endpoint(SCOPE_SELECTOR, "", base=f"/_export{base_uri}", summary=f"{meta.name}ScopedExport", **export_params)
+            async def export_resource_scoped(request: Request, export_params: Annotated[ExportParams, Query()], scope: Annotated[str, Path()]):
+                return await resource_export(request, export_params, scope)
+
+        if not meta.scope_required:
+            @endpoint("", base=f"/_export{base_uri}", summary=f"{meta.name}Export", **export_params)
+            async def export_resource_default(request: Request, export_params: Annotated[ExportParams, Query()]):
+                return await resource_export(request, export_params)
+
+    if meta.allow_aggregate:
+        aggregate_params = dict(description=meta.desc)
+        if scope_schema:
+            @endpoint(SCOPE_SELECTOR, "", base=f"/_aggregate{base_uri}", summary=f"{meta.name}ScopedAggregate", **aggregate_params)
+            async def aggregate_resource_scoped(request: Request, aggregate_params: Annotated[AggregateParams, Query()], scope: Annotated[str, Path()]):
+                return await resource_aggregate(request, aggregate_params, scope)
+
+        if not meta.scope_required:
+            @endpoint("", base=f"/_aggregate{base_uri}", summary=f"{meta.name}Aggregate", **aggregate_params)
+            async def aggregate_resource_default(request: Request, aggregate_params: Annotated[AggregateParams, Query()]):
+                return await resource_aggregate(request, aggregate_params)
+
     if meta.allow_meta_view:
+        resource_meta = None
+
         @endpoint(base=f"/_meta{base_uri}", summary=f"{meta.name}Meta", tags=["Metadata"])
         async def query_info(request: Request) -> dict:
-            return query_resource.resource_meta()
+            # Generated on first request
+            nonlocal resource_meta
+            if resource_meta is None:
+                resource_meta = query_resource.resource_meta()
+
+            return resource_meta
 
     if meta.allow_item_view:
         if meta.strict_response:
@@ -119,15 +210,15 @@ def register_resource_endpoints(app, query_manager, query_resource):
         
         if not meta.scope_required:
             @endpoint("{identifier}", summary=f"{meta.name}Item", **item_params)
-            async def query_item_default(request: Request, identifier: Annotated[str, Path()]):
-                item = await item_query(request, identifier)
+            async def query_item_default(request: Request, identifier: Annotated[str, Path()], fields: Annotated[str | None, Query()] = None):
+                item = await item_query(request, identifier, fields=fields)
                 return item
 
         if scope_schema:
             @endpoint(SCOPE_SELECTOR, "{identifier}", summary=f"{meta.name}ScopedItem", **item_params)
-            async def query_item_scoped(request: Request, identifier: Annotated[str, Path()], scope: Annotated[str, Path()]):
+            async def query_item_scoped(request: Request, identifier: Annotated[str, Path()], scope: Annotated[str, Path()], fields: Annotated[str | None, Query()] = None):
                 # return query_resource(**(await item_query(request, identifier, scope=scope)).__dict__)
-                return await item_query(request, identifier, scope=scope)
+                return await item_query(request, identifier, scope=scope, fields=fields)
 
 
 def register_manager_endpoints(app, query_manager):
@@ -156,12 +247,12 @@ def register_manager_endpoints(app, query_manager):
             **kwargs
         )(handler)
 
-def register_query_manager(app, qm_cls):
+def register_query_manager(app, qm_cls, response_class=FastJSONResponse):
     query_manager = qm_cls(app)
 
     register_manager_endpoints(app, query_manager)
     for _, query_resource in query_manager.resource_registry.items():
-        register_resource_endpoints(app, query_manager, query_resource)
+        register_resource_endpoints(app, query_manager, query_resource, response_class)
     
     return app
 
@@ -218,4 +309,5 @@ def configure_query_manager(app, *query_managers):
         qm_cls = load_class(qm_spec, base_class=QueryManager)
         register_query_manager(app, qm_cls)
 
+    setup_cache_invalidation()
     return app
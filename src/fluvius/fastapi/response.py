@@ -1,3 +1,69 @@
+"""
+Fast JSON responses.
+
+Query rows are SQLAlchemy `RowMapping`s and command responses are trusted domain
+objects, they are serialised as-is with orjson (UUID, datetime, date and enum are
+native types) instead of being validated again against the response model and
+walked by `jsonable_encoder`. Falls back to the standard `json` module when
+orjson is not installed.
+"""
+import json
+
+from collections.abc import Mapping
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from fluvius.data.serializer import FluviusJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+_fallback_encoder = FluviusJSONEncoder()
+
+
+def encode_default(obj):
+    """ Values that orjson does not serialise natively """
+    if isinstance(obj, Mapping):
+        return dict(obj)
+
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(by_alias=True)
+
+    if isinstance(obj, Decimal):
+        # Same as `fastapi.encoders.decimal_encoder`
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+
+    return _fallback_encoder.default(obj)
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=encode_default, option=orjson.OPT_NON_STR_KEYS)
+
+    return json.dumps(
+        content,
+        default=encode_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
 
 # def json_response(data, *args, **kwargs) -> response.HTTPResponse:
 #     return response.json(data, dumps=serialize_json, *args, **kwargs)
@@ -9,6 +9,8 @@ from functools import wraps
 from pydantic import ValidationError
 
 from . import config, logger
+from .compression import setup_compression
+from .openapi import setup_openapi_cache
 
 _on_startups = tuple()
 _on_shutdowns = tuple()
@@ -58,6 +60,8 @@ def create_app(config=config, **kwargs) -> FastAPI:
             "build_time": config.APPLICATION_BUILD_TIME,
         }
 
+    setup_compression(app)
+    setup_openapi_cache(app)
     return setup_error_handler(app)
 
 
@@ -19,6 +19,7 @@ from .genutil import (
     when,
 )
 
+from .cache import LRUCache
 from .clsutil import ImmutableNamespace
 from .registry import ClassRegistry
 from .osutil import ensure_path, safe_filename
@@ -0,0 +1,61 @@
+import threading
+
+from collections import OrderedDict
+from time import monotonic
+
+_MISSING = object()
+
+
+class LRUCache(object):
+    """ Bounded in-process LRU mapping with optional per-entry expiry (in seconds) """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+
+            value, expires = entry
+            if expires is not None and expires <= monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self._ttl if ttl is None else ttl
+        if self._maxsize <= 0 or (ttl is not None and ttl <= 0):
+            return
+
+        with self._lock:
+            self._data[key] = (value, None if ttl is None else monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def keys(self):
+        with self._lock:
+            return list(self._data.keys())
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,267 @@
+"""
+Lightweight in-process metrics, exposed in the Prometheus text format.
+
+Counters and histograms keep their values in a dict per label values: recording
+is a dict lookup and a few additions, there is no lock (the event loop thread
+records) and nothing is exported until scraped. `collector` functions are called
+at scrape time for the values that are cheaper to read than to track (pool
+usage, cache statistics, publish counts ...).
+
+Multiple processes (e.g. uvicorn workers) do not share memory: every process
+writes its snapshot to a directory (`MetricsRegistry.flush`) and the exposition
+merges the snapshots of all the processes. Counters and histograms are summed,
+gauges are reported per process (`pid` label) for the processes that flushed
+recently. The process serving a scrape flushes first and only reads the files:
+every file only grows, so totals never decrease whichever process serves the
+next scrape.
+
+The counters of exited processes are kept (totals must not decrease), i.e. the
+directory grows with every process restart. Empty it (`clear_snapshots`) when
+the deployment starts, before the processes are spawned.
+"""
+import bisect
+import json
+import os
+
+from time import time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from fluvius import logger
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SNAPSHOT_SUFFIX = ".metrics.json"
+
+
+def format_value(value) -> str:
+    if value == float('inf'):
+        return "+Inf"
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def format_labels(names, values, extra=()) -> str:
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+
+    escaped = (str(v).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Metric(object):
+    kind = None
+
+    __slots__ = ('name', 'doc', 'labels', 'values')
+
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.doc = doc
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def snapshot(self) -> dict:
+        return dict(kind=self.kind, doc=self.doc, labels=self.labels, values=[[list(k), v] for k, v in self.values.items()])
+
+    def merge(self, values):
+        for labels, value in values:
+            labels = tuple(labels)
+            self.values[labels] = self.values.get(labels, 0) + value
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name, labels, (), value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, labels: tuple = (), amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield f"{self.name}_total", labels, (), value
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, labels: tuple = (), value=0):
+        self.values[labels] = value
+
+    def inc(self, labels: tuple = (), amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Histogram(Metric):
+    """ Values are `[count per bucket ..., count above the last bucket, sum]` (not cumulative) """
+
+    kind = "histogram"
+
+    __slots__ = ('buckets',)
+
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels: tuple, value: float):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def snapshot(self) -> dict:
+        return super().snapshot() | dict(buckets=self.buckets)
+
+    def merge(self, values):
+        for labels, counts in values:
+            labels = tuple(labels)
+            entry = self.values.get(labels)
+            if entry is None:
+                self.values[labels] = list(counts)
+            else:
+                self.values[labels] = [a + b for a, b in zip(entry, counts)]
+
+    def samples(self):
+        for labels, entry in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), entry):
+                cumulative += count
+                yield f"{self.name}_bucket", labels, (("le", format_value(bound)),), cumulative
+
+            yield f"{self.name}_sum", labels, (), entry[-1]
+            yield f"{self.name}_count", labels, (), cumulative
+
+
+METRIC_TYPES = {cls.kind: cls for cls in (Counter, Gauge, Histogram)}
+
+
+def from_snapshot(name: str, data: dict) -> Metric:
+    params = dict(buckets=data["buckets"]) if data["kind"] == "histogram" else {}
+    metric = METRIC_TYPES[data["kind"]](name, data["doc"], data["labels"], **params)
+    metric.merge(data["values"])
+    return metric
+
+
+class MetricsRegistry(object):
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: Dict[str, Callable[[], Iterable[Metric]]] = {}
+        self._flushed_pid = None
+
+    def _register(self, cls, name, doc, labels, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, doc, labels, **kwargs)
+        elif not isinstance(metric, cls) or metric.labels != tuple(labels):
+            raise ValueError(f'Metric [{name}] is already registered as a {metric.kind} {metric.labels}')
+
+        return metric
+
+    def counter(self, name: str, doc: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter, name, doc, labels)
+
+    def histogram(self, name: str, doc: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, doc, labels, buckets=buckets)
+
+    def collector(self, func: Callable[[], Iterable[Metric]], name: Optional[str] = None):
+        """ Register `func` (called at scrape time), a collector registered with the same name is replaced """
+        self._collectors[name or f"{func.__module__}.{func.__qualname__}"] = func
+        return func
+
+    def collect(self) -> Iterable[Metric]:
+        yield from self._metrics.values()
+        for name, collector in list(self._collectors.items()):
+            try:
+                yield from collector()
+            except Exception as e:
+                logger.warning('Metrics collector [%s] failed: %s', name, e)
+
+    def snapshot(self) -> dict:
+        return {metric.name: metric.snapshot() for metric in self.collect()}
+
+    def reset(self):
+        for metric in self._metrics.values():
+            metric.values = {}
+
+    def flush(self, directory: str):
+        """ Write the snapshot of this process to `directory` """
+        pid = os.getpid()
+        path = os.path.join(directory, f"{pid}{SNAPSHOT_SUFFIX}")
+        temp_path = f"{path}.tmp"
+        try:
+            if self._flushed_pid != pid and os.path.exists(path):
+                # Left by an exited process with the same pid, its counters are kept
+                os.replace(path, os.path.join(directory, f"{pid}-{int(time() * 1000)}{SNAPSHOT_SUFFIX}"))
+
+            self._flushed_pid = pid
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"time": time(), "metrics": self.snapshot()}, f)
+
+            os.replace(temp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning('Unable to write the metrics snapshot at %s: %s', path, e)
+
+    def merged(self, directory: Optional[str] = None, stale_after: float = 60) -> Iterable[Metric]:
+        """ The snapshots of all the processes in `directory` (this process included, flushed first) """
+        if not directory:
+            return list(self.collect())
+
+        # Never its live values: the others' snapshots are older, totals would decrease
+        # when the next scrape is served by another process
+        self.flush(directory)
+        metrics = {}
+
+        def add(source_pid, snapshot):
+            for name, data in snapshot.items():
+                if data["kind"] == "gauge":
+                    data = data | dict(
+                        labels=[*data["labels"], "pid"],
+                        values=[[[*labels, source_pid], value] for labels, value in data["values"]]
+                    )
+
+                if (metric := metrics.get(name)) is None:
+                    metrics[name] = from_snapshot(name, data)
+                elif metric.kind == data["kind"]:
+                    metric.merge(data["values"])
+
+        for filename in os.listdir(directory):
+            if not filename.endswith(SNAPSHOT_SUFFIX):
+                continue
+
+            try:
+                with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+
+            # Counters of the exited processes are kept (they must not decrease), their gauges are not
+            source = filename.removesuffix(SNAPSHOT_SUFFIX)
+            stale = "-" in source or time() - snapshot["time"] > stale_after
+            add(source, {k: v for k, v in snapshot["metrics"].items() if not (stale and v["kind"] == "gauge")})
+
+        return list(metrics.values())
+
+    def exposition(self, directory: Optional[str] = None, stale_after: float = 60) -> str:
+        """ Prometheus text format (version 0.0.4) """
+        lines = []
+        for metric in sorted(self.merged(directory, stale_after), key=lambda m: m.name):
+            family = f"{metric.name}_total" if metric.kind == "counter" else metric.name
+            lines.append(f"# HELP {family} {metric.doc}")
+            lines.append(f"# TYPE {family} {metric.kind}")
+            for name, labels, extra, value in metric.samples():
+                lines.append(f"{name}{format_labels(metric.labels, labels, extra)} {format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def clear_snapshots(directory: str):
+    """ Remove the snapshots of `directory`, when no process writes there (i.e. at deployment start) """
+    for filename in os.listdir(directory):
+        if filename.endswith(SNAPSHOT_SUFFIX) or filename.endswith(f"{SNAPSHOT_SUFFIX}.tmp"):
+            os.remove(os.path.join(directory, filename))
+
+
+metrics = MetricsRegistry()
@@ -7,7 +7,7 @@ from ._meta import config, logger
 from .filter import FilterPreset, Filter
 from .resource import QueryResource, QueryResourceMeta, endpoint
 from .field import QueryField as Field
-from .model import QueryParams, FrontendQuery
+from .model import QueryParams, ExportParams, AggregateParams, FrontendQuery
 from .manager import QueryManager
 from .domain import DomainQueryResource, DomainQueryManager
 
@@ -17,6 +17,8 @@ __all__ = (
     "FrontendQuery",
     "QueryManager",
     "QueryParams",
+    "ExportParams",
+    "AggregateParams",
     "QueryResource",
     "QueryResourceMeta",
     "Field",
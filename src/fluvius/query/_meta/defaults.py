@@ -1,6 +1,7 @@
 ALLOW_SELECT_ESCAPE = False
 DEVELOPER_MODE = False
 DEFAULT_QUERY_LIMIT = 25
+QUERY_PARSE_CACHE_SIZE = 1024  # decoded query / path / list parameters, keyed by the raw string
 
 LOG_LEVEL = "debug"
 
@@ -13,3 +14,14 @@ TEXT_SEARCH_LANGUAGE_NOSTOP = "english_nostop"
 
 QUERY_PERMISSION = False
 DEFAULT_PERMISSION_RESOURCE = False
+
+# Query result cache (opt-in per resource with `Meta.cache_ttl`)
+QUERY_CACHE_BACKEND = "local"   # "local" (in-process LRU) or "redis"
+QUERY_CACHE_SIZE = 2048
+QUERY_CACHE_REDIS_URL = "redis://localhost:6379"
+
+# Aggregate queries (opt-in per resource with `Meta.allow_aggregate`)
+QUERY_AGGREGATE_LIMIT = 1000    # default maximum of returned groups
+
+# Streaming exports (opt-in per resource with `Meta.allow_export`)
+QUERY_EXPORT_MAX_ROWS = None    # global row cap, None for unlimited
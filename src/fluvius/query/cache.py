@@ -0,0 +1,161 @@
+"""
+Query result cache.
+
+Opt-in per resource with `QueryResource.Meta.cache_ttl`. Entries are keyed by the
+normalised `BackendQuery` (which embeds the rendered policy scope, i.e. the
+restriction fingerprint) and by the current generation of every table tag of the
+resource. Committed modifications of a table (see `fluvius.data.event.data_changed`)
+bump its generation, which makes every dependent entry unreachable at once.
+
+The ETag of a result is derived from the same key, therefore it changes exactly
+when the cached result may change.
+"""
+import hashlib
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from fluvius.data import BackendQuery, serialize_json, deserialize_json
+from fluvius.data.event import data_changed
+from fluvius.helper import LRUCache
+
+from . import config, logger
+
+REDIS_KEY_PREFIX = "fluvius:query-cache"
+
+
+def normalize_backend_query(backend_query: BackendQuery) -> Tuple:
+    """ Order independent, hashable representation of a backend query """
+    return (
+        backend_query.identifier,
+        tuple(sorted(backend_query.include)),
+        tuple(sorted(backend_query.exclude)),
+        tuple(backend_query.join or ()),
+        backend_query.limit,
+        backend_query.offset,
+        backend_query.sort,
+        backend_query.where,
+        backend_query.scope,
+        tuple(sorted(backend_query.alias.items())),
+        backend_query.incl_deleted,
+        backend_query.text,
+        backend_query.text_fields,
+        backend_query.group_by,
+        backend_query.aggregate,
+    )
+
+
+def query_fingerprint(resource_id: str, backend_query: BackendQuery) -> str:
+    normalized = repr((resource_id, normalize_backend_query(backend_query)))
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class QueryResultCache(object):
+    """ In-process backend """
+
+    def __init__(self, maxsize=config.QUERY_CACHE_SIZE, listen=True):
+        self._entries = LRUCache(maxsize)
+        self._generations = {}
+        self._listening = listen
+        if listen:
+            data_changed.connect(self.on_data_changed, weak=False)
+
+    async def generations(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    async def invalidate(self, tags: Iterable[str]):
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+
+    def on_data_changed(self, sender, tables=(), **kwargs):
+        return self.invalidate(tables)
+
+    async def cache_key(self, fingerprint: str, tags: Iterable[str]) -> str:
+        generations = await self.generations(tags)
+        return f"{fingerprint}:{'.'.join(map(str, generations))}"
+
+    async def get(self, key: str) -> Optional[Tuple[Any, Dict]]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, data, meta, ttl: int):
+        self._entries.set(key, (data, meta), ttl=ttl)
+
+    def close(self):
+        if self._listening:
+            data_changed.disconnect(self.on_data_changed)
+
+
+class RedisQueryResultCache(QueryResultCache):
+    """ Shared backend, generations are Redis counters so every worker sees invalidations.
+        Cached rows are stored as JSON (i.e. UUID / datetime values are returned as strings). """
+
+    def __init__(self, maxsize=config.QUERY_CACHE_SIZE, redis_url=config.QUERY_CACHE_REDIS_URL, listen=False):
+        super().__init__(maxsize, listen=listen)
+        import redis.asyncio as aioredis
+        self._redis = aioredis.from_url(redis_url, encoding="utf-8", decode_responses=True)
+        if not listen:
+            # The generations are shared, they are bumped once per commit by the process invalidator
+            connect_invalidation(redis_url)
+
+    async def generations(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        tags = tuple(tags)
+        if not tags:
+            return ()
+
+        values = await self._redis.mget([f"{REDIS_KEY_PREFIX}:gen:{tag}" for tag in tags])
+        return tuple(int(v or 0) for v in values)
+
+    async def invalidate(self, tags: Iterable[str]):
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(f"{REDIS_KEY_PREFIX}:gen:{tag}")
+            await pipe.execute()
+
+    async def get(self, key: str) -> Optional[Tuple[Any, Dict]]:
+        try:
+            value = await self._redis.get(f"{REDIS_KEY_PREFIX}:{key}")
+        except Exception as e:
+            logger.warning('Query cache (redis) lookup failed: %s', e)
+            return None
+
+        if value is None:
+            return None
+
+        data, meta = deserialize_json(value)
+        return data, meta
+
+    async def set(self, key: str, data, meta, ttl: int):
+        value = serialize_json([[dict(row) for row in data], meta])
+        try:
+            await self._redis.set(f"{REDIS_KEY_PREFIX}:{key}", value, ex=ttl)
+        except Exception as e:
+            logger.warning('Query cache (redis) update failed: %s', e)
+
+
+QUERY_CACHE_BACKENDS = {
+    'local': QueryResultCache,
+    'redis': RedisQueryResultCache,
+}
+
+
+_invalidators: Dict[str, RedisQueryResultCache] = {}
+
+
+def connect_invalidation(redis_url=config.QUERY_CACHE_REDIS_URL) -> RedisQueryResultCache:
+    """ Bump the shared table generations on the committed modifications of this process (once per process) """
+    invalidator = _invalidators.get(redis_url)
+    if invalidator is None:
+        invalidator = _invalidators[redis_url] = RedisQueryResultCache(maxsize=1, redis_url=redis_url, listen=True)
+
+    return invalidator
+
+
+def setup_cache_invalidation(backend=config.QUERY_CACHE_BACKEND):
+    """ Called at configuration time by every process that may write (API and domain workers), not on
+        the first cached query: a process that only writes must still invalidate the shared caches.
+        In-process caches need nothing, they start empty. """
+    if backend == 'redis':
+        return connect_invalidation()
+
+
+def create_query_cache(backend=config.QUERY_CACHE_BACKEND) -> QueryResultCache:
+    return QUERY_CACHE_BACKENDS[backend]()
@@ -1,6 +1,8 @@
+from contextlib import aclosing
 from typing import Optional, Dict
 
 from fluvius.data import UUID_TYPE, BackendQuery
+from fluvius.data.query import statement_fields
 from fluvius.data.data_driver.sqla.driver import sqla_error_handler
 from datetime import datetime
 
@@ -41,6 +43,24 @@ class DomainQueryManager(QueryManager):
     def policymgr(self):
         return self._policymgr
 
+    def unindexed_scope_fields(self, query_resource: QueryResource, backend_query: BackendQuery):
+        """ Policy scope fields of the query that cannot be served by an index of the backend table """
+        connector = self.data_manager.connector
+        data_schema = connector.lookup_data_schema(query_resource.backend_model())
+        return connector.unindexed_fields(data_schema, statement_fields(backend_query.scope))
+
+    def cache_tags(self, query_resource) -> tuple:
+        """ Resolve the backend model to the table name used by `data_changed` notifications """
+        data_schema = self.data_manager.connector.lookup_data_schema(query_resource.backend_model())
+        return (data_schema.__table__.fullname, *query_resource.Meta.cache_tags)
+
+    def validate_backend_query(self, query_resource, backend_query):
+        if config.DEVELOPER_MODE and backend_query.scope:
+            if unindexed := self.unindexed_scope_fields(query_resource, backend_query):
+                logger.warning('Policy scope of [%s] filters on non-indexed fields: %s', query_resource._identifier, unindexed)
+
+        return backend_query
+
     @sqla_error_handler('Q1103')
     async def execute_query(
         self,
@@ -54,3 +74,27 @@ class DomainQueryManager(QueryManager):
         async with self.data_manager.transaction():
             data = await self.data_manager.connector_query(resource, backend_query, return_meta=meta)
             return data, meta
+
+    @sqla_error_handler('Q1104')
+    async def execute_aggregate(
+        self,
+        query_resource: QueryResource,
+        backend_query: BackendQuery,
+        /,
+        meta: Optional[Dict] = None,
+    ):
+        resource = query_resource.backend_model()
+        async with self.data_manager.transaction():
+            data = await self.data_manager.connector_aggregate(resource, backend_query)
+
+        if meta is not None:
+            meta.update(groups=len(data), limit=backend_query.limit)
+
+        return data, meta
+
+    async def stream_query(self, query_resource: QueryResource, backend_query: BackendQuery):
+        resource = query_resource.backend_model()
+        async with self.data_manager.transaction():
+            async with aclosing(self.data_manager.connector_stream(resource, backend_query)) as rows:
+                async for row in rows:
+                    yield row
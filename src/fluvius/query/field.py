@@ -17,6 +17,7 @@ def QueryField(
     ftype=None,
     finput=None,
     hidden=False,
+    deferred=False,         # Only fetched when explicitly requested (`fields` / `include`), e.g. wide JSON columns.
     item_type=None,         # Unused, to be removed.
     json_schema_extra=None,
     **kwargs
@@ -36,6 +37,7 @@ def QueryField(
         ftype=ftype,
         finput=finput,
         hidden=hidden,
+        deferred=deferred,
     )
 
     return PydanticField(title=title, json_schema_extra=extra, **kwargs)
@@ -133,6 +133,13 @@ class UUIDFilterPreset(FilterPreset, name="uuid"):
     ne  = Filter("Not Equals", "uuid")
 
 
+class SearchFilterPreset(FilterPreset, name="search"):
+    search = Filter("Search", "string", default=True)      # full-text (websearch syntax)
+    similar = Filter("Similar", "string")                  # trigram similarity (pg_trgm)
+    has = Filter("Contains", "string")
+    eq = Filter("Equals", "string")
+
+
 class StringFilterPreset(FilterPreset, name="string"):
     has = Filter("Contains", "string", default=True)
     eq = Filter("Equals", "string")
@@ -1,9 +1,12 @@
 import re
 import json
 import jsonurl_py
+from functools import lru_cache
 from typing import Optional, List, Dict
 from fluvius.error import BadRequestError
 
+from ._meta import config
+
 SCOPING_SIGN = ':'
 SCOPING_SEP = '='
 PATH_QUERY_SIGN = "~"
@@ -59,12 +62,22 @@ def scope_decoder(scoping_stmt, scope_schema=None):
     return scope_value
 
 
+# Decoded parameters are cached per raw string: the same queries are sent over
+# and over by the front-end. Cached values are shared, treat them as read-only.
+parse_cache = lru_cache(maxsize=config.QUERY_PARSE_CACHE_SIZE)
+
+
 def list_decoder(data: Optional[str]) -> Optional[List[str]]:
     if not data:
         return None
 
+    return list(_decode_list(data))
+
+
+@parse_cache
+def _decode_list(data: str):
     try:
-        return [v.strip() for v in data.split(',') if v.strip()]
+        return tuple(v.strip() for v in data.split(',') if v.strip())
     except Exception as e:
         raise BadRequestError("Q00.503", f"Invalid list value: {data}", str(e))
 
@@ -73,6 +86,11 @@ def json_decoder(data: Optional[str]) -> Optional[Dict]:
     if not data:
         return None
 
+    return _decode_json(data)
+
+
+@parse_cache
+def _decode_json(data: str) -> Dict:
     try:
         result = json.loads(data)
 
@@ -97,6 +115,11 @@ def jurl_decoder(data):
     if not data:
         return None
 
+    return _decode_jurl(data)
+
+
+@parse_cache
+def _decode_jurl(data: str) -> Dict:
     result = jsonurl_py.loads("(" + data + ")")
 
     if not isinstance(result, dict):
@@ -1,17 +1,25 @@
+import hashlib
 import sqlalchemy
 import jsonurl_py
 
+from time import perf_counter
 from types import MethodType
 from typing import Optional, List, Dict, Any
 from fluvius.auth import AuthorizationContext
 from fluvius.data import BackendQuery, DataModel
 from fluvius.helper import camel_to_lower, select_value
+from fluvius.helper.metrics import metrics
 from fluvius.error import InternalServerError, NotFoundError, ForbiddenError, BadRequestError
 from fluvius.casbin import PolicyRequest
 from .resource import QueryResource
 from .model import FrontendQuery
+from .cache import create_query_cache, query_fingerprint
 from ._meta import config, logger
 
+QUERY_DURATION = metrics.histogram(
+    "fluvius_query_duration_seconds", "Query processing time (authorization, execution and result processing)",
+    ("resource", "operation", "outcome"))
+
 
 class QueryManagerMeta(DataModel):
     name: str
@@ -24,6 +32,7 @@ class QueryManager(object):
     __resources__    = None
     __endpoints__    = None
     __data_manager__ = None
+    __result_cache__ = None
 
     class Meta:
         pass
@@ -45,6 +54,14 @@ class QueryManager(object):
             'tags': [cls.__name__,]
         })
 
+    @property
+    def result_cache(self):
+        cache = getattr(self, '_result_cache', None)
+        if cache is None:
+            cache = self._result_cache = self.__result_cache__() if self.__result_cache__ else create_query_cache()
+
+        return cache
+
     @property
     def resource_registry(self):
         return self.__resources__
@@ -86,7 +103,7 @@ class QueryManager(object):
         return _decorator
 
     def validate_fe_query(self, query_resource, fe_query):
-        if fe_query.text and not query_resource.Meta.allow_text_search:
+        if fe_query.text and not (query_resource.Meta.allow_text_search or query_resource.Meta.search_fields):
             raise BadRequestError("Q00.502", f"Text search is not allowed for this resource [{query_resource.Meta.name}]")
 
         if not isinstance(fe_query, FrontendQuery):
@@ -94,29 +111,145 @@ class QueryManager(object):
 
         return fe_query
 
-    async def query_resource(self, auth_ctx: Optional[AuthorizationContext], query_identifier: str, fe_query: FrontendQuery):
+    async def query_resource(
+        self,
+        auth_ctx: Optional[AuthorizationContext],
+        query_identifier: str,
+        fe_query: FrontendQuery,
+        cache_info: Optional[Dict] = None
+    ):
+        """ `cache_info` (optional dict) receives the `etag`, `max_age` and `hit` of cached resources """
         query_resource = self.lookup_query_resource(query_identifier)
+        started, outcome = perf_counter(), "error"
+        try:
+            fe_query = self.validate_fe_query(query_resource, fe_query)
+            pl_scope = await self.authorize_by_policy(auth_ctx, query_resource, fe_query)
+            be_query = self.construct_backend_query(auth_ctx, query_resource, fe_query, policy_scope=pl_scope)
+            data, meta = await self.execute_cached_query(query_resource, be_query, cache_info=cache_info)
+
+            result, outcome = self.process_result(data, meta), "ok"
+            return result
+        finally:
+            QUERY_DURATION.observe((query_resource._identifier, "list", outcome), perf_counter() - started)
+
+    def cache_tags(self, query_resource) -> tuple:
+        """ Invalidation tags (table names) of the resource """
+        return (query_resource.backend_model(), *query_resource.Meta.cache_tags)
+
+    async def execute_cached_query(self, query_resource, backend_query, /, cache_info: Optional[Dict] = None, executor=None):
+        executor = executor or self.execute_query
+        ttl = query_resource.Meta.cache_ttl
+        if not ttl:
+            return await executor(query_resource, backend_query, meta={})
+
+        cache = self.result_cache
+        fingerprint = query_fingerprint(query_resource._identifier, backend_query)
+        key = await cache.cache_key(fingerprint, self.cache_tags(query_resource))
+        cached = await cache.get(key)
+
+        if cache_info is not None:
+            cache_info.update(etag=hashlib.sha1(key.encode('utf-8')).hexdigest(), max_age=ttl, hit=cached is not None)
+
+        if cached is not None:
+            return cached
+
+        data, meta = await executor(query_resource, backend_query, meta={})
+        await cache.set(key, data, meta, ttl)
+        return data, meta
+
+    async def aggregate_resource(
+        self,
+        auth_ctx: Optional[AuthorizationContext],
+        query_identifier: str,
+        fe_query: FrontendQuery,
+        cache_info: Optional[Dict] = None
+    ):
+        """ Grouped aggregates (`fe_query.group_by` / `fe_query.aggregate`) over the rows matching the query,
+            with the same filters and policy scope as `query_resource` """
+        query_resource = self.lookup_query_resource(query_identifier)
+        if not query_resource.Meta.allow_aggregate:
+            raise ForbiddenError('Q00.517', f'Aggregation is not allowed for this resource [{query_resource.Meta.name}]')
+
+        group_by, aggregate = query_resource.process_aggregate(fe_query.group_by, fe_query.aggregate)
+        sort = query_resource.process_sort(*fe_query.sort) if fe_query.sort else ()
+        if unknown := {name for name, _ in sort} - set(group_by) - {label for _, _, label in aggregate}:
+            raise BadRequestError('Q00.518', f'Aggregates can only be sorted on group-by fields or aggregates: {unknown}')
 
         fe_query = self.validate_fe_query(query_resource, fe_query)
         pl_scope = await self.authorize_by_policy(auth_ctx, query_resource, fe_query)
         be_query = self.construct_backend_query(auth_ctx, query_resource, fe_query, policy_scope=pl_scope)
-        data, meta = await self.execute_query(query_resource, be_query, meta={})
+        be_query = be_query.set(
+            group_by=group_by,
+            aggregate=aggregate,
+            sort=sort,
+            include=(),
+            exclude=(),
+            limit=fe_query.limit,
+            offset=0
+        )
 
+        data, meta = await self.execute_cached_query(
+            query_resource, be_query, cache_info=cache_info, executor=self.execute_aggregate
+        )
         return self.process_result(data, meta)
 
-    async def query_item(self, auth_ctx: Optional[AuthorizationContext], query_identifier: str, item_identifier, fe_query: FrontendQuery):
+    async def execute_aggregate(
+        self,
+        query_resource: QueryResource,
+        backend_query: BackendQuery,
+        /,
+        meta: Optional[Dict] = None,
+    ):
+        raise NotImplementedError('QueryResource.execute_aggregate')
+
+    def export_limit(self, query_resource, max_rows: Optional[int] = None) -> Optional[int]:
+        """ Effective row cap of an export: the smallest of the requested, resource and global caps """
+        caps = [c for c in (max_rows, query_resource.Meta.export_max_rows, config.QUERY_EXPORT_MAX_ROWS) if c]
+        return min(caps) if caps else None
+
+    async def export_resource(
+        self,
+        auth_ctx: Optional[AuthorizationContext],
+        query_identifier: str,
+        fe_query: FrontendQuery,
+        max_rows: Optional[int] = None
+    ):
+        """ Iterate over every row matching the query (same filters and policy scope as `query_resource`),
+            without paging nor counting """
         query_resource = self.lookup_query_resource(query_identifier)
+        if not query_resource.Meta.allow_export:
+            raise ForbiddenError('Q00.515', f'Export is not allowed for this resource [{query_resource.Meta.name}]')
+
         fe_query = self.validate_fe_query(query_resource, fe_query)
-        pl_scope = await self.authorize_by_policy(auth_ctx, query_resource, fe_query, item_identifier)
-        be_query = self.construct_backend_query(auth_ctx, query_resource, fe_query, item_identifier, policy_scope=pl_scope)
-        data, meta = await self.execute_query(query_resource, be_query)
+        pl_scope = await self.authorize_by_policy(auth_ctx, query_resource, fe_query)
+        be_query = self.construct_backend_query(auth_ctx, query_resource, fe_query, policy_scope=pl_scope)
+        be_query = be_query.set(limit=self.export_limit(query_resource, max_rows) or 0, offset=0)
+
+        return self.stream_query(query_resource, be_query)
+
+    def stream_query(self, query_resource: QueryResource, backend_query: BackendQuery):
+        """ Async iterator over the rows of the backend query """
+        raise NotImplementedError('QueryResource.stream_query')
+
+    async def query_item(self, auth_ctx: Optional[AuthorizationContext], query_identifier: str, item_identifier, fe_query: FrontendQuery):
+        query_resource = self.lookup_query_resource(query_identifier)
+        started, outcome = perf_counter(), "error"
+        try:
+            fe_query = self.validate_fe_query(query_resource, fe_query)
+            pl_scope = await self.authorize_by_policy(auth_ctx, query_resource, fe_query, item_identifier)
+            be_query = self.construct_backend_query(auth_ctx, query_resource, fe_query, item_identifier, policy_scope=pl_scope)
+            data, meta = await self.execute_query(query_resource, be_query)
 
-        result, _ = self.process_result(data, meta)
+            result, _ = self.process_result(data, meta)
 
-        if len(result) == 0:
-            raise NotFoundError("Q00.501", f"Item not found!", None)
+            if len(result) == 0:
+                outcome = "not_found"
+                raise NotFoundError("Q00.501", f"Item not found!", None)
 
-        return result[0]
+            outcome = "ok"
+            return result[0]
+        finally:
+            QUERY_DURATION.observe((query_resource._identifier, "item", outcome), perf_counter() - started)
 
     async def query_endpoint(self, endpoint_identifier, **kwargs):
         func, _params = self.lookup_query_endpoint(endpoint_identifier)
@@ -140,7 +273,7 @@ class QueryManager(object):
         if not resp.allowed:
             raise ForbiddenError('Q00.004', f'Insufficient permission to query {resp.narration.message}', resp.narration.model_dump())
 
-        return resp.narration.restriction
+        return resp.narration.scope
 
     def construct_backend_query(self,
         auth_ctx: Optional[AuthorizationContext],
@@ -173,6 +306,7 @@ class QueryManager(object):
             where=query,
             alias=query_resource._alias,
             text=fe_query.text,
+            text_fields=query_resource._search_fields,
         )
 
         return self.validate_backend_query(query_resource, backend_query)
@@ -5,7 +5,7 @@ from fluvius.data.query import OperatorStatement
 from fluvius.error import BadRequestError
 from fluvius.constant import DEFAULT_DELETED_FIELD
 
-from typing import Optional, List, Dict, Any, Tuple, Union, Type
+from typing import Optional, List, Dict, Any, Tuple, Union, Type, Literal
 
 from .helper import json_decoder, jurl_decoder, list_decoder, scope_decoder
 
@@ -22,6 +22,7 @@ class QueryParams(DataModel):
     limit: int = Field(description="Page size. Maximum returned items.", default=config.DEFAULT_QUERY_LIMIT)
     page: int = Field(description="Page number.", default=1)
 
+    fields: str | None = Field(description="Sparse fieldset, only these fields are fetched and returned. Comma separated. E.g. `fields=id,name`", default=None)
     include: str | None = Field(description="Fields to be included in the result. Empty to include all fields. Comma separated.", default=None)
     exclude: str | None = Field(description="Fields to be excluded from the result. Comma separated. E.g. `id,name,desc`", default=None)
     sort: str | None = Field(description="Comma separated sort order. E.g. `sort=created.asc,name.desc`", default=None)
@@ -29,6 +30,28 @@ class QueryParams(DataModel):
 
     text: str | None = Field(description="Search query. E.g. `text=Harry`", default=None)
 
+class ExportParams(DataModel):
+    format: Literal["ndjson", "csv"] = Field(description="Export format.", default="ndjson")
+    max_rows: int | None = Field(description="Maximum exported rows.", default=None, gt=0)
+
+    fields: str | None = Field(description="Sparse fieldset, only these fields are fetched and returned. Comma separated. E.g. `fields=id,name`", default=None)
+    include: str | None = Field(description="Fields to be included in the result. Empty to include all fields. Comma separated.", default=None)
+    exclude: str | None = Field(description="Fields to be excluded from the result. Comma separated. E.g. `id,name,desc`", default=None)
+    sort: str | None = Field(description="Comma separated sort order. E.g. `sort=created.asc,name.desc`", default=None)
+    query: str | None = Field(description="Conditional query. URL encoded JSON. E.g. `query={\"name.eq\":\"Harry\"}`", default=None)
+
+    text: str | None = Field(description="Search query. E.g. `text=Harry`", default=None)
+
+class AggregateParams(DataModel):
+    group_by: str | None = Field(description="Comma separated group-by fields. E.g. `group_by=status,org`", default=None)
+    aggregate: str | None = Field(description="Comma separated aggregates: `count` or `<field>.<count|sum|avg|min|max>`. E.g. `aggregate=count,amount.sum`", default="count")
+    limit: int = Field(description="Maximum returned groups.", default=config.QUERY_AGGREGATE_LIMIT, gt=0, le=config.QUERY_AGGREGATE_LIMIT)
+
+    sort: str | None = Field(description="Comma separated sort order on group-by fields or aggregates. E.g. `sort=amount_sum.desc`", default=None)
+    query: str | None = Field(description="Conditional query. URL encoded JSON. E.g. `query={\"name.eq\":\"Harry\"}`", default=None)
+
+    text: str | None = Field(description="Search query. E.g. `text=Harry`", default=None)
+
 class FrontendQuery(DataModel):
     limit: int = config.DEFAULT_QUERY_LIMIT
     page: int = 1
@@ -41,13 +64,19 @@ class FrontendQuery(DataModel):
     scope: Optional[Dict] = None
     text: Optional[str] = None
 
+    group_by: Optional[List[str]] = None
+    aggregate: Optional[List[str]] = None
+
     @classmethod
     def from_query_params(cls, qp: QueryParams, /, path_query=None, scope=None, scope_schema=None):
+        # Export / aggregate params only carry a subset of the query params
         return cls(
-            limit=qp.limit,
-            page=qp.page,
-            include=SELECT_DECODER(qp.include),
-            exclude=SELECT_DECODER(qp.exclude),
+            limit=getattr(qp, 'limit', config.DEFAULT_QUERY_LIMIT),
+            page=getattr(qp, 'page', 1),
+            include=SELECT_DECODER(getattr(qp, 'fields', None) or getattr(qp, 'include', None)),
+            exclude=SELECT_DECODER(getattr(qp, 'exclude', None)),
+            group_by=SELECT_DECODER(getattr(qp, 'group_by', None)),
+            aggregate=SELECT_DECODER(getattr(qp, 'aggregate', None)),
             sort=SORT_DECODER(qp.sort),
             user_query=QUERY_DECODER(qp.query),
             path_query=PATH_DECODER(path_query),
@@ -67,6 +96,7 @@ class QueryResourceMeta(DataModel):  # We need DataModel.create method
     allow_list_view: bool = True
     allow_meta_view: bool = True
     allow_text_search: bool = False
+    search_fields: List = tuple()       # full-text search document for `text` queries, enables text search
     allow_path_query: bool = False
 
     strict_response: bool = False
@@ -83,3 +113,13 @@ class QueryResourceMeta(DataModel):  # We need DataModel.create method
     excluded_fields: List = tuple()
 
     policy_required: bool = False
+
+    cache_ttl: Optional[int] = None     # seconds, enables the result cache
+    cache_tags: List = tuple()          # additional tables the resource depends on (e.g. tables behind a view)
+
+    allow_export: bool = False
+    export_max_rows: Optional[int] = None
+
+    allow_aggregate: bool = False
+    group_by_fields: List = tuple()     # fields allowed in `group_by`
+    aggregate_fields: List = tuple()    # fields allowed in `sum`, `avg`, `min`, `max` and `count`
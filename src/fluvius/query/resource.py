@@ -19,6 +19,7 @@ from .model import QueryResourceMeta
 from . import logger, config
 
 DEVELOPER_MODE = config.DEVELOPER_MODE
+AGGREGATE_FUNCTIONS = ('count', 'sum', 'avg', 'min', 'max')
 
 
 def endpoint(url):
@@ -52,7 +53,7 @@ class QueryResource(BaseModel):
             raise BadRequestError('Q00.701', f'Resource already initialized: {cls._identifier}')
 
         idfield = SimpleNamespace(name=None)
-        include_fields, excluded_fields = [], []
+        include_fields, excluded_fields, deferred_fields = [], [], []
         fieldmap, filters = {}, {}
 
         def process_fields():
@@ -79,6 +80,8 @@ class QueryResource(BaseModel):
                     idfield.name = name
 
                 include_fields.append(name)
+                if field_extra.get('deferred'):
+                    deferred_fields.append(name)
 
                 yield (field_extra['weight'], dict(
                     label=field.title,
@@ -87,6 +90,7 @@ class QueryResource(BaseModel):
                     noop=field_extra['default_filter'],
                     sortable=bool(field_extra.get('sortable', True)),
                     hidden=hidden,
+                    deferred=bool(field_extra.get('deferred')),
                     finput=field_extra.get('finput'),
                     dtype=field_extra.get('dtype') or preset,
                     ftype=field_extra.get('ftype')
@@ -94,6 +98,11 @@ class QueryResource(BaseModel):
 
 
         cls._fields = [f for w, f in sorted(process_fields(), key=lambda f: f[0])]
+
+        if unknown := set(cls.Meta.search_fields) - set(include_fields):
+            raise BadRequestError('Q00.705', f'Unknown search fields for query resource [{cls}]: {unknown}')
+
+        cls._search_fields = tuple(fieldmap.get(f, f) for f in cls.Meta.search_fields)
         cls._field_filters = filters
         cls._fieldmap = fieldmap
         cls._alias = {v: k for k, v in fieldmap.items()}
@@ -106,6 +115,7 @@ class QueryResource(BaseModel):
         cls._identifier = identifier
         cls._idfield = idfield.name
         cls._included_fields = tuple(include_fields)
+        cls._default_fields = tuple(f for f in include_fields if f not in deferred_fields or f == idfield.name)
 
         return cls
 
@@ -119,7 +129,7 @@ class QueryResource(BaseModel):
             if include:
                 include = tuple(set(include) & set(cls._included_fields)) # Restrict to available fields.
             else:
-                include = cls._included_fields
+                include = cls._default_fields  # Deferred fields are only fetched on request
 
         # Ensure that ID is presence.
         if include and cls._idfield not in include:
@@ -130,6 +140,35 @@ class QueryResource(BaseModel):
     
         return mapped_include, mapped_exclude
 
+    @classmethod
+    def process_aggregate(cls, group_by, aggregates) -> (Tuple, Tuple):
+        """ Validate against the `group_by_fields` / `aggregate_fields` whitelists and map to the backend fields.
+            Aggregates are `count` or `<field>.<function>`, labeled `count` and `<field>_<function>` """
+        fmap = cls._fieldmap
+        group_by = tuple(group_by or ())
+        if unknown := set(group_by) - set(cls.Meta.group_by_fields):
+            raise BadRequestError('Q00.706', f'Grouping is not allowed on fields: {unknown}')
+
+        def gen(stmts):
+            for stmt in stmts:
+                field, _, func = stmt.rpartition(QUERY_OPERATOR_SEP)
+                if func not in AGGREGATE_FUNCTIONS:
+                    raise BadRequestError('Q00.707', f'Invalid aggregate function: {stmt}')
+
+                if not field:
+                    if func != 'count':
+                        raise BadRequestError('Q00.707', f'Invalid aggregate function: {stmt}')
+
+                    yield (func, None, func)
+                    continue
+
+                if field not in cls.Meta.aggregate_fields:
+                    raise BadRequestError('Q00.708', f'Aggregation is not allowed on field: {field}')
+
+                yield (func, fmap.get(field, field), f"{field}_{func}")
+
+        return tuple(fmap.get(f, f) for f in group_by), tuple(gen(aggregates or ('count',)))
+
     @classmethod
     def process_query(cls, *statements):
         return process_query_statement(statements, expr_schema=cls._field_filters)
@@ -13,4 +13,8 @@ REDIS_RETRY_ON_TIMEOUT = True
 PENDING_COMMAND_TIMEOUT = 999999
 COLLECT_TRACEBACK = True
 
+# Job metrics snapshots, merged by the API `/metrics` endpoint reading the same directory
+METRICS_MULTIPROC_DIR = None
+METRICS_FLUSH_INTERVAL = 5     # seconds
+
 ERROR_TRACKING_PROVIDER = "NullTracker" # "PosthogTracker" or "SentryTracker"
\ No newline at end of file
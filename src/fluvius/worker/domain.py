@@ -1,5 +1,6 @@
 from fluvius.domain.manager import DomainManager
 from fluvius.domain.context import DomainTransport, DomainServiceProxy
+from fluvius.query.cache import setup_cache_invalidation
 
 from .datadef import DomainWorkerRequest, DomainWorkerCommand
 from .client import WorkerClient
@@ -14,6 +15,7 @@ class DomainWorker(FastAPIFluviusWorker, DomainManager):
     def __init__(self, *args, **kwargs):
         self._register_domain_functions()
         super().__init__(*args, **kwargs)
+        setup_cache_invalidation()
 
     def _register_domain_functions(self):
         self.initialize_domains(self)
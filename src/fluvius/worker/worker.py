@@ -5,7 +5,7 @@ import functools
 import logging.config
 import socket
 
-from time import time
+from time import perf_counter, time
 from asyncio import get_event_loop
 from datetime import datetime, timedelta
 from types import SimpleNamespace
@@ -17,6 +17,7 @@ from arq.worker import func as arq_func
 
 from fluvius.helper import assert_, camel_to_lower, when
 from fluvius.helper.timeutil import timestamp
+from fluvius.helper.metrics import metrics
 from fluvius.data import UUID_GENR
 from fluvius.tracker import config as tracker_config
 from fluvius.domain.context import DomainTransport
@@ -38,6 +39,41 @@ ATTR_CRON = '__cron_params__'
 ATTR_TASK = '__task_params__'
 ATTR_TRACKER = '__track_params__'
 
+JOB_DURATION = metrics.histogram(
+    "fluvius_worker_job_duration_seconds", "Worker job execution time",
+    ("queue", "function", "status"), buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0))
+
+
+_metrics_flushed = 0
+
+
+def flush_metrics(force=False):
+    ''' Write the metrics snapshot of the worker process (at most every `METRICS_FLUSH_INTERVAL`) '''
+    global _metrics_flushed
+
+    now = time()
+    if config.METRICS_MULTIPROC_DIR and (force or now - _metrics_flushed >= config.METRICS_FLUSH_INTERVAL):
+        _metrics_flushed = now
+        metrics.flush(config.METRICS_MULTIPROC_DIR)
+
+
+def timed_job(func, queue_name, name):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started, status = perf_counter(), "error"
+        try:
+            result = await func(*args, **kwargs)
+            status = "success"
+            return result
+        except asyncio.exceptions.CancelledError:
+            status = "canceled"
+            raise
+        finally:
+            JOB_DURATION.observe((queue_name, name, status), perf_counter() - started)
+            flush_metrics()
+
+    return wrapper
+
 
 def export_task(func_or_none=None, **params):
     ''' Export a job function
@@ -211,6 +247,7 @@ class FluviusWorker(object):
             track_params = getattr(func, ATTR_TRACKER, {})
             func = self._tracker.decorate_job(func, **track_params)
 
+        func = timed_job(func, self.__queue_name__, task_params['name'])
         return arq_func(func, **task_params)
 
     def _cron_wrap(self, fspec):
@@ -228,6 +265,7 @@ class FluviusWorker(object):
             track_params = getattr(func, ATTR_TRACKER, {})
             func = self._tracker.decorate_job(func, **track_params)
 
+        func = timed_job(func, self.__queue_name__, cron_params['name'])
         return arq_cron(func, **cron_params)
 
 
@@ -371,6 +409,7 @@ class FluviusWorker(object):
             for _, recv in event.on_shutdown.send(self, ctx=ctx):
                 await when(recv)
 
+            flush_metrics(force=True)
             return results
 
         return on_shutdown
@@ -43,3 +43,38 @@ def test_hashes():
         assert not check_hash(s[:-1] + '.', h)
 
     assert len(token_base32(10)) == 10
+
+
+def test_hashes_scrypt_and_rehash():
+    from fluvius.auth import hashes
+
+    h = hashes.make_hash("P@ssw🔥rd123", algorithm="SCRYPT")
+    assert h.startswith("SCRYPT$")
+    assert hashes.check_hash("P@ssw🔥rd123", h)
+    assert not hashes.check_hash("P@ssw🔥rd124", h)
+
+    assert hashes.needs_rehash(h)
+    assert not hashes.needs_rehash(h, algorithm="SCRYPT")
+
+    valid, new_hash = hashes.verify_and_update("P@ssw🔥rd123", h)
+    assert valid and new_hash.startswith("PBKDF2$")
+    assert hashes.verify_and_update("P@ssw🔥rd123", new_hash) == (True, None)
+    assert hashes.verify_and_update("wrong", new_hash) == (False, None)
+
+    weak = "$".join(["PBKDF2", "sha256", "1000"] + new_hash.split("$")[3:])
+    assert hashes.needs_rehash(weak)
+
+    # Each scrypt parameter is compared, a larger N does not make up for a smaller r
+    weak = f"SCRYPT$32768:1:1${h.split('$', 2)[2]}"
+    assert hashes.needs_rehash(weak, algorithm="SCRYPT")
+
+
+async def test_hashes_async():
+    import asyncio
+    from fluvius.auth import hashes
+
+    hashes.configure_hash_executor(max_workers=2)
+    values = await asyncio.gather(*(hashes.make_hash_async(f"secret-{i}") for i in range(4)))
+    results = await asyncio.gather(*(hashes.check_hash_async(f"secret-{i}", h) for i, h in enumerate(values)))
+    assert all(results)
+    assert await hashes.verify_and_update_async("secret-0", values[0]) == (True, None)
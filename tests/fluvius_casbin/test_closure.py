@@ -0,0 +1,129 @@
+import os
+
+from types import SimpleNamespace
+
+from casbin import Model
+from casbin.persist import load_policy_line
+
+import fluvius.casbin
+from fluvius.casbin import config
+from fluvius.casbin.closure import GroupingClosure
+from fluvius.casbin.enforcer import FluviusEnforcer
+from fluvius.casbin.manager import PolicyManager
+
+
+def _enforcer():
+    model = Model()
+    model.load_model(os.path.join(os.path.dirname(fluvius.casbin.__file__), config.CASBIN_MODEL_PATH))
+    return FluviusEnforcer(model)
+
+
+def test_closure_add_and_delete():
+    closure = GroupingClosure([
+        ['alice', 'editor', 'org-1'],
+        ['editor', 'viewer', 'org-1'],
+        ['viewer', 'guest', 'org-1'],
+    ])
+
+    assert closure.has_link('alice', 'guest', 'org-1')
+    assert closure.has_link('alice', 'alice', 'org-2')
+    assert not closure.has_link('alice', 'guest', 'org-2')
+    assert closure.users('guest', 'org-1') == {'alice', 'editor', 'viewer'}
+
+    closure.delete_link('editor', 'viewer', 'org-1')
+    assert closure.roles('alice', 'org-1') == {'editor'}
+    assert closure.has_link('viewer', 'guest', 'org-1')
+    assert not closure.has_link('alice', 'guest', 'org-1')
+
+    closure.add_link('editor', 'guest', 'org-1')
+    assert closure.has_link('alice', 'guest', 'org-1')
+    assert closure.domains('alice') == {'org-1'}
+
+
+def test_closure_cycle():
+    closure = GroupingClosure([['a', 'b'], ['b', 'c'], ['c', 'a']])
+    assert closure.has_link('a', 'c') and closure.has_link('c', 'b')
+
+    closure.delete_link('c', 'a')
+    assert not closure.has_link('c', 'a')
+    assert closure.has_link('a', 'c')
+
+
+async def test_enforcer_closure_matches_role_manager():
+    enforcer = _enforcer()
+    await enforcer.add_named_grouping_policies('g', [['usr-1', 'pro-1', 'org-1']])
+    await enforcer.add_named_grouping_policies('g2', [['pro-1', 'manager'], ['manager', 'member']])
+    await enforcer.add_named_grouping_policy('g3', 'pro-1', 'owner', 'rid-1')
+    await enforcer.add_named_grouping_policy('g3', 'pro-1', 'owner', 'rid-2')
+    await enforcer.add_policy('member', 'view', 'q', '', 'TENANT')
+
+    for ptype in ('g', 'g2', 'g3'):
+        closure, rm = enforcer.get_closure(ptype), enforcer.get_named_role_manager(ptype)
+        for rule in enforcer.get_named_grouping_policy(ptype):
+            assert closure.has_link(*rule) == rm.has_link(*rule)
+
+    assert enforcer.get_closure('g2').has_link('pro-1', 'member')
+    assert enforcer.get_closure('g3').domains('pro-1') == {'rid-1', 'rid-2'}
+    assert enforcer.enforce_ex('usr-1', 'pro-1', 'org-1', 'rid-1', 'q', 'view')[0]
+
+    await enforcer.remove_named_grouping_policy('g2', 'manager', 'member')
+    assert not enforcer.get_closure('g2').has_link('pro-1', 'member')
+    assert not enforcer.enforce_ex('usr-1', 'pro-1', 'org-1', 'rid-1', 'q', 'view')[0]
+
+    await enforcer.remove_filtered_named_grouping_policy('g3', 2, 'rid-1')
+    assert enforcer.get_closure('g3').domains('pro-1') == {'rid-2'}
+
+
+class MemoryAdapter(object):
+    def __init__(self, lines):
+        self.lines = lines
+
+    def is_filtered(self):
+        return True
+
+    async def load_policy(self, model):
+        for line in self.lines:
+            load_policy_line(line, model)
+
+    async def load_filtered_policy(self, model, filter):
+        await self.load_policy(model)
+
+
+async def test_enforcer_closures_follow_reloads():
+    adapter = MemoryAdapter([
+        'p, member, view, q, , TENANT',
+        'g, usr-1, pro-1, org-1',
+        'g2, pro-1, member',
+    ])
+    enforcer = _enforcer()
+    enforcer.set_adapter(adapter)
+
+    await enforcer.load_policy()
+    assert enforcer.enforce_ex('usr-1', 'pro-1', 'org-1', 'rid-1', 'q', 'view')[0]
+    assert 'g2' in enforcer.closures
+
+    # A reload (not going through `build_role_links`) drops the closures built from the previous policy
+    adapter.lines = adapter.lines[:2]
+    await enforcer.load_policy()
+    assert not enforcer.enforce_ex('usr-1', 'pro-1', 'org-1', 'rid-1', 'q', 'view')[0]
+
+    # Filtered (per request) loads do not build closures for the matcher
+    adapter.lines.append('g2, pro-1, member')
+    await enforcer.load_filtered_policy(None)
+    assert enforcer.enforce_ex('usr-1', 'pro-1', 'org-1', 'rid-1', 'q', 'view')[0]
+    assert enforcer.closures == {}
+
+
+async def test_policy_manager_resources_scan_the_filtered_policy():
+    manager = PolicyManager.__new__(PolicyManager)
+    manager._enforcer = _enforcer()
+    manager._enforcer.set_adapter(MemoryAdapter([
+        'g3, pro-1, owner, rid-1',
+        'g3, pro-1, owner, rid-2',
+        'g3, pro-2, owner, rid-3',
+    ]))
+    await manager._enforcer.load_filtered_policy(None)
+
+    request = SimpleNamespace(auth_ctx=SimpleNamespace(profile=SimpleNamespace(id='pro-1')))
+    assert manager._retrieve_resource(request) == {'rid-1', 'rid-2'}
+    assert manager._enforcer.closures == {}
@@ -0,0 +1,93 @@
+import pytest
+import sqlalchemy as sa
+
+from fluvius.casbin.restriction import (
+    ContextParam,
+    RestrictionContext,
+    compile_policy_meta,
+    restriction_statement,
+    statement_to_dict,
+)
+from fluvius.casbin.datadef import PolicyScope
+from fluvius.data import BackendQuery
+from fluvius.data.query import process_query_statement, statement_fields
+from fluvius.data.data_driver.sqla.query import QueryBuilder
+from fluvius.error import BadRequestError
+
+
+ORG_META = "(restriction:(condition:(TENANT:(ALL:((field:org,op:eq,value:'context(restriction.org)'))))))"
+PROJECT_META = (
+    "(restriction:(condition:(RESOURCE:(ALL:("
+    "(field:org,op:eq,value:'context(restriction.org)'),"
+    "(field:project_id,op:in,value:'context(restriction.resource_ids)'))))))"
+)
+
+
+def _context(calls=None):
+    def _restriction():
+        if calls is not None:
+            calls.append('restriction')
+        return {"org": "org-1", "resource_ids": ["proj-1", "proj-2"]}
+
+    return RestrictionContext(restriction=_restriction, request=lambda: {"act": "view"})
+
+
+def test_compile_is_cached_per_meta():
+    assert compile_policy_meta(ORG_META) is compile_policy_meta(ORG_META)
+    assert compile_policy_meta(ORG_META) is not compile_policy_meta(PROJECT_META)
+
+
+def test_template_params_and_fields():
+    template = compile_policy_meta(PROJECT_META).template(PolicyScope.RESOURCE)
+    assert template.fields == ('org', 'project_id')
+    assert template.params == ('restriction',)
+    assert compile_policy_meta(PROJECT_META).template(PolicyScope.TENANT) is None
+
+
+def test_render_matches_processed_dict():
+    templates = (
+        compile_policy_meta(ORG_META).template(PolicyScope.TENANT),
+        compile_policy_meta(PROJECT_META).template(PolicyScope.RESOURCE),
+    )
+    statement = restriction_statement(*templates, context=_context())
+    restriction = statement_to_dict(statement)
+
+    assert restriction == {'.and': [
+        {'.and': [{'org.eq': 'org-1'}]},
+        {'.and': [{'org.eq': 'org-1'}, {'project_id.in': ['proj-1', 'proj-2']}]},
+    ]}
+    assert statement == process_query_statement(restriction)
+    assert tuple(statement_fields(statement)) == ('org', 'org', 'project_id')
+
+    # Compiled statements are accepted by the backend query as-is.
+    assert BackendQuery.create(scope=statement).scope is statement
+
+
+def test_context_loaded_lazily():
+    calls = []
+    context = _context(calls)
+    template = compile_policy_meta(ORG_META).template(PolicyScope.TENANT)
+    template.render(context)
+    template.render(context)
+    assert calls == ['restriction']
+    assert 'request' not in context
+
+
+def test_invalid_context_and_meta():
+    with pytest.raises(BadRequestError):
+        ContextParam(('restriction', 'missing')).resolve(_context())
+
+    with pytest.raises(BadRequestError):
+        compile_policy_meta("(restriction:")
+
+
+def test_unindexed_fields():
+    metadata = sa.MetaData()
+    table = sa.Table(
+        'project', metadata,
+        sa.Column('_id', sa.String, primary_key=True),
+        sa.Column('org', sa.String, index=True),
+        sa.Column('project_id', sa.String),
+    )
+    schema = type('ProjectSchema', (), {'__table__': table})
+    assert QueryBuilder().unindexed_fields(schema, ('org', 'project_id', 'org', '_id')) == ('project_id',)
@@ -81,3 +81,13 @@ async def test_manager():
         await manager.invalidate_data('user', "1")
         item = await manager.find_one('user', identifier='1', incl_deleted=True)
     assert item._deleted is not None
+
+    # ================ Test Stream =================
+    async with manager.transaction():
+        rows = [row async for row in manager.connector_stream('user', sort=(('_id', 'asc'),), limit=0)]
+    assert [row['_id'] for row in rows] == ["2", "3", "4"]
+
+    # =============== Test Aggregate ===============
+    async with manager.transaction():
+        rows = await manager.connector_aggregate('user', aggregate=(('count', None, 'count'), ('max', 'name', 'name_max')))
+    assert [dict(r) for r in rows] == [{'count': 3, 'name_max': 'user4'}]
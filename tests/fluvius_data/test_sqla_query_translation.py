@@ -315,3 +315,87 @@ def test_build_select_with_field_mapping(test_driver):
         LIMIT 100 OFFSET 0
     '''
     assert_sql_equivalent(test_driver.compile_statement(stmt), expected_sql)
+
+
+# --- Full-text search (PostgreSQL) ---
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable, CreateIndex
+
+
+class ArticleSchema(BaseTestSchema):
+    __tablename__ = 'article'
+    __ts_index__ = ['title', 'body']
+    __ts_vector__ = '_tsv'
+    __trgm_index__ = ['title']
+
+    _id = sa.Column(sa.String, primary_key=True)
+    title = sa.Column(sa.String)
+    body = sa.Column(sa.String)
+
+
+def compile_pg(stmt):
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_search_schema_ddl():
+    ddl = compile_pg(CreateTable(ArticleSchema.__table__))
+    assert (
+        "_tsv TSVECTOR GENERATED ALWAYS AS "
+        "(to_tsvector('english'::regconfig, coalesce(\"title\", '') || ' ' || coalesce(\"body\", ''))) STORED"
+    ) in ddl
+
+    indexes = sorted(compile_pg(CreateIndex(ix)) for ix in ArticleSchema.__table__.indexes)
+    assert indexes == [
+        "CREATE INDEX ix_article_title_trgm ON article USING gin (title gin_trgm_ops)",
+        "CREATE INDEX ix_article_tsv ON article USING gin (_tsv)",
+    ]
+
+
+def test_build_select_text_search(test_driver):
+    query = BackendQuery.create(include=['_id'], text="fast db", sort=(('_rank', 'desc'),))
+    expected_sql = '''
+        SELECT article._id FROM article
+        WHERE article._tsv @@ websearch_to_tsquery('english'::regconfig, 'fast db')
+        ORDER BY ts_rank(article._tsv, websearch_to_tsquery('english'::regconfig, 'fast db')) DESC
+        LIMIT 100
+    '''
+    assert_sql_equivalent(compile_pg(test_driver.build_select(ArticleSchema, query)), expected_sql)
+
+    # Other fields than the generated column are computed on the fly, rank is ignored without text
+    query = BackendQuery.create(include=['_id'], text="db", text_fields=['title'])
+    assert "WHERE to_tsvector('english'::regconfig, coalesce(article.title, '')) @@ websearch_to_tsquery(" \
+        in compile_pg(test_driver.build_select(ArticleSchema, query))
+
+    query = BackendQuery.create(include=['_id'], sort=(('_rank', 'desc'),))
+    assert "ORDER BY" not in compile_pg(test_driver.build_select(ArticleSchema, query))
+
+
+def test_build_select_search_operators(test_driver):
+    query = BackendQuery.create(include=['_id'], where={'title.search': 'db', 'body!similar': 'fast'})
+    expected_sql = '''
+        SELECT article._id FROM article
+        WHERE (to_tsvector('english'::regconfig, coalesce(article.title, '')) @@ websearch_to_tsquery('english'::regconfig, 'db'))
+        AND NOT (article.body %% 'fast')
+        LIMIT 100
+    '''
+    assert_sql_equivalent(compile_pg(test_driver.build_select(ArticleSchema, query)), expected_sql)
+
+
+def test_build_aggregate(test_driver):
+    query = BackendQuery.create(
+        where={"is_active": True},
+        group_by=['name'],
+        aggregate=[('count', None, 'count'), ('sum', 'age', 'age_sum')],
+        alias={'name': 'user_name'},
+        sort=(('age_sum', 'desc'),),
+    )
+    stmt = test_driver.build_aggregate(UserSchema, query)
+    expected_sql = '''
+        SELECT user.name AS user_name, count(*) AS count, sum(user.age) AS age_sum
+        FROM user
+        WHERE user.is_active = 1
+        GROUP BY user.name
+        ORDER BY sum(user.age) DESC
+        LIMIT 100 OFFSET 0
+    '''
+    assert_sql_equivalent(test_driver.compile_statement(stmt), expected_sql)
@@ -0,0 +1,53 @@
+import asyncio
+
+from contextlib import asynccontextmanager
+
+from fluvius.domain.tracing import (
+    RecordingTracer, configure_tracing, reset_stage_histograms, span, stage_histograms,
+    stage_timings, timed_exit, timed_iter,
+)
+
+
+async def test_stage_timings_and_histograms():
+    tracer = configure_tracing(backend='memory')
+    reset_stage_histograms()
+    assert isinstance(tracer, RecordingTracer)
+
+    @asynccontextmanager
+    async def transaction():
+        yield "stm"
+        await asyncio.sleep(0.01)   # commit
+
+    async def handler():
+        for i in range(3):
+            await asyncio.sleep(0.005)
+            yield i
+
+    with stage_timings() as timings:
+        with span("policy", command="create-object"):
+            await asyncio.sleep(0)
+
+        async with timed_exit(transaction(), "state_commit") as stm:
+            assert stm == "stm"
+            async for _ in timed_iter("handler", handler()):
+                await asyncio.sleep(0.01)   # consumer time is not accounted to the handler
+
+    totals = timings.totals()
+    assert list(totals) == ["policy", "handler", "state_commit"]
+    assert 0.015 <= totals["handler"] < 0.03
+    assert totals["state_commit"] >= 0.01
+
+    header = timings.server_timing()
+    assert header.startswith("policy;dur=") and ", handler;dur=" in header
+
+    assert ("fluvius.policy", tracer.spans[0][1], {"command": "create-object"}) == tracer.spans[0]
+    assert stage_histograms()["handler"]["count"] == 1
+
+    # Outside of a request only the histograms are updated
+    with span("policy"):
+        pass
+
+    assert stage_histograms()["policy"]["count"] == 2
+    assert sum(stage_histograms()["policy"]["buckets"].values()) == 2
+
+    configure_tracing(backend=None)
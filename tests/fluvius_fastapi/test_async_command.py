@@ -0,0 +1,128 @@
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fluvius.data import DataModel, SqlaDriver, UUID_GENR, UUID_TYPE
+from fluvius.data.exceptions import ItemNotFoundError
+from fluvius.domain import Domain
+from fluvius.domain.aggregate import Aggregate
+from fluvius.domain.state import DataAccessManager
+from fluvius.fastapi import config
+from fluvius.fastapi.domain import FastAPIDomainManager
+from fluvius.fastapi.setup import setup_error_handler
+from fluvius.worker import DomainWorkerClient, JobStatus
+
+
+class AsyncConnector(SqlaDriver):
+    __db_dsn__ = "sqlite+aiosqlite:////tmp/fluvius_async_command_test.sqlite"
+
+
+class AsyncStateManager(DataAccessManager):
+    __connector__ = AsyncConnector
+    __automodel__ = True
+
+
+class AsyncDomain(Domain):
+    __namespace__ = 'async-test'
+    __aggregate__ = Aggregate
+    __statemgr__ = AsyncStateManager
+
+
+class SendReportCmd(AsyncDomain.Command):
+    class Meta:
+        key = 'send-report'
+        resource_init = True
+        auth_required = False
+
+    class Data(DataModel):
+        recipient: str
+
+
+class RecordingWorkerClient(DomainWorkerClient):
+    __queue_name__ = 'async-test-queue'
+    enqueued = []
+
+    async def enqueue_job(self, job_name, *args, **options):
+        job_id = UUID_GENR().hex
+        self.enqueued.append((job_name, args, options, job_id))
+        return SimpleNamespace(job_id=job_id)
+
+
+class MemoryJobTracker(object):
+    jobs = {}
+
+    async def fetch_entry(self, table, job_id):
+        if job_id not in self.jobs:
+            raise ItemNotFoundError('T00.404', f'Job not found: {job_id}')
+
+        return self.jobs[job_id]
+
+
+class AsyncDomainManager(FastAPIDomainManager):
+    __worker_client__ = RecordingWorkerClient
+    __job_tracker__ = MemoryJobTracker()
+
+
+def test_async_command_submission(monkeypatch):
+    monkeypatch.setattr(config, 'COMMAND_JOB_AUTH_REQUIRED', False)
+    app = setup_error_handler(FastAPI())
+    AsyncDomainManager.setup_app(app, AsyncDomain)
+
+    @app.middleware("http")
+    async def authenticate(http_request, call_next):
+        user_id = http_request.headers.get("x-user")
+        if user_id:
+            http_request.state.auth_context = SimpleNamespace(user=SimpleNamespace(_id=UUID_TYPE(user_id)))
+        return await call_next(http_request)
+
+    client = TestClient(app)
+
+    response = client.post(
+        "/async-test:send-report/report/:new?async=true",
+        json={"recipient": "ops"},
+        headers={"Authorization": "Bearer secret", "X-Trace": "abc"}
+    )
+    assert response.status_code == 202
+    job_id = response.json()["data"]["job_id"]
+    assert response.headers["location"] == f"/_job/{job_id}"
+
+    job_name, (request,), options, _ = RecordingWorkerClient.enqueued[-1]
+    assert job_name == "async-test:send-report"
+    assert options["_queue_name"] == "async-test-queue"
+    assert request.command.resource == "report" and request.command.payload == {"recipient": "ops"}
+    assert request.context.domain == "async-test"
+    assert "authorization" not in request.headers and request.headers["x-trace"] == "abc"
+
+    # Invalid payloads are rejected before anything is enqueued
+    response = client.post("/async-test:send-report/report/:new?async=true", json={})
+    assert response.status_code >= 400 and len(RecordingWorkerClient.enqueued) == 1
+
+    assert client.get(f"/_job/{job_id}").status_code == 404
+
+    MemoryJobTracker.jobs[UUID_TYPE(job_id)] = SimpleNamespace(
+        _id=job_id, function=job_name, job_status=JobStatus.RECEIVED, job_progress=0.5, job_message="halfway",
+        result=None, err_message="", enqueue_time=None, start_time=None, finish_time=None,
+        args=[request.model_dump(mode="json")],
+    )
+    data = client.get(f"/_job/{job_id}").json()["data"]
+    assert (data["status"], data["label"], data["progress"]) == ("RECEIVED", "In Progress", 0.5)
+    assert data["error"] is None
+
+    # Jobs are only visible to their submitter
+    owner, other = UUID_GENR(), UUID_GENR()
+    MemoryJobTracker.jobs[UUID_TYPE(job_id)].args[0]["context"]["audit"]["user_id"] = str(owner)
+
+    assert client.get(f"/_job/{job_id}", headers={"X-User": str(owner)}).status_code == 200
+    assert client.get(f"/_job/{job_id}", headers={"X-User": str(other)}).json()["errcode"] == "S00.307"
+    assert client.get(f"/_job/{job_id}").status_code == 404
+
+
+def test_async_command_not_enabled():
+    app = setup_error_handler(FastAPI())
+    FastAPIDomainManager.setup_app(app, AsyncDomain)
+    client = TestClient(app)
+
+    response = client.post("/async-test:send-report/report/:new?async=true", json={"recipient": "ops"})
+    assert response.status_code == 400 and response.json()["errcode"] == "S00.306"
+    assert all(not route.path.startswith("/_job") for route in app.routes)
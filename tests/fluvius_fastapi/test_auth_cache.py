@@ -0,0 +1,108 @@
+import json
+import time
+
+from types import SimpleNamespace
+
+from fastapi import FastAPI, Request
+
+from fluvius.fastapi.auth import FluviusAuthProfileProvider
+from fluvius.fastapi.auth_cache import AuthContextCache, token_fingerprint
+from fluvius.fastapi.auth_mock import FluviusMockProfileProvider
+
+
+def _token(**kwargs):
+    return dict(FluviusMockProfileProvider.TEMPLATE, exp=int(time.time()) + 600, **kwargs)
+
+
+def _request(app, token):
+    header = f"MockAuth {json.dumps(token)}".encode()
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"authorization", header)],
+        "app": app,
+    })
+
+
+class CountingProvider(FluviusMockProfileProvider):
+    calls = 0
+
+    async def setup_context(self, auth_user):
+        CountingProvider.calls += 1
+        return await super().setup_context(auth_user)
+
+
+async def test_auth_context_cached_per_token():
+    app = FastAPI()
+    app.state.auth_context_cache = AuthContextCache(maxsize=16, ttl=60)
+    provider = CountingProvider(app)
+
+    request = _request(app, _token())
+    first = await provider.get_auth_context(request)
+    assert set(request.state.auth_timing) == {'cache', 'decode', 'lookup'}
+
+    request = _request(app, _token())
+    assert await provider.get_auth_context(request) is first
+    assert set(request.state.auth_timing) == {'cache'}
+    assert CountingProvider.calls == 1
+
+    # A different token is a different entry
+    await provider.get_auth_context(_request(app, _token(name="Jane Doe")))
+    assert CountingProvider.calls == 2
+
+    # Logout / profile switch
+    await provider.invalidate_auth_context(_request(app, _token()))
+    await provider.get_auth_context(_request(app, _token()))
+    assert CountingProvider.calls == 3
+
+
+async def test_auth_context_expiry_and_rotation():
+    app = FastAPI()
+    cache = AuthContextCache(maxsize=16, ttl=60)
+    provider = FluviusMockProfileProvider(app)
+    context = await provider.setup_context(provider.authorize_claims(_token()))
+
+    await cache.set('expired', context, int(time.time()) - 1)
+    assert await cache.get('expired') is None
+
+    await cache.set('valid', context, int(time.time()) + 60)
+    assert await cache.get('valid') is context
+    assert type(context).model_validate_json(context.model_dump_json()) == context
+
+    cache.rotate(SimpleNamespace(keys=[SimpleNamespace(kid='key-1')]))
+    assert await cache.get('valid') is None
+    assert token_fingerprint('a') != token_fingerprint('b')
+
+
+def _cookie_request(app, session):
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"cookie", b"id_token=leaked-id-token")],
+        "app": app,
+    }
+    if session is not None:
+        scope["session"] = session
+
+    return Request(scope)
+
+
+async def test_cookie_requests_keyed_on_session():
+    app = FastAPI()
+    app.state.auth_context_cache = AuthContextCache(maxsize=16, ttl=60)
+    provider = FluviusAuthProfileProvider(app)
+
+    victim = _cookie_request(app, {"user": _token(session_id="session-1")})
+    context = await provider.get_auth_context(victim)
+    assert await app.state.auth_context_cache.get(provider.get_token_fingerprint(victim)) is context
+
+    # The id token cookie without the signed session is not a credential
+    assert provider.get_token_fingerprint(_cookie_request(app, {})) is None
+    assert await provider.get_auth_context(_cookie_request(app, {})) is None
+    assert provider.get_token_fingerprint(_cookie_request(app, {"user": _token(session_id="session-2")})) \
+        != provider.get_token_fingerprint(victim)
+
+    # Only bearer tokens are keyed on the Authorization header
+    assert provider.get_token_fingerprint(_request(app, _token())) is None
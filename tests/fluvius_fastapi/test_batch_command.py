@@ -0,0 +1,118 @@
+import sqlalchemy as sa
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fluvius.data import DataModel, SqlaDriver, serialize_mapping
+from fluvius.domain import Domain
+from fluvius.domain.aggregate import Aggregate, action
+from fluvius.domain.state import DataAccessManager
+from fluvius.fastapi.domain import FastAPIDomainManager
+from fluvius.fastapi.setup import setup_error_handler
+from fluvius.error import BadRequestError
+
+
+class BatchConnector(SqlaDriver):
+    __db_dsn__ = "sqlite+aiosqlite:////tmp/fluvius_batch_command_test.sqlite"
+
+
+class Counter(BatchConnector.__data_schema_base__):
+    __tablename__ = "counter"
+
+    _id = sa.Column(sa.String, primary_key=True)
+    _created = sa.Column(sa.DateTime(timezone=True))
+    _updated = sa.Column(sa.DateTime(timezone=True))
+    _deleted = sa.Column(sa.DateTime(timezone=True))
+    _etag = sa.Column(sa.String)
+    _creator = sa.Column(sa.String)
+    _updater = sa.Column(sa.String)
+    _realm = sa.Column(sa.String)
+
+    name = sa.Column(sa.String)
+
+
+class BatchStateManager(DataAccessManager):
+    __connector__ = BatchConnector
+    __automodel__ = True
+
+
+class CounterAggregate(Aggregate):
+    @action("counter-created", resources="counter")
+    async def create_counter(self, data):
+        record = self.init_resource("counter", **serialize_mapping(data), _id=str(self.aggroot.identifier))
+        await self.statemgr.insert(record)
+        return {"_id": record._id}
+
+
+class BatchDomain(Domain):
+    __namespace__ = 'batch-test'
+    __aggregate__ = CounterAggregate
+    __statemgr__ = BatchStateManager
+
+
+class CounterResponse(BatchDomain.Response):
+    pass
+
+
+class CreateCounterCmd(BatchDomain.Command):
+    class Meta:
+        key = 'create-counter'
+        resource_init = True
+        auth_required = False
+
+    class Data(DataModel):
+        name: str
+
+    async def _process(self, aggregate, statemgr, payload):
+        if payload.name == "invalid":
+            raise BadRequestError("T00.001", "Invalid counter name")
+
+        counter = await aggregate.create_counter(payload)
+        yield aggregate.create_response(counter, _type="counter-response")
+
+
+async def _counter_names(app):
+    statemgr = app.state.domain_manager._domains[0].statemgr
+    async with statemgr.transaction():
+        return sorted(c.name for c in await statemgr.query('counter'))
+
+
+async def test_batch_command_endpoint():
+    app = setup_error_handler(FastAPI())
+    FastAPIDomainManager.setup_app(app, BatchDomain)
+    statemgr = app.state.domain_manager._domains[0].statemgr
+
+    async with statemgr.connect() as conn:
+        await conn.run_sync(BatchConnector.__data_schema_base__.metadata.drop_all)
+        await conn.run_sync(BatchConnector.__data_schema_base__.metadata.create_all)
+
+    client = TestClient(app)
+    item = lambda name, **kw: dict(command="create-counter", resource="counter", payload={"name": name}, **kw)
+
+    # Independent: failures are reported per item, the other commands are committed
+    response = client.post("/_batch/batch-test", json={"atomic": False, "commands": [
+        item("a"), item("invalid"), item("b"), {"command": "unknown", "resource": "counter"}, item("c", scope={"x": 1})
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["status"] == "PARTIAL" and "Server-Timing" in response.headers
+    assert [r["status"] for r in body["data"]] == ["OK", "ERROR", "OK", "ERROR", "ERROR"]
+    assert body["data"][0]["data"]["counter-response"]["_id"]
+    assert body["data"][1]["error"]["errcode"] == "T00.001"
+    assert body["data"][3]["error"]["errcode"] == "S00.302"
+    assert await _counter_names(app) == ["a", "b"]
+
+    # Atomic: all-or-nothing
+    response = client.post("/_batch/batch-test", json={"commands": [item("d"), item("invalid")]})
+    assert response.status_code == 400
+    assert await _counter_names(app) == ["a", "b"]
+
+    response = client.post("/_batch/batch-test", json={"commands": [item("d"), item("e")]})
+    assert response.json()["status"] == "OK" and len(response.json()["data"]) == 2
+    assert await _counter_names(app) == ["a", "b", "d", "e"]
+
+    # Single command endpoint reports the pipeline stages
+    response = client.post("/batch-test:create-counter/counter/:new", json={"name": "f"})
+    assert response.status_code == 200
+    stages = [t.split(";")[0] for t in response.headers["Server-Timing"].split(", ")]
+    assert {"root_fetch", "handler", "state_commit", "serialize", "command"} <= set(stages)
@@ -0,0 +1,162 @@
+import sqlalchemy as sa
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+
+from fluvius.data import DataModel, SqlaDriver, serialize_mapping
+from fluvius.domain import Domain
+from fluvius.domain.aggregate import Aggregate, action
+from fluvius.domain.state import DataAccessManager
+from fluvius.fastapi.domain import FastAPIDomainManager, command_schema
+from fluvius.fastapi.openapi import openapi_fingerprint, setup_openapi_cache
+from fluvius.fastapi.setup import setup_error_handler
+
+
+class DispatchConnector(SqlaDriver):
+    __db_dsn__ = "sqlite+aiosqlite:////tmp/fluvius_command_dispatch_test.sqlite"
+
+
+class Note(DispatchConnector.__data_schema_base__):
+    __tablename__ = "note"
+
+    _id = sa.Column(sa.Uuid, primary_key=True)
+    _created = sa.Column(sa.DateTime(timezone=True))
+    _updated = sa.Column(sa.DateTime(timezone=True))
+    _deleted = sa.Column(sa.DateTime(timezone=True))
+    _etag = sa.Column(sa.String)
+    _creator = sa.Column(sa.String)
+    _updater = sa.Column(sa.String)
+    _realm = sa.Column(sa.String)
+
+    text = sa.Column(sa.String)
+
+
+class DispatchStateManager(DataAccessManager):
+    __connector__ = DispatchConnector
+    __automodel__ = True
+
+
+class NoteAggregate(Aggregate):
+    @action("note-created", resources="note")
+    async def create_note(self, data):
+        record = self.init_resource("note", **serialize_mapping(data), _id=self.aggroot.identifier)
+        await self.statemgr.insert(record)
+        return {"_id": record._id}
+
+    @action("note-updated", resources="note")
+    async def update_note(self, data):
+        await self.statemgr.update(self.rootobj, **serialize_mapping(data))
+
+
+class DispatchDomain(Domain):
+    __namespace__ = 'dispatch-test'
+    __aggregate__ = NoteAggregate
+    __statemgr__ = DispatchStateManager
+
+
+class NoteResponse(DispatchDomain.Response):
+    pass
+
+
+class CreateNoteCmd(DispatchDomain.Command):
+    class Meta:
+        key = 'create-note'
+        resource_init = True
+        auth_required = False
+
+    class Data(DataModel):
+        text: str
+
+    async def _process(self, aggregate, statemgr, payload):
+        note = await aggregate.create_note(payload)
+        yield aggregate.create_response(note, _type="note-response")
+
+
+class UpdateNoteCmd(DispatchDomain.Command):
+    class Meta:
+        key = 'update-note'
+        auth_required = False
+
+    class Data(DataModel):
+        text: str
+
+    async def _process(self, aggregate, statemgr, payload):
+        await aggregate.update_note(payload)
+
+
+class DispatchDomainManager(FastAPIDomainManager):
+    __endpoint_mode__ = "dispatch"
+
+
+def api_routes(app):
+    return [route for route in app.routes if isinstance(route, APIRoute)]
+
+
+async def test_dispatch_mode():
+    app = setup_error_handler(FastAPI())
+    DispatchDomainManager.setup_app(app, DispatchDomain)
+    statemgr = app.state.domain_manager._domains[0].statemgr
+
+    async with statemgr.connect() as conn:
+        await conn.run_sync(DispatchConnector.__data_schema_base__.metadata.drop_all)
+        await conn.run_sync(DispatchConnector.__data_schema_base__.metadata.create_all)
+
+    # The routes do not depend on the number of commands
+    routed = FastAPIDomainManager.setup_app(setup_error_handler(FastAPI()), DispatchDomain)
+    assert len(api_routes(app)) < len(api_routes(routed))
+
+    client = TestClient(app)
+    response = client.post("/dispatch-test:create-note/note/:new", json={"text": "hello"})
+    assert response.status_code == 200 and "Server-Timing" in response.headers
+    note_id = response.json()["data"]["note-response"]["_id"]
+
+    response = client.post(f"/dispatch-test:update-note/note/{note_id}", json={"text": "updated"})
+    assert response.status_code == 200
+
+    async with statemgr.transaction():
+        assert [n.text for n in await statemgr.query('note')] == ["updated"]
+
+    # Same URLs as the per command routes only
+    assert client.post("/dispatch-test:unknown/note/:new", json={}).json()["errcode"] == "S00.312"
+    assert client.post(f"/dispatch-test:create-note/note/{note_id}", json={"text": "x"}).status_code == 404
+    assert client.post("/dispatch-test:update-note/note/:new", json={"text": "x"}).status_code == 404
+    assert client.post("/dispatch-test:update-note/note/not-a-uuid", json={"text": "x"}).json()["errcode"] == "S00.313"
+    assert client.post(f"/dispatch-test:update-note/domain_sid~abc/note/{note_id}", json={"text": "x"}).json()["errcode"] == "S00.303"
+    assert client.post("/dispatch-test:create-note/note/:new", json={}).status_code == 422
+
+    # Metadata and schemas are generated on first request
+    command_schema.cache_clear()
+    metadata = client.get("/_meta/dispatch-test:create-note/").json()
+    assert metadata["urls"]["path"] == "/dispatch-test:create-note/{resource}/:new"
+    assert metadata["schema"]["required"] == ["text"]
+    assert command_schema.cache_info().misses == 1
+
+    domain_metadata = client.get("/_meta/dispatch-test/").json()
+    assert set(domain_metadata["commands"]) == {"create-note", "update-note"}
+    assert command_schema.cache_info().hits == 1
+
+
+def test_openapi_cache(tmp_path, monkeypatch):
+    cache_path = tmp_path / "openapi.json"
+
+    def create_app():
+        app = setup_openapi_cache(setup_error_handler(FastAPI(title="Dispatch")), path=str(cache_path))
+        FastAPIDomainManager.setup_app(app, DispatchDomain)
+        return app
+
+    app = create_app()
+    schema = TestClient(app).get("/openapi.json").json()
+    assert "/dispatch-test:create-note/{resource}/:new" in schema["paths"] and cache_path.exists()
+
+    # A new process with the same routes does not generate the document
+    def get_openapi(*args, **kwargs):
+        raise AssertionError("OpenAPI document generated")
+
+    monkeypatch.setattr("fastapi.applications.get_openapi", get_openapi)
+    assert TestClient(create_app()).get("/openapi.json").json() == schema
+
+    # Any change to the routes does
+    changed = create_app()
+    changed.get("/extra")(lambda: {})
+    assert openapi_fingerprint(changed) != openapi_fingerprint(app)
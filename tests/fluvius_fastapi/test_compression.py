@@ -0,0 +1,127 @@
+import gzip
+import zlib
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from fluvius.fastapi.compression import CompressionMiddleware, select_encoding, setup_compression
+from fluvius.fastapi.conditional import conditional_response, etag_matches
+from fluvius.fastapi.response import FastJSONResponse
+
+
+ITEMS = [{"id": i, "name": f"Item {i}"} for i in range(200)]
+
+
+def create_test_app():
+    app = setup_compression(FastAPI(), compression=True, etag=True)
+    app.state.serialised = 0
+
+    class CountingResponse(FastJSONResponse):
+        def render(self, content):
+            app.state.serialised += 1
+            return super().render(content)
+
+    @app.api_route("/items", methods=["GET", "HEAD"])
+    async def items():
+        return FastJSONResponse(ITEMS)
+
+    @app.get("/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for item in ITEMS:
+                yield f"{item['id']},{item['name']}\n"
+
+        return StreamingResponse(lines(), media_type="text/csv")
+
+    @app.api_route("/versioned", methods=["GET", "HEAD"])
+    async def versioned(request: Request):
+        return conditional_response(request, ITEMS, "v1", CountingResponse)
+
+    return app
+
+
+def test_select_encoding():
+    assert select_encoding("gzip, deflate, br", ("zstd", "gzip")) == "gzip"
+    assert select_encoding("zstd;q=0.9, gzip;q=0.5", ("zstd", "gzip")) == "zstd"
+    assert select_encoding("gzip;q=0", ("gzip",)) is None
+    assert select_encoding("*", ("gzip",)) == "gzip"
+    assert select_encoding(None, ("gzip",)) is None
+
+
+def test_response_compression():
+    client = TestClient(create_test_app())
+
+    response = client.get("/items", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json() == ITEMS
+
+    # Below the threshold / not accepted
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/items", headers={"Accept-Encoding": "identity"}).headers
+
+    # Streamed responses are compressed chunk by chunk
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip" and "content-length" not in response.headers
+    assert response.text.splitlines()[-1] == "199,Item 199"
+
+
+async def test_streamed_chunks_are_flushed():
+    chunks = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        for i in range(3):
+            await send({"type": "http.response.body", "body": b"x" * 100, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            chunks.append(message["body"])
+
+    scope = {"type": "http", "method": "GET", "headers": [(b"accept-encoding", b"gzip")]}
+    await CompressionMiddleware(app)(scope, None, send)
+
+    # Every chunk can be decoded as soon as it is received
+    decoder = zlib.decompressobj(31)
+    assert decoder.decompress(chunks[0]) == b"x" * 100
+    assert gzip.decompress(b"".join(chunks)) == b"x" * 300
+
+
+def test_conditional_get():
+    app = create_test_app()
+    client = TestClient(app)
+
+    response = client.get("/items")
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+
+    response = client.get("/items", headers={"If-None-Match": etag, "Accept-Encoding": "gzip"})
+    assert response.status_code == 304 and response.content == b""
+    assert response.headers["etag"] == etag and "content-encoding" not in response.headers
+
+    # Versioned results are not serialised when the client is up to date
+    response = client.get("/versioned", headers={"If-None-Match": 'W/"v1"'})
+    assert response.status_code == 304 and app.state.serialised == 0
+    assert client.get("/versioned", headers={"If-None-Match": 'W/"v0"'}).status_code == 200
+    assert app.state.serialised == 1
+
+    # HEAD responses are not hashed, endpoint ETags are kept
+    assert "etag" not in client.head("/items").headers
+    assert client.head("/versioned", headers={"If-None-Match": 'W/"v1"'}).status_code == 304
+
+    # Streamed responses are not hashed
+    assert "etag" not in client.get("/stream").headers
+
+
+def test_etag_matches():
+    assert etag_matches('"abc"', 'W/"abc"')
+    assert etag_matches('W/"x", W/"abc"', 'W/"abc"')
+    assert etag_matches('*', 'W/"abc"')
+    assert not etag_matches('W/"x"', 'W/"abc"')
+    assert not etag_matches(None, 'W/"abc"')
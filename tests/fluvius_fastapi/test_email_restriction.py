@@ -0,0 +1,40 @@
+from fluvius.fastapi import restriction
+from fluvius.fastapi.restriction import DomainMatcher, is_restricted_domain, load_domain_list
+
+
+def test_domain_matcher_subdomains():
+    matcher = DomainMatcher(["yopmail.com", "mail.example.org", "example.org"])
+    assert len(matcher) == 3
+    assert matcher.match("yopmail.com")
+    assert matcher.match("a.b.YOPMAIL.com")
+    assert "example.org" in matcher
+    assert not matcher.match("notyopmail.com")
+    assert not matcher.match("com")
+
+
+def test_email_domain_restriction(tmp_path):
+    domains = load_domain_list(restriction.config.EMAIL_DOMAIN_RESTRICTION_PATH)
+    assert "yopmail.com" in domains and "tempemail.net" in domains
+    assert restriction.EMAIL_DOMAIN_RESTRICTION == frozenset(domains)
+
+    assert is_restricted_domain("yopmail.com")
+    assert is_restricted_domain("TempEMail.net")
+    assert not is_restricted_domain("adaptive-bits.com")
+    assert is_restricted_domain("id.adaptive-bits.com", ["adaptive-bits.com"], None)
+    assert not is_restricted_domain("adaptive-bits.com", ["bits.com"])
+
+    custom = tmp_path / "custom.txt"
+    custom.write_text("# operator list\ncorp.internal\n")
+    assert load_domain_list(str(custom)) == ("corp.internal",)
+
+
+def test_blacklist_compiled_once(monkeypatch):
+    monkeypatch.setattr(restriction.config, "BLACKLIST_DOMAIN", ["corp.example"], raising=False)
+    restriction.blacklist_domain_restriction.cache_clear()
+    try:
+        matcher = restriction.blacklist_domain_restriction()
+        assert restriction.blacklist_domain_restriction() is matcher
+        assert is_restricted_domain("mail.corp.example", matcher)
+        assert not is_restricted_domain("example", matcher)
+    finally:
+        restriction.blacklist_domain_restriction.cache_clear()
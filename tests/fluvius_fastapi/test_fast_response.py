@@ -0,0 +1,56 @@
+import enum
+import json
+
+from datetime import datetime, timezone
+from decimal import Decimal
+from uuid import UUID
+
+from sqlalchemy import create_engine, text
+
+from fluvius.data import DataModel
+from fluvius.fastapi.response import FastJSONResponse
+
+
+class Color(enum.Enum):
+    RED = "red"
+
+
+class Item(DataModel):
+    name: str
+    color: Color
+
+
+def test_fast_json_response_rows():
+    engine = create_engine("sqlite://")
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT 1 AS id, 'a' AS name UNION ALL SELECT 2, 'b'")).mappings().all()
+
+    uid = UUID("5c6a9d55-6b5b-4c36-9d7b-6a2a3f0c5f11")
+    response = FastJSONResponse({
+        "data": rows,
+        "pagination": {"total": 2},
+        "extra": {
+            "uid": uid,
+            "at": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+            "price": Decimal("1.50"),
+            "count": Decimal("3"),
+            "color": Color.RED,
+            "tags": {"x"},
+            "item": Item(name="n", color=Color.RED),
+        }
+    })
+
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == {
+        "data": [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}],
+        "pagination": {"total": 2},
+        "extra": {
+            "uid": str(uid),
+            "at": "2024-01-02T03:04:05+00:00",
+            "price": 1.5,
+            "count": 3,
+            "color": "red",
+            "tags": ["x"],
+            "item": {"name": "n", "color": "red"},
+        }
+    }
@@ -0,0 +1,190 @@
+import asyncio
+
+from types import SimpleNamespace
+
+import pytest
+import sqlalchemy as sa
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fluvius.data import DataModel, SqlaDriver
+from fluvius.domain import Domain
+from fluvius.domain.aggregate import Aggregate, action
+from fluvius.domain.state import DataAccessManager
+from fluvius.error import LockedError, UnprocessableError
+from fluvius.fastapi.domain import FastAPIDomainManager
+from fluvius.fastapi.idempotency import IdempotencyStore
+from fluvius.fastapi.response import FastJSONResponse
+from fluvius.fastapi.setup import setup_error_handler
+
+
+class IdemConnector(SqlaDriver):
+    __db_dsn__ = "sqlite+aiosqlite:////tmp/fluvius_idempotency_test.sqlite"
+
+
+class Note(IdemConnector.__data_schema_base__):
+    __tablename__ = "note"
+
+    _id = sa.Column(sa.String, primary_key=True)
+    _created = sa.Column(sa.DateTime(timezone=True))
+    _updated = sa.Column(sa.DateTime(timezone=True))
+    _deleted = sa.Column(sa.DateTime(timezone=True))
+    _etag = sa.Column(sa.String)
+    _creator = sa.Column(sa.String)
+    _updater = sa.Column(sa.String)
+    _realm = sa.Column(sa.String)
+
+    text = sa.Column(sa.String)
+
+
+class IdemStateManager(DataAccessManager):
+    __connector__ = IdemConnector
+    __automodel__ = True
+
+
+class NoteAggregate(Aggregate):
+    @action("note-created", resources="note")
+    async def create_note(self, data):
+        record = self.init_resource("note", text=data.text, _id=str(self.aggroot.identifier))
+        await self.statemgr.insert(record)
+        return {"_id": record._id}
+
+
+class IdemDomain(Domain):
+    __namespace__ = 'idem-test'
+    __aggregate__ = NoteAggregate
+    __statemgr__ = IdemStateManager
+
+
+class NoteResponse(IdemDomain.Response):
+    pass
+
+
+class CreateNoteCmd(IdemDomain.Command):
+    class Meta:
+        key = 'create-note'
+        resource_init = True
+        auth_required = False
+
+    class Data(DataModel):
+        text: str
+
+    async def _process(self, aggregate, statemgr, payload):
+        note = await aggregate.create_note(payload)
+        yield aggregate.create_response(note, _type="note-response")
+
+
+def fake_request(body=b'{}', path="/cmd"):
+    async def _body():
+        return body
+
+    return SimpleNamespace(method="POST", url=SimpleNamespace(path=path, query=""), body=_body)
+
+
+async def test_concurrent_duplicates_wait_for_the_first_execution():
+    store = IdempotencyStore(ttl=60, maxsize=10, redis_url=None, wait=1)
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return FastJSONResponse({"n": len(calls)}, status_code=201)
+
+    responses = await asyncio.gather(*(store.execute(fake_request(), "k1", "user", handler) for _ in range(3)))
+    assert len(calls) == 1
+    assert [r.status_code for r in responses] == [201] * 3
+    assert {r.body for r in responses} == {b'{"n":1}'}
+    assert [r.headers.get("idempotent-replayed") for r in responses].count("true") == 2
+
+    # Keys are scoped to the user
+    await store.execute(fake_request(), "k1", "other-user", handler)
+    assert len(calls) == 2
+
+    with pytest.raises(UnprocessableError):
+        await store.execute(fake_request(b'{"x": 1}'), "k1", "user", handler)
+
+
+async def test_failed_execution_releases_the_key():
+    store = IdempotencyStore(ttl=60, maxsize=10, redis_url=None, wait=0.05)
+
+    async def failing():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        await store.execute(fake_request(), "k2", None, failing)
+
+    async def slow():
+        await asyncio.sleep(0.2)
+        return FastJSONResponse({})
+
+    first = asyncio.create_task(store.execute(fake_request(), "k2", None, slow))
+    await asyncio.sleep(0.01)
+    with pytest.raises(LockedError):
+        await store.execute(fake_request(), "k2", None, slow)
+
+    assert (await first).status_code == 200
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values, self.calls = {}, []
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, nx=False, ex=None):
+        self.calls.append(("set", value, ex))
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    async def expire(self, key, seconds):
+        self.calls.append(("expire", seconds))
+        return key in self.values
+
+    async def delete(self, key):
+        self.values.pop(key, None)
+
+
+async def test_reservation_renewed_while_the_command_runs():
+    store = IdempotencyStore(ttl=60, maxsize=10, redis_url=None, wait=0.05, lease=0.09)
+    store._redis = redis = FakeRedis()
+
+    async def slow():
+        await asyncio.sleep(0.2)
+        return FastJSONResponse({}, status_code=201)
+
+    # Outlives the lease: renewed instead of expiring under a duplicate from another worker
+    response = await store.execute(fake_request(), "k3", None, slow)
+    assert response.status_code == 201
+    assert [call[0] for call in redis.calls][0] == "set" and redis.calls.count(("expire", 1)) >= 3
+
+    # No renewal after completion (it would shorten the expiry of the saved response)
+    assert redis.calls[-1][0] == "set" and redis.calls[-1][2] == 60
+    calls = len(redis.calls)
+    await asyncio.sleep(0.1)
+    assert len(redis.calls) == calls
+
+
+async def test_command_endpoint_replays_the_response():
+    app = setup_error_handler(FastAPI())
+    FastAPIDomainManager.setup_app(app, IdemDomain)
+    statemgr = app.state.domain_manager._domains[0].statemgr
+
+    async with statemgr.connect() as conn:
+        await conn.run_sync(IdemConnector.__data_schema_base__.metadata.drop_all)
+        await conn.run_sync(IdemConnector.__data_schema_base__.metadata.create_all)
+
+    client = TestClient(app)
+    headers = {"Idempotency-Key": "create-a"}
+    first = client.post("/idem-test:create-note/note/:new", json={"text": "a"}, headers=headers)
+    retry = client.post("/idem-test:create-note/note/:new", json={"text": "a"}, headers=headers)
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json() and retry.headers["idempotent-replayed"] == "true"
+
+    assert client.post("/idem-test:create-note/note/:new", json={"text": "b"}, headers=headers).status_code == 422
+
+    async with statemgr.transaction():
+        assert [n.text for n in await statemgr.query('note')] == ["a"]
@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+from authlib.jose import JsonWebKey
+
+from fluvius.fastapi.jwks import JWKSCache
+
+
+def _write_jwks(path, *kids):
+    keys = []
+    for kid in kids:
+        key = JsonWebKey.generate_key('RSA', 2048, is_private=True)
+        keys.append(dict(key.as_dict(is_private=False), kid=kid))
+
+    path.write_text(json.dumps({"keys": keys}))
+
+
+class CountingJWKSCache(JWKSCache):
+    fetches = 0
+
+    async def _fetch(self):
+        self.fetches += 1
+        await asyncio.sleep(0.01)
+        return await super()._fetch()
+
+
+async def test_jwks_unknown_kid_refreshes_once(tmp_path):
+    path = tmp_path / "jwks.json"
+    _write_jwks(path, "key-1")
+
+    rotations = []
+    cache = CountingJWKSCache(str(path), min_refresh_interval=0, on_refresh=rotations.append)
+    await cache.refresh()
+    assert cache.get_key("key-1") is not None
+    assert await cache.ensure_kid("key-1") is cache.get_key("key-1")
+    assert cache.fetches == 1
+
+    # Key rotation: concurrent requests with the new kid share a single refresh
+    _write_jwks(path, "key-2")
+    keys = await asyncio.gather(*(cache.ensure_kid("key-2") for _ in range(5)))
+    assert all(k is cache.get_key("key-2") for k in keys)
+    assert cache.fetches == 2
+    assert cache.get_key("key-1") is None
+    assert len(rotations) == 2
+
+
+async def test_jwks_stale_and_throttle(tmp_path):
+    path = tmp_path / "jwks.json"
+    _write_jwks(path, "key-1")
+
+    cache = CountingJWKSCache(f"file://{path}", ttl=0, stale_grace=60, min_refresh_interval=60)
+    await cache.refresh()
+    assert cache.stale
+
+    # Refresh failures keep serving the previous keys within the grace period
+    path.unlink()
+    await cache.refresh()
+    assert cache.get_key("key-1") is not None
+
+    # Unknown kids do not hammer the JWKS endpoint
+    assert await cache.ensure_kid("key-9") is None
+    assert cache.fetches == 2
+
+
+async def test_jwks_background_refresh(tmp_path):
+    path = tmp_path / "jwks.json"
+    _write_jwks(path, "key-1")
+
+    cache = JWKSCache(str(path), ttl=0, refresh_ahead=0, min_refresh_interval=0.01)
+    await cache.start()
+    _write_jwks(path, "key-2")
+    await asyncio.sleep(0.1)
+    await cache.stop()
+    assert cache.get_key("key-2") is not None
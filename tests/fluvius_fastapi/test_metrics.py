@@ -0,0 +1,192 @@
+"""
+Metrics registry / endpoint tests and recording overhead benchmark.
+
+    python tests/fluvius_fastapi/test_metrics.py
+"""
+import asyncio
+import json
+import os
+
+from time import time
+from timeit import timeit
+
+import pytest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fluvius.helper.metrics import Gauge, MetricsRegistry, SNAPSHOT_SUFFIX, clear_snapshots
+from fluvius.fastapi.metrics import HTTP_DURATION, MetricsMiddleware, UNMATCHED_ROUTE, configure_metrics
+from fluvius.fastapi.setup import setup_error_handler
+
+
+def test_exposition_format():
+    registry = MetricsRegistry()
+    requests = registry.counter("app_requests", "Requests", ("method",))
+    latency = registry.histogram("app_latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+
+    requests.inc(("GET",))
+    requests.inc(("GET",), 2)
+    latency.observe(("/items/{id}",), 0.05)
+    latency.observe(("/items/{id}",), 0.1)
+    latency.observe(("/items/{id}",), 3)
+
+    @registry.collector
+    def pool():
+        gauge = Gauge("app_pool", "Pool", ("state",))
+        gauge.set(("idle",), 4)
+        return (gauge,)
+
+    assert registry.exposition().splitlines() == [
+        '# HELP app_latency_seconds Latency',
+        '# TYPE app_latency_seconds histogram',
+        'app_latency_seconds_bucket{route="/items/{id}",le="0.1"} 2',
+        'app_latency_seconds_bucket{route="/items/{id}",le="1.0"} 2',
+        'app_latency_seconds_bucket{route="/items/{id}",le="+Inf"} 3',
+        'app_latency_seconds_sum{route="/items/{id}"} 3.15',
+        'app_latency_seconds_count{route="/items/{id}"} 3',
+        '# HELP app_pool Pool',
+        '# TYPE app_pool gauge',
+        'app_pool{state="idle"} 4',
+        '# HELP app_requests_total Requests',
+        '# TYPE app_requests_total counter',
+        'app_requests_total{method="GET"} 3',
+    ]
+
+    # Same metric from several modules, conflicting definitions are rejected
+    assert registry.counter("app_requests", "Requests", ("method",)) is requests
+    with pytest.raises(ValueError):
+        registry.histogram("app_requests", "Requests", ("method",))
+
+    # A failing collector does not break the scrape
+    registry.collector(lambda: 1 / 0, name="broken")
+    assert 'app_requests_total{method="GET"} 3' in registry.exposition()
+
+
+def write_snapshot(directory, pid, registry, age=0):
+    with open(os.path.join(directory, f"{pid}{SNAPSHOT_SUFFIX}"), 'w') as f:
+        json.dump({"time": time() - age, "metrics": registry.snapshot()}, f)
+
+
+def test_multiprocess_merge(tmp_path):
+    def gauge(value):
+        metric = Gauge("app_pool", "Pool")
+        metric.set((), value)
+        return (metric,)
+
+    def worker_registry(count, idle):
+        registry = MetricsRegistry()
+        registry.counter("app_requests", "Requests", ("method",)).inc(("GET",), count)
+        registry.histogram("app_latency_seconds", "Latency", (), buckets=(0.1, 1.0)).observe((), 0.5)
+        registry.collector(lambda: gauge(idle), name="pool")
+        return registry
+
+    local = worker_registry(1, 4)
+    write_snapshot(tmp_path, 1001, worker_registry(2, 5))
+    write_snapshot(tmp_path, 1002, worker_registry(10, 6), age=120)     # exited process
+    (tmp_path / f"1003{SNAPSHOT_SUFFIX}.tmp").write_text("{")            # partial write
+
+    # Left by an exited process with the same pid: its counters are kept, not overwritten
+    write_snapshot(tmp_path, os.getpid(), worker_registry(100, 100))
+
+    lines = local.exposition(str(tmp_path), stale_after=60).splitlines()
+    assert 'app_requests_total{method="GET"} 113' in lines
+    assert 'app_latency_seconds_bucket{le="1.0"} 4' in lines and 'app_latency_seconds_sum 2.0' in lines
+    assert sorted(line for line in lines if line.startswith("app_pool{")) == [
+        'app_pool{pid="1001"} 5', f'app_pool{{pid="{os.getpid()}"}} 4'
+    ]
+
+    # The scrape flushed the live values of this process
+    with open(tmp_path / f"{os.getpid()}{SNAPSHOT_SUFFIX}") as f:
+        assert json.load(f)["metrics"]["app_requests"]["values"] == [[["GET"], 1]]
+
+    clear_snapshots(str(tmp_path))
+    assert os.listdir(tmp_path) == []
+
+
+def test_multiprocess_totals_never_decrease(tmp_path, monkeypatch):
+    directory = str(tmp_path)
+    workers = {pid: MetricsRegistry() for pid in (1001, 1002)}
+    counters = {pid: registry.counter("app_requests", "Requests") for pid, registry in workers.items()}
+
+    def run(pid, action, *args):
+        monkeypatch.setattr(os, "getpid", lambda: pid)
+        return getattr(workers[pid], action)(*args)
+
+    def total(exposition):
+        return next(line for line in exposition.splitlines() if line.startswith("app_requests_total"))
+
+    counters[1001].inc(amount=100)
+    run(1001, "flush", directory)       # periodic flushes
+    counters[1002].inc(amount=10)
+    run(1002, "flush", directory)
+    counters[1001].inc(amount=50)
+    counters[1002].inc(amount=50)
+
+    # Consecutive scrapes served by different processes
+    assert total(run(1001, "exposition", directory)) == "app_requests_total 160"
+    assert total(run(1002, "exposition", directory)) == "app_requests_total 210"
+    assert total(run(1001, "exposition", directory)) == "app_requests_total 210"
+
+
+def test_metrics_endpoint():
+    app = setup_error_handler(FastAPI())
+    app = app | configure_metrics(key="secret")
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"id": item_id}
+
+    HTTP_DURATION.values.clear()
+    client = TestClient(app)
+    for item_id in range(3):
+        assert client.get(f"/items/{item_id}").status_code == 200
+    assert client.get("/unknown").status_code == 404
+
+    # Labelled by route template, not by path
+    assert HTTP_DURATION.values[("GET", "/items/{item_id}", 200)][-2] == 0
+    assert sum(HTTP_DURATION.values[("GET", "/items/{item_id}", 200)][:-1]) == 3
+    assert ("GET", UNMATCHED_ROUTE, 404) in HTTP_DURATION.values
+
+    assert client.get("/metrics").json()["errcode"] == "S00.607"
+    response = client.get("/metrics", headers={"Authorization": "Bearer secret"})
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'fluvius_http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 3' in response.text
+    assert "# TYPE fluvius_command_duration_seconds histogram" in response.text
+
+
+def benchmark(number=100000):
+    """ Recording cost per request (middleware and histogram) """
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200})
+
+    async def send(message):
+        pass
+
+    middleware = MetricsMiddleware(endpoint)
+    scope = {"type": "http", "method": "GET", "path": "/items/1"}
+
+    async def requests(app, count):
+        for _ in range(count):
+            await app(scope, None, send)
+
+    loop = asyncio.new_event_loop()
+    try:
+        bare = timeit(lambda: loop.run_until_complete(requests(endpoint, number)), number=1)
+        timed = timeit(lambda: loop.run_until_complete(requests(middleware, number)), number=1)
+    finally:
+        loop.close()
+
+    observe = timeit(lambda: HTTP_DURATION.observe(("GET", "/items/{id}", 200), 0.004), number=number)
+    return (timed - bare) / number, observe / number
+
+
+def test_recording_benchmark():
+    middleware, observe = benchmark(number=1000)
+    assert middleware < 1e-4 and observe < 1e-4
+
+
+if __name__ == "__main__":
+    middleware, observe = benchmark()
+    print(f"middleware overhead: {middleware * 1e6:6.2f} us/request")
+    print(f"histogram observe:   {observe * 1e6:6.2f} us")
@@ -0,0 +1,209 @@
+"""
+Notification hub tests and fan-out benchmark.
+
+    python tests/fluvius_fastapi/test_notify_hub.py
+"""
+import asyncio
+import json
+
+from timeit import timeit
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from fluvius.fastapi.notify import NotifyHub, configure_notify, event_stream
+from fluvius.fastapi.setup import setup_error_handler
+
+
+async def test_fanout_by_scope_and_bounded_queues():
+    hub = NotifyHub(queue_size=2)
+    alice = hub.subscribe(["alice"])
+    both = hub.subscribe(["alice", "bob"])
+
+    assert hub.fanout("nobody", "{}") == 0
+    hub.notify("alice", "item", "obj-1", {"v": 1})
+    hub.notify("bob", "item", "obj-2", {"v": 2})
+
+    assert [json.loads(f)["data"]["_target"] for f in await alice.get()] == ["obj-1"]
+    assert [json.loads(f)["scope"] for f in await both.get()] == ["alice", "bob"]
+
+    # Slow client: only the latest `queue_size` frames are kept
+    for i in range(5):
+        hub.notify("alice", "item", f"obj-{i}", {"v": i})
+
+    assert [json.loads(f)["data"]["v"] for f in await alice.get()] == [3, 4]
+    assert alice.dropped == 3 and hub.metrics()["delivered"] == 13
+    assert await alice.get(timeout=0.01) == []
+
+    # Batches are delivered on `send`, discarded ones never are
+    hub.notify("bob", "item", "obj-3", {"v": 3}, batch_id="tx-1")
+    hub.notify("bob", "item", "obj-4", {"v": 4}, batch_id="tx-2")
+    assert len(both) == 2   # alice's frames only
+    hub.discard("tx-2")
+    hub.send("tx-1")
+    assert [json.loads(f)["data"]["v"] for f in await both.get()][-1:] == [3]
+    assert hub.metrics()["batches"] == 0
+
+    hub.unsubscribe(both)
+    assert await both.get() is None
+    assert set(hub._subscribers) == {"alice"} and hub.metrics()["connections"] == 1
+
+
+async def test_event_stream():
+    hub = NotifyHub()
+    connection = hub.subscribe(["alice"])
+    stream = event_stream(hub, connection, keepalive=0.01)
+
+    assert await stream.__anext__() == ": connected\n\n"
+    assert await stream.__anext__() == ": keepalive\n\n"
+
+    hub.notify("alice", "item", "obj-1", {"v": 1})
+    hub.notify("alice", "item", "obj-2", {"v": 2})
+    chunk = await stream.__anext__()
+    assert [json.loads(line[6:])["data"]["v"] for line in chunk.split("\n\n") if line] == [1, 2]
+
+    # Closing the stream (client gone) removes the subscription
+    await stream.aclose()
+    assert hub.metrics()["connections"] == 0
+
+
+def test_websocket_endpoint():
+    app = setup_error_handler(FastAPI())
+    hub = NotifyHub()
+    app = app | configure_notify(hub=hub)
+
+    async def get_auth_context(connection):
+        if connection.headers.get("authorization") == "Bearer alice":
+            return SimpleNamespace(user=SimpleNamespace(_id="alice"))
+
+    app.state.get_auth_context = get_auth_context
+
+    with TestClient(app) as client:
+        with client.websocket_connect("/_notify/ws", headers={"Authorization": "Bearer alice"}) as websocket:
+            client.portal.call(hub.notify, "alice", "item", "obj-1", {"v": 1})
+            client.portal.call(hub.notify, "bob", "item", "obj-2", {"v": 2})
+            client.portal.call(hub.notify, "alice", "item", "obj-3", {"v": 3})
+            assert json.loads(websocket.receive_text())["data"]["_target"] == "obj-1"
+            assert json.loads(websocket.receive_text())["data"]["_target"] == "obj-3"
+
+        try:
+            with client.websocket_connect("/_notify/ws") as websocket:
+                websocket.receive_text()
+            assert False, "Unauthenticated connection accepted"
+        except WebSocketDisconnect as e:
+            assert e.code == 1008
+
+        response = client.get("/_notify/sse")
+        assert response.status_code == 401
+
+    assert hub.metrics()["connections"] == 0
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.messages = asyncio.Queue()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.redis.subscribers.remove(self)
+
+    async def subscribe(self, channel):
+        self.redis.subscribers.append(self)
+
+    async def listen(self):
+        while True:
+            yield await self.messages.get()
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def publish(self, channel, data):
+        self.commands.append(data)
+
+    async def execute(self):
+        self.redis.round_trips += 1
+        for data in self.commands:
+            for pubsub in self.redis.subscribers:
+                pubsub.messages.put_nowait({"type": "message", "data": data})
+
+
+class FakeRedis:
+    def __init__(self):
+        self.subscribers = []
+        self.round_trips = 0
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def aclose(self):
+        pass
+
+
+async def test_redis_fanout_across_processes():
+    redis = FakeRedis()
+    hubs = [NotifyHub(redis_url="redis://fake") for _ in range(2)]
+    for hub in hubs:
+        hub._redis = redis
+        hub.start()
+
+    await asyncio.sleep(0)
+    connections = [hub.subscribe(["alice"]) for hub in hubs]
+
+    for i in range(3):
+        hubs[0].notify("alice", "item", f"obj-{i}", {"v": i})
+
+    # Published from one process in a single pipeline, delivered by all of them
+    for connection in connections:
+        frames = await asyncio.wait_for(connection.get(), 1)
+        while len(frames) < 3:
+            frames += await asyncio.wait_for(connection.get(), 1)
+        assert [json.loads(f)["data"]["v"] for f in frames] == [0, 1, 2]
+
+    assert redis.round_trips == 1
+
+    for hub in hubs:
+        await hub.close()
+
+    assert redis.subscribers == []
+
+
+def benchmark(connections=10000, notifications=100):
+    async def run():
+        hub = NotifyHub(queue_size=notifications)
+        for i in range(connections):
+            hub.subscribe(["broadcast", f"user-{i}"])
+
+        message = {"status": "done", "progress": 100}
+        elapsed = timeit(lambda: hub.notify("broadcast", "job", "job-1", message), number=notifications)
+        return elapsed, hub.metrics()
+
+    return asyncio.run(run())
+
+
+def test_fanout_benchmark():
+    elapsed, metrics = benchmark(connections=1000, notifications=10)
+    assert metrics["delivered"] == 10000 and metrics["queued"] == 10000 and metrics["dropped"] == 0
+
+
+if __name__ == "__main__":
+    connections, notifications = 10000, 100
+    elapsed, metrics = benchmark(connections, notifications)
+    print(f"fan-out to {connections} connections: {elapsed / notifications * 1000:8.3f} ms/notification")
+    print(f"per connection:                      {elapsed / metrics['delivered'] * 1e9:8.1f} ns")
@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fluvius.fastapi import profiler
+from fluvius.fastapi.profiler import configure_profiler, ProfileBuffer, ProfileRecord, RequestProfiler
+from fluvius.fastapi.setup import setup_error_handler
+
+
+def create_test_app(**kwargs):
+    app = setup_error_handler(FastAPI()) | configure_profiler(**kwargs)
+
+    @app.get("/work/{delay}")
+    async def work(delay: float):
+        await asyncio.sleep(delay)
+        return {"total": sum(i * i for i in range(10000))}
+
+    return app
+
+
+def _record(duration, record_id):
+    return ProfileRecord(duration, record_id, "GET", "/", 200, 0.0, "cprofile", None)
+
+
+def test_profile_buffer_keeps_slowest():
+    buffer = ProfileBuffer(size=3)
+    for i, duration in enumerate([0.5, 0.1, 0.9, 0.3, 0.7]):
+        buffer.add(_record(duration, i))
+
+    assert [r.duration for r in buffer.records()] == [0.9, 0.7, 0.5]
+    assert buffer.get(1) is None and buffer.get(2).duration == 0.9
+
+
+def test_profiler_disabled_by_default():
+    app = create_test_app()
+    client = TestClient(app)
+
+    client.get("/work/0", headers={"X-Fluvius-Profile": "1"})
+    assert len(app.state.profiler.buffer) == 0
+
+    assert client.get("/_profiler").json()["settings"]["enabled"] is False
+
+
+def test_profiler_requests_and_admin_endpoints():
+    app = create_test_app(enabled=True, key="secret")
+    client = TestClient(app)
+    headers = {"X-Fluvius-Profile": "secret"}
+
+    client.get("/work/0")
+    client.get("/work/0", headers={"X-Fluvius-Profile": "wrong"})
+    assert len(app.state.profiler.buffer) == 0
+
+    client.get("/work/0.02", headers=headers)
+    client.get("/work/0", params={"_profiler": "secret"})
+    assert len(app.state.profiler.buffer) == 2
+
+    assert client.get("/_profiler").status_code == 403
+    profiles = client.get("/_profiler", headers=headers).json()["profiles"]
+    assert profiles[0]["path"] == "/work/0.02" and profiles[0]["status"] == 200
+    assert profiles[0]["duration"] >= profiles[1]["duration"]
+
+    profile_id = profiles[0]["id"]
+    response = client.get(f"/_profiler/{profile_id}", headers=headers)
+    assert response.headers["content-type"].startswith("text/html")
+
+    response = client.get(f"/_profiler/{profile_id}", params={"format": "speedscope"}, headers=headers)
+    assert "speedscope" in json.loads(response.content)["$schema"]
+
+    assert client.get(f"/_profiler/{profile_id}", params={"format": "pstats"}, headers=headers).status_code == 400
+    assert client.get("/_profiler/999", headers=headers).status_code == 404
+
+
+def test_profiler_runtime_toggle():
+    app = create_test_app()
+    client = TestClient(app)
+
+    settings = client.put("/_profiler", json={"enabled": True, "sample_rate": 1.0, "backend": "cprofile"}).json()
+    assert settings["enabled"] and settings["backend"] == "cprofile"
+
+    client.get("/work/0")
+    profiles = client.get("/_profiler").json()["profiles"]
+    assert len(profiles) == 1 and profiles[0]["formats"] == ["html", "pstats"]
+
+    response = client.get(f"/_profiler/{profiles[0]['id']}", params={"format": "pstats"})
+    assert "function calls" in response.text
+
+    assert client.put("/_profiler", json={"sample_rate": 2}).status_code == 400
+    assert client.put("/_profiler", json={"enabled": False, "clear": True}).json()["profiles"] == 0
+
+
+def test_profiler_trigger_requires_key_outside_developer_mode(monkeypatch):
+    scope = {"type": "http", "headers": [(b"x-fluvius-profile", b"1")], "query_string": b"_profiler=1"}
+    keyless = RequestProfiler(enabled=True, sample_rate=0.0, key=None)
+    assert keyless.requested(scope)
+
+    monkeypatch.setattr(profiler.config, "DEVELOPER_MODE", False)
+    assert not keyless.requested(scope)
+    assert RequestProfiler(enabled=True, sample_rate=0.0, key="1").requested(scope)
@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+from fluvius.auth.hashes import check_hash
+from fluvius.fastapi.mqtt import MqttAclProvisioner
+
+
+class FakePipeline:
+    def __init__(self, redis, transaction):
+        self.redis = redis
+        self.transaction = transaction
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def set(self, key, value, ex=None):
+        self.commands.append(("set", key, value, ex))
+
+    def expire(self, key, ttl):
+        self.commands.append(("expire", key, ttl))
+
+    async def execute(self):
+        self.redis.round_trips.append((self.transaction, len(self.commands)))
+        for command in self.commands:
+            if command[0] == "set":
+                self.redis.data[command[1]] = (command[2], command[3])
+            elif command[1] in self.redis.data:
+                self.redis.data[command[1]] = (self.redis.data[command[1]][0], command[2])
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.round_trips = []
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self, transaction)
+
+    async def exists(self, key):
+        self.round_trips.append(("exists", key))
+        return int(key in self.data)
+
+    async def delete(self, *keys):
+        self.round_trips.append(("delete", len(keys)))
+        for key in keys:
+            self.data.pop(key, None)
+
+
+USER = {"session_id": "ses-1", "sub": "user-1", "client_token": "token-1"}
+PERMISSIONS = [("notify", 4), ("work", 4)]
+
+
+async def test_session_is_provisioned_in_a_single_transaction():
+    redis = FakeRedis()
+    provisioner = MqttAclProvisioner(redis, prefix="mqtt", permissions=PERMISSIONS, ttl=600, hash_cache_size=16)
+    user = dict(USER, exp=int(time.time()) + 300)
+
+    assert await provisioner.authorize(user)
+    assert redis.round_trips == [("exists", "mqtt-auth:ses-1"), (True, 3)]
+
+    credential, ttl = redis.data["mqtt-auth:ses-1"]
+    assert check_hash("token-1", credential) and 290 <= ttl <= 300
+    assert redis.data["mqtt-acl:ses-1:user-1/notify"][0] == 4
+
+    # Already provisioned: only the expiry is extended
+    redis.round_trips = []
+    assert not await provisioner.authorize(dict(user, exp=int(time.time()) + 900))
+    assert redis.round_trips == [("exists", "mqtt-auth:ses-1"), (False, 3)]
+    assert redis.data["mqtt-auth:ses-1"] == (credential, redis.data["mqtt-auth:ses-1"][1])
+    assert redis.data["mqtt-auth:ses-1"][1] > 800
+
+    await provisioner.deauthorize(user)
+    assert redis.data == {} and redis.round_trips[-1] == ("delete", 3)
+
+
+async def test_client_token_hash_is_cached_and_errors_are_logged(caplog):
+    redis = FakeRedis()
+    provisioner = MqttAclProvisioner(redis, prefix="mqtt", permissions=PERMISSIONS, ttl=600, hash_cache_size=16)
+
+    first = await provisioner.client_token_hash(USER)
+    assert await provisioner.client_token_hash(USER) == first
+    assert await provisioner.client_token_hash(dict(USER, client_token="token-2")) != first
+
+    # Expired tokens are not provisioned
+    assert not await provisioner.authorize(dict(USER, exp=int(time.time()) - 1))
+
+    async def failing_exists(key):
+        raise ConnectionError("redis is down")
+
+    redis.exists = failing_exists
+    task = provisioner.schedule(provisioner.authorize(USER))
+    await asyncio.gather(task, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert "ACL provisioning failed" in caplog.text
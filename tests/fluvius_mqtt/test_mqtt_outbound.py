@@ -0,0 +1,208 @@
+import asyncio
+import json
+
+import pytest
+
+from fluvius.error import BadRequestError
+from fluvius.fastapi.mqtt import FastapiMQTTClient, OutboundQueue
+
+
+def read_varint(data, pos):
+    value, shift = 0, 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+class FakeBroker:
+    """ Minimal MQTT 5 broker: CONNECT, PUBLISH (QoS 0/1), PINGREQ and DISCONNECT """
+
+    def __init__(self, session_present=False):
+        self.session_present = session_present
+        self.ack = True
+        self.received = []
+        self.held_acks = []
+        self.writers = []
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.drop_connections()
+        self.server.close()
+        await self.server.wait_closed()
+
+    def drop_connections(self):
+        for writer in self.writers:
+            writer.close()
+        self.writers = []
+
+    def release_acks(self):
+        for writer, mid in self.held_acks:
+            writer.write(bytes([0x40, 0x02]) + mid)
+        self.held_acks = []
+
+    async def handle(self, reader, writer):
+        self.writers.append(writer)
+        try:
+            while True:
+                header = await reader.readexactly(1)
+                length, multiplier = 0, 1
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    length += (byte & 0x7F) * multiplier
+                    multiplier *= 128
+                    if not byte & 0x80:
+                        break
+
+                body = await reader.readexactly(length)
+                kind = header[0] >> 4
+                if kind == 1:       # CONNECT
+                    writer.write(bytes([0x20, 0x03, int(self.session_present), 0x00, 0x00]))
+                elif kind == 3:     # PUBLISH
+                    qos = (header[0] >> 1) & 0x03
+                    topic_length = int.from_bytes(body[:2], "big")
+                    pos = 2 + topic_length
+                    mid = None
+                    if qos:
+                        mid, pos = body[pos:pos + 2], pos + 2
+                    properties, pos = read_varint(body, pos)
+                    self.received.append((body[2:2 + topic_length].decode(), body[pos + properties:].decode()))
+                    if mid is not None:
+                        if self.ack:
+                            writer.write(bytes([0x40, 0x02]) + mid)
+                        else:
+                            self.held_acks.append((writer, mid))
+                elif kind == 12:    # PINGREQ
+                    writer.write(bytes([0xD0, 0x00]))
+                elif kind == 14:    # DISCONNECT
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def wait_for(condition, timeout=2.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+
+    assert condition()
+
+
+def payloads(broker):
+    return [payload for _, payload in broker.received]
+
+
+async def test_offline_buffering_and_inflight_window():
+    broker = FakeBroker()
+    port = await broker.start()
+    client = FastapiMQTTClient("outbound-test")
+    client.outbound.max_inflight = 2
+
+    # Offline: QoS 1 messages are kept, QoS 0 messages are dropped
+    client.outbound.offer("t/notify", "m0", qos=1)
+    client.outbound.offer("t/notify", "volatile", qos=0)
+    assert len(client.outbound) == 1 and client.outbound.dropped_offline == 1
+
+    await client.connect("127.0.0.1", port)
+    await wait_for(lambda: payloads(broker) == ["m0"])
+
+    # Slow broker: at most `max_inflight` unacknowledged messages are handed to the connection
+    broker.ack = False
+    for i in range(1, 6):
+        client.outbound.offer("t/notify", f"m{i}", qos=1)
+
+    await wait_for(lambda: len(broker.received) == 3)
+    await asyncio.sleep(0.05)
+    assert len(broker.received) == 3
+    metrics = client.outbound.metrics()
+    assert (metrics["depth"], metrics["inflight"]) == (3, 2)
+
+    broker.ack = True
+    broker.release_acks()
+    await wait_for(lambda: len(broker.received) == 6)
+    assert payloads(broker) == [f"m{i}" for i in range(6)]
+    await wait_for(lambda: client.outbound.metrics()["inflight"] == 0)
+
+    await client.disconnect()
+    await broker.stop()
+
+
+async def test_inflight_messages_are_replayed_on_reconnect():
+    broker = FakeBroker(session_present=False)
+    port = await broker.start()
+    client = FastapiMQTTClient("replay-test")
+    client.reconnect_delay = 0
+    await client.connect("127.0.0.1", port)
+
+    broker.ack = False
+    client.outbound.offer("t/notify", "a", qos=1)
+    client.outbound.offer("t/notify", "b", qos=1)
+    await wait_for(lambda: len(broker.received) == 2)
+
+    # Connection lost before the acknowledgements, the broker kept no session
+    broker.ack = True
+    broker.held_acks = []
+    broker.drop_connections()
+    client.outbound.offer("t/notify", "c", qos=1)
+
+    await wait_for(lambda: payloads(broker)[2:] == ["a", "b", "c"], timeout=5)
+    assert client.outbound.replayed >= 2
+
+    await client.disconnect()
+    await broker.stop()
+
+
+class OfflineClient:
+    is_connected = False
+
+
+def test_overflow_policies():
+    drop_oldest = OutboundQueue(OfflineClient(), maxsize=2, policy="drop-oldest", max_inflight=10)
+    for i in range(4):
+        assert drop_oldest.offer("t", f"m{i}", qos=1)
+    assert [m[1] for m in drop_oldest._queue] == ["m2", "m3"] and drop_oldest.dropped_oldest == 2
+
+    drop_newest = OutboundQueue(OfflineClient(), maxsize=2, policy="drop-newest", max_inflight=10)
+    for i in range(4):
+        assert drop_newest.offer("t", f"m{i}", qos=1)
+    assert [m[1] for m in drop_newest._queue] == ["m0", "m1"] and drop_newest.dropped_newest == 2
+
+    block = OutboundQueue(OfflineClient(), maxsize=2, policy="block", max_inflight=10)
+    assert block.offer("t", "m0", qos=1) and block.offer("t", "m1", qos=1)
+    assert not block.offer("t", "m2", qos=1) and block.blocked == 1
+
+    with pytest.raises(BadRequestError):
+        OutboundQueue(OfflineClient(), policy="drop-everything")
+
+
+async def test_blocked_publisher_keeps_coalescing():
+    client = FastapiMQTTClient("block-test")
+    client.outbound.maxsize = 1
+    client.outbound.policy = "block"
+    publisher = client.publisher
+    publisher.window = 0
+
+    client.notify("u1", "item", "obj-1", {"v": 1})
+    client.notify("u1", "item", "obj-2", {"v": 1})
+    client.notify("u1", "item", "obj-2", {"v": 2})
+    assert len(client.outbound) == 1 and len(publisher._pending) == 1
+
+    broker = FakeBroker()
+    port = await broker.start()
+    await client.connect("127.0.0.1", port)
+
+    await wait_for(lambda: len(broker.received) == 2)
+    assert json.loads(broker.received[1][1])["v"] == 2 and len(publisher._pending) == 0
+
+    await client.disconnect()
+    await broker.stop()
@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+from fluvius.fastapi.mqtt import NotifyPublisher
+
+
+class RecordingClient:
+    is_connected = True
+
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published.append((topic, json.loads(payload)))
+
+
+def msg(target, value, kind="item"):
+    return {"value": value, "_kind": kind, "_target": target}
+
+
+async def test_notifications_are_coalesced_within_the_window():
+    client = RecordingClient()
+    publisher = NotifyPublisher(client, window=0.02, merge=False, batch_max_size=100, batch_ttl=60, stats_interval=0)
+
+    for i in range(50):
+        publisher.notify("u1/notify", msg("obj-1", i))
+    publisher.notify("u1/notify", msg("obj-2", 0))
+    publisher.notify("u2/notify", msg("obj-1", 0))
+    assert client.published == []
+
+    await asyncio.sleep(0.05)
+    assert client.published == [
+        ("u1/notify", msg("obj-1", 49)),
+        ("u1/notify", msg("obj-2", 0)),
+        ("u2/notify", msg("obj-1", 0)),
+    ]
+
+    stats = publisher.stats.snapshot()
+    assert (stats["notified"], stats["coalesced"], stats["messages"], stats["payloads"]) == (52, 49, 3, 3)
+    assert stats["messages_per_second"] > 0
+
+
+async def test_merged_payloads_and_immediate_mode():
+    client = RecordingClient()
+    publisher = NotifyPublisher(client, window=0.01, merge=True, batch_max_size=100, batch_ttl=60, stats_interval=0)
+    publisher.notify("u1/notify", msg("a", 1))
+    publisher.notify("u1/notify", msg("b", 2))
+    publisher.flush()
+    assert client.published == [("u1/notify", [msg("a", 1), msg("b", 2)])]
+
+    client = RecordingClient()
+    publisher = NotifyPublisher(client, window=0, merge=False, batch_max_size=100, batch_ttl=60, stats_interval=0)
+    publisher.notify("u1/notify", msg("a", 1))
+    assert client.published == [("u1/notify", msg("a", 1))]
+
+
+def test_batches_are_capped_and_expired():
+    client = RecordingClient()
+    publisher = NotifyPublisher(client, window=0, merge=False, batch_max_size=3, batch_ttl=60, stats_interval=0)
+
+    for i in range(5):
+        publisher.notify("u1/notify", msg(f"obj-{i}", i), batch_id="ctx-1")
+    publisher.notify("u1/notify", msg("obj-4", 40), batch_id="ctx-1")
+    assert client.published == []
+
+    publisher.send("ctx-1")
+    assert [m["value"] for _, m in client.published] == [2, 3, 40]
+    assert publisher.stats.dropped == 2 and publisher.stats.coalesced == 1
+
+    # Unknown (already sent) batches are ignored
+    publisher.send("ctx-1")
+    assert len(client.published) == 3
+
+    publisher.notify("u1/notify", msg("x", 1), batch_id="ctx-2")
+    publisher._batches["ctx-2"].created -= 120
+    publisher.notify("u1/notify", msg("x", 1), batch_id="ctx-3")
+    assert "ctx-2" not in publisher._batches and publisher.stats.expired == 1
@@ -0,0 +1,69 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fluvius.query import QueryManager, QueryResource, FrontendQuery, Field, config
+from fluvius.fastapi.query import register_query_manager
+from fluvius.fastapi.setup import setup_error_handler
+
+
+class AggregateQueryManager(QueryManager, data_manager=object):
+    def __init__(self, app=None):
+        self._app = app
+        self.backend_queries = []
+
+    async def execute_aggregate(self, query_resource, backend_query, /, meta=None):
+        self.backend_queries.append(backend_query)
+        return [{"status": "open", "count": 2, "amount_sum": 30}], meta
+
+
+@AggregateQueryManager.register_resource('invoice')
+class InvoiceQuery(QueryResource):
+    class Meta:
+        allow_aggregate = True
+        auth_required = False
+        group_by_fields = ('status',)
+        aggregate_fields = ('amount',)
+
+    id: str = Field("ID", identifier=True, preset="string")
+    status: str = Field("Status", preset="string", source="_status")
+    amount: int = Field("Amount", preset="integer")
+    note: str = Field("Note", preset="string")
+
+
+async def test_aggregate_backend_query():
+    manager = AggregateQueryManager()
+    fe_query = FrontendQuery(
+        user_query={"note.eq": "x"},
+        group_by=["status"],
+        aggregate=["count", "amount.sum"],
+        sort=["amount_sum.desc", "status"],
+        limit=50,
+    )
+
+    data, _ = await manager.aggregate_resource(None, 'invoice', fe_query)
+    assert data[0]["amount_sum"] == 30
+
+    backend_query = manager.backend_queries[-1]
+    assert backend_query.group_by == ("_status",)
+    assert backend_query.aggregate == (("count", None, "count"), ("sum", "amount", "amount_sum"))
+    assert backend_query.sort == (("amount_sum", "desc"), ("_status", "asc"))
+    assert backend_query.limit == 50 and backend_query.where and not backend_query.include
+
+
+def test_aggregate_endpoint():
+    app = setup_error_handler(FastAPI())
+    register_query_manager(app, AggregateQueryManager)
+    client = TestClient(app)
+    url = "/_aggregate/aggregate-query-manager.invoice/"
+
+    response = client.get(url, params={"group_by": "status", "aggregate": "count,amount.sum"})
+    assert response.status_code == 200
+    assert response.json()["data"] == [{"status": "open", "count": 2, "amount_sum": 30}]
+
+    # Whitelists
+    for params in ({"group_by": "note"}, {"aggregate": "note.sum"}, {"aggregate": "amount.median"}, {"sort": "note.asc"}):
+        assert client.get(url, params=params).status_code == 400
+
+    # The group count is capped by QUERY_AGGREGATE_LIMIT
+    assert client.get(url, params={"group_by": "status", "limit": config.QUERY_AGGREGATE_LIMIT}).status_code == 200
+    assert client.get(url, params={"group_by": "status", "limit": config.QUERY_AGGREGATE_LIMIT + 1}).status_code == 422
@@ -0,0 +1,143 @@
+from fastapi import FastAPI, Request
+from fluvius.data import BackendQuery, SqlaDriver
+from fluvius.data.event import data_changed
+from fluvius.query import QueryManager, QueryResource, FrontendQuery, Field
+from fluvius.query import cache as query_cache
+from fluvius.query.cache import QueryResultCache, RedisQueryResultCache, query_fingerprint, setup_cache_invalidation
+from fluvius.fastapi.query import cached_response
+
+
+class CacheQueryManager(QueryManager, data_manager=object):
+    __result_cache__ = QueryResultCache
+
+    executed = 0
+
+    async def execute_query(self, query_resource, backend_query, /, meta=None):
+        CacheQueryManager.executed += 1
+        return [{"id": CacheQueryManager.executed}], {"total": 1}
+
+
+@CacheQueryManager.register_resource('cached-item')
+class CachedItemQuery(QueryResource):
+    class Meta:
+        cache_ttl = 60
+        backend_model = 'public.cached_item'
+
+    id: str = Field("ID", identifier=True, preset="string")
+    name: str = Field("Name", preset="string")
+
+
+@CacheQueryManager.register_resource('plain-item')
+class PlainItemQuery(QueryResource):
+    id: str = Field("ID", identifier=True, preset="string")
+    name: str = Field("Name", preset="string")
+
+
+def test_query_fingerprint_normalised():
+    q1 = BackendQuery.create(include=('b', 'a'), where={'name.eq': 'x'}, scope={'org.eq': 'o1'})
+    q2 = BackendQuery.create(include=('a', 'b'), where={'name.eq': 'x'}, scope={'org.eq': 'o1'})
+    q3 = BackendQuery.create(include=('a', 'b'), where={'name.eq': 'x'}, scope={'org.eq': 'o2'})
+    assert query_fingerprint('r', q1) == query_fingerprint('r', q2)
+    assert query_fingerprint('r', q1) != query_fingerprint('r', q3)
+    assert query_fingerprint('r', q1) != query_fingerprint('s', q1)
+
+
+async def test_query_result_cache_and_invalidation():
+    manager = CacheQueryManager()
+    fe_query = FrontendQuery(user_query={'name.eq': 'x'})
+
+    info1, info2 = {}, {}
+    first = await manager.query_resource(None, 'cached-item', fe_query, cache_info=info1)
+    second = await manager.query_resource(None, 'cached-item', fe_query, cache_info=info2)
+    assert first == second and CacheQueryManager.executed == 1
+    assert info1['etag'] == info2['etag'] and not info1['hit'] and info2['hit']
+
+    # Other queries and resources without `cache_ttl` are not served from the cache
+    await manager.query_resource(None, 'cached-item', FrontendQuery(page=2))
+    await manager.query_resource(None, 'plain-item', fe_query)
+    await manager.query_resource(None, 'plain-item', fe_query)
+    assert CacheQueryManager.executed == 4
+
+    # Committed modifications of an unrelated table
+    for _, reply in data_changed.send(None, tables=frozenset(['public.other'])):
+        await reply
+    await manager.query_resource(None, 'cached-item', fe_query)
+    assert CacheQueryManager.executed == 4
+
+    # ... and of the resource table
+    for _, reply in data_changed.send(None, tables=frozenset(['public.cached_item'])):
+        await reply
+    info3 = {}
+    await manager.query_resource(None, 'cached-item', fe_query, cache_info=info3)
+    assert CacheQueryManager.executed == 5
+    assert info3['etag'] != info1['etag']
+
+    manager.result_cache.close()
+
+
+def test_cached_response_not_modified():
+    info = {'etag': 'abc', 'max_age': 60, 'hit': True}
+
+    def _request(*headers):
+        return Request({"type": "http", "method": "GET", "path": "/", "headers": list(headers), "app": FastAPI()})
+
+    response = cached_response(_request(), {'data': [], 'pagination': {}}, info)
+    assert response.status_code == 200 and response.headers['etag'] == 'W/"abc"'
+
+    response = cached_response(_request((b"if-none-match", b'W/"xyz", W/"abc"')), {'data': []}, info)
+    assert response.status_code == 304 and response.body == b''
+
+
+class NotifyingDriver(SqlaDriver):
+    __db_dsn__ = "sqlite+aiosqlite:///:memory:"
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def incr(self, key):
+        self.redis.incrs.append(key)
+
+    async def execute(self):
+        if self.redis.down:
+            raise ConnectionError("redis is down")
+
+
+class FakeRedis:
+    def __init__(self):
+        self.incrs = []
+        self.down = False
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+async def test_shared_invalidation_connected_at_setup(monkeypatch):
+    monkeypatch.setattr(query_cache, "_invalidators", {})
+    driver = NotifyingDriver()
+
+    # Connected at configuration time, before (or without) any cached query
+    invalidator = setup_cache_invalidation('redis')
+    invalidator._redis = redis = FakeRedis()
+    assert setup_cache_invalidation('local') is None
+
+    # Caches of the query managers share the process invalidator: one increment per commit
+    caches = [RedisQueryResultCache() for _ in range(2)]
+    try:
+        await driver.notify_changes({'public.cached_item'})
+        assert redis.incrs == ['fluvius:query-cache:gen:public.cached_item']
+
+        # The transaction is committed, a failing receiver must not fail the write
+        redis.down = True
+        await driver.notify_changes({'public.cached_item'})
+    finally:
+        invalidator.close()
+        for cache in caches:
+            cache.close()
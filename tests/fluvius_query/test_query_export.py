@@ -0,0 +1,75 @@
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from fluvius.query import QueryManager, QueryResource, FrontendQuery, Field
+from fluvius.fastapi.query import register_query_manager
+
+
+ROWS = [{"id": f"item-{i}", "name": f"Name {i}", "tags": ["a", "b"]} for i in range(1200)]
+
+
+class ExportQueryManager(QueryManager, data_manager=object):
+    def __init__(self, app=None):
+        self._app = app
+        self.backend_queries = []
+
+    async def stream_query(self, query_resource, backend_query):
+        self.backend_queries.append(backend_query)
+        for row in ROWS[:backend_query.limit or None]:
+            yield row
+
+
+@ExportQueryManager.register_resource('export-item')
+class ExportItemQuery(QueryResource):
+    class Meta:
+        allow_export = True
+        auth_required = False
+        export_max_rows = 1000
+
+    id: str = Field("ID", identifier=True, preset="string")
+    name: str = Field("Name", preset="string")
+
+
+@ExportQueryManager.register_resource('noexport-item')
+class NoExportItemQuery(QueryResource):
+    class Meta:
+        auth_required = False
+
+    id: str = Field("ID", identifier=True, preset="string")
+
+
+async def test_export_resource_row_cap():
+    manager = ExportQueryManager()
+    fe_query = FrontendQuery(user_query={'name.eq': 'x'}, limit=10, page=3)
+
+    rows = await manager.export_resource(None, 'export-item', fe_query, max_rows=5)
+    assert len([r async for r in rows]) == 5
+
+    rows = await manager.export_resource(None, 'export-item', fe_query)
+    assert len([r async for r in rows]) == 1000
+
+    # Paging of the frontend query does not apply to exports, filters do
+    backend_query = manager.backend_queries[-1]
+    assert backend_query.offset == 0 and backend_query.limit == 1000
+    assert backend_query.where
+
+
+def test_export_endpoints():
+    app = FastAPI()
+    register_query_manager(app, ExportQueryManager)
+    client = TestClient(app)
+
+    response = client.get("/_export/export-query-manager.export-item/", params={"max_rows": 600})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    assert len(lines) == 600 and json.loads(lines[0]) == ROWS[0]
+
+    response = client.get("/_export/export-query-manager.export-item/", params={"format": "csv", "max_rows": 2})
+    assert response.headers["content-disposition"] == 'attachment; filename="export-item.csv"'
+    assert response.text.splitlines() == ["id,name,tags", 'item-0,Name 0,"[""a"",""b""]"', 'item-1,Name 1,"[""a"",""b""]"']
+
+    assert client.get("/_export/export-query-manager.export-item/", params={"format": "xml"}).status_code == 422
+    assert client.get("/_export/export-query-manager.noexport-item/").status_code == 404
@@ -0,0 +1,79 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import Column, String
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import declarative_base
+
+from fluvius.data import BackendQuery
+from fluvius.data.data_driver.sqla.query import QueryBuilder
+from fluvius.query import QueryManager, QueryResource, QueryParams, FrontendQuery, Field
+from fluvius.fastapi.query import register_query_manager
+
+
+Base = declarative_base()
+
+
+class DocumentSchema(Base):
+    __tablename__ = 'document'
+
+    _id = Column(String, primary_key=True)
+    title = Column(String)
+    body = Column(JSONB)
+
+
+class FieldsQueryManager(QueryManager, data_manager=object):
+    backend_queries = []
+
+    def __init__(self, app=None):
+        self._app = app
+
+    async def execute_query(self, query_resource, backend_query, /, meta=None):
+        self.backend_queries.append(backend_query)
+        row = {"_id": "doc-1", "title": "Title", "body": {"blocks": []}}
+        return [{backend_query.alias.get(k, k): row[k] for k in backend_query.include}], {"total": 1}
+
+
+@FieldsQueryManager.register_resource('document')
+class DocumentQuery(QueryResource):
+    class Meta:
+        auth_required = False
+
+    id: str = Field("ID", identifier=True, preset="string", source="_id")
+    title: str = Field("Title", preset="string")
+    body: dict = Field("Body", preset="none", deferred=True)
+
+
+def test_sparse_fieldset_projection():
+    # Deferred fields are not part of the default projection
+    assert set(DocumentQuery.process_select(None, None)[0]) == {'_id', 'title'}
+
+    fe_query = FrontendQuery.from_query_params(QueryParams(fields='title,body'))
+    include, _ = DocumentQuery.process_select(fe_query.include, fe_query.exclude)
+    assert set(include) == {'_id', 'title', 'body'}
+
+    # Unknown fields are dropped, the identifier is always selected
+    include, _ = DocumentQuery.process_select(['title', 'unknown'], None)
+    assert set(include) == {'_id', 'title'}
+
+    stmt = QueryBuilder().build_select(DocumentSchema, BackendQuery.create(include=('_id', 'title')))
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert 'document.title' in sql and 'document.body' not in sql
+
+
+def test_sparse_fieldset_endpoints():
+    app = FastAPI()
+    register_query_manager(app, FieldsQueryManager)
+    client = TestClient(app)
+
+    response = client.get("/fields-query-manager.document/?fields=title")
+    assert response.status_code == 200
+    assert response.json()['data'] == [{"id": "doc-1", "title": "Title"}]
+    assert set(FieldsQueryManager.backend_queries[-1].include) == {'_id', 'title'}
+
+    response = client.get("/fields-query-manager.document/")
+    assert response.json()['data'] == [{"id": "doc-1", "title": "Title"}]
+
+    response = client.get("/fields-query-manager.document/doc-1?fields=body")
+    assert response.status_code == 200
+    assert response.json() == {"id": "doc-1", "body": {"blocks": []}}
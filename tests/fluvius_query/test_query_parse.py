@@ -0,0 +1,85 @@
+"""
+Query parameter parsing micro-benchmark.
+
+    python tests/fluvius_query/test_query_parse.py
+"""
+import json
+
+from timeit import timeit
+
+from fluvius.data.query import operator_statement
+from fluvius.query import QueryManager, QueryResource, QueryParams, FrontendQuery, Field
+from fluvius.query import helper
+
+
+class ParseQueryManager(QueryManager, data_manager=object):
+    pass
+
+
+@ParseQueryManager.register_resource('parse-item')
+class ParseItemQuery(QueryResource):
+    id: str = Field("ID", identifier=True, preset="string")
+    name: str = Field("Name", preset="string")
+    age: int = Field("Age", preset="integer")
+
+
+QUERY_PARAMS = QueryParams(
+    query=json.dumps({".or": [{"name.has": "an"}, {"age!lt": 18}], "id.ne": "x", "age.gte": 3}),
+    include="id,name,age",
+    sort="name.asc,age.desc",
+)
+PATH_QUERY = "name.eq:abc,age.gt:10"
+
+
+def parse():
+    fe_query = FrontendQuery.from_query_params(QUERY_PARAMS, path_query=PATH_QUERY)
+    return ParseItemQuery.process_query(fe_query.user_query, fe_query.path_query)
+
+
+def clear_caches():
+    for decoder in (helper._decode_json, helper._decode_jurl, helper._decode_list, operator_statement):
+        decoder.cache_clear()
+
+
+def uncached_parse():
+    clear_caches()
+    return parse()
+
+
+def benchmark(number=2000):
+    cold = timeit(uncached_parse, number=number)
+    parse()
+    warm = timeit(parse, number=number)
+    return cold, warm
+
+
+def test_cached_parse_results():
+    assert uncached_parse() == parse()
+    assert operator_statement.cache_info().hits > 0
+    assert helper._decode_json.cache_info().hits > 0
+
+    # Cached statements are shared, the frontend query copies them
+    fe_query = FrontendQuery.from_query_params(QUERY_PARAMS)
+    fe_query.user_query["extra"] = 1
+    assert "extra" not in helper.json_decoder(QUERY_PARAMS.query)
+
+
+def test_repeated_parse_served_from_cache():
+    uncached_parse()
+    decoders = (helper._decode_json, helper._decode_jurl, operator_statement)
+    misses = [decoder.cache_info().misses for decoder in decoders]
+    hits = [decoder.cache_info().hits for decoder in decoders]
+
+    for _ in range(10):
+        parse()
+
+    assert [decoder.cache_info().misses for decoder in decoders] == misses
+    assert all(decoder.cache_info().hits > count for decoder, count in zip(decoders, hits))
+
+
+if __name__ == "__main__":
+    number = 5000
+    cold, warm = benchmark(number)
+    print(f"uncached: {cold / number * 1e6:8.2f} us/query")
+    print(f"cached:   {warm / number * 1e6:8.2f} us/query")
+    assert warm < cold
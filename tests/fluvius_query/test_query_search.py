@@ -0,0 +1,41 @@
+import pytest
+
+from fluvius.error import BadRequestError
+from fluvius.query import QueryManager, QueryResource, FrontendQuery, Field
+
+
+class SearchQueryManager(QueryManager, data_manager=object):
+    pass
+
+
+@SearchQueryManager.register_resource('article')
+class ArticleQuery(QueryResource):
+    class Meta:
+        search_fields = ('title', 'body')
+
+    id: str = Field("ID", identifier=True, preset="string")
+    title: str = Field("Title", preset="search")
+    body: str = Field("Body", preset="search", source="content")
+
+
+def test_search_fields_backend_query():
+    manager = SearchQueryManager()
+    fe_query = FrontendQuery(text="fast db", user_query={"title.search": "db"}, sort=["_rank.desc"])
+    fe_query = manager.validate_fe_query(ArticleQuery, fe_query)
+    backend_query = manager.construct_backend_query(None, ArticleQuery, fe_query)
+
+    assert backend_query.text == "fast db"
+    assert backend_query.text_fields == ("title", "content")
+    assert backend_query.sort == (("_rank", "desc"),)
+    assert [tuple(e[:3]) for e in backend_query.where] == [("title", "search", ".")]
+
+
+def test_unknown_search_fields():
+    class BrokenQuery(QueryResource):
+        class Meta:
+            search_fields = ('missing',)
+
+        id: str = Field("ID", identifier=True, preset="string")
+
+    with pytest.raises(BadRequestError):
+        BrokenQuery.initialize_resource('broken')